@@ -0,0 +1,225 @@
+__author__="Alexandr Savinov"
+
+import os
+import sys
+import json
+import pickle
+import hashlib
+import inspect
+
+from lambdo.utils import *
+from lambdo.resolve import *
+from lambdo.transform import *
+
+from lambdo.Workflow import *
+from lambdo.Table import *
+from lambdo.Column import *
+
+import logging
+log = logging.getLogger('lambdo.cache')
+
+
+class Cache:
+    """
+    The class represents a persistent store of operation results which is used to skip unchanged operations in the next executions.
+    A result is stored in a file with the name being a fingerprint of the operation.
+    The fingerprint depends on the operation definition, its function (source code or module version), its model and the fingerprints of its inputs.
+    If some of them changes then the fingerprint changes and the operation will be executed again.
+    """
+
+    # Definition fields which do not influence the result of an operation
+    ignored_fields = ['executor', 'cost']
+
+    def __init__(self, path):
+
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+        # Hashes of files are computed only if their size or modification time change
+        self.file_index_path = os.path.join(self.path, 'files.json')
+        self.file_index = {}
+        if os.path.exists(self.file_index_path):
+            try:
+                with open(self.file_index_path, encoding='utf-8') as f:
+                    self.file_index = json.load(f)
+            except Exception as e:
+                log.warning("Error reading file index {0}. Exception: {1}".format(self.file_index_path, e))
+
+    def get_fingerprint(self, elem, dependencies):
+        """
+        Compute a fingerprint of the operation given the fingerprints of its dependencies.
+        Return None if the operation cannot be fingerprinted (and hence its result cannot be cached).
+        """
+        if any(x is None for x in dependencies):
+            return None
+
+        h = hashlib.sha256()
+
+        if isinstance(elem, Table):
+            # Columns and filters are separate operations
+            definition = {k: v for k, v in elem.table_json.items() if k not in ['columns', 'row_filter', 'column_filter'] + self.ignored_fields}
+            h.update(b'table')
+            h.update(_fingerprint_value(definition).encode('utf-8'))
+            h.update(self._fingerprint_function(definition.get('function')).encode('utf-8'))
+            h.update(self._fingerprint_files(definition).encode('utf-8'))
+
+            # Data of a table without an operation could be provided directly
+            if elem.is_op_noop() and elem.data is not None:
+                data_fingerprint = fingerprint_data(elem.data)
+                if data_fingerprint is None:
+                    return None
+                h.update(data_fingerprint.encode('utf-8'))
+
+        elif isinstance(elem, Column):
+            definition = {k: v for k, v in elem.column_json.items() if k not in self.ignored_fields}
+            h.update(b'column')
+            h.update(_fingerprint_value(definition).encode('utf-8'))
+            h.update(self._fingerprint_function(definition.get('function')).encode('utf-8'))
+            train = definition.get('train')
+            if isinstance(train, dict):
+                h.update(self._fingerprint_function(train.get('function')).encode('utf-8'))
+            h.update(self._fingerprint_files(definition).encode('utf-8'))
+
+        elif isinstance(elem, (tuple, list)):
+            table = elem[0]
+            definition = {k: table.table_json.get(k) for k in ['row_filter', 'column_filter']}
+            h.update(b'filter')
+            h.update(_fingerprint_value(definition).encode('utf-8'))
+
+        else:
+            return None
+
+        for dep in dependencies:
+            h.update(dep.encode('utf-8'))
+
+        return h.hexdigest()
+
+    def get_train_fingerprint(self, train, data, labels, data_type=None):
+        """
+        Compute a fingerprint of training a model: the training function, its parameters and the content of the training data and labels.
+        Return None if the data cannot be fingerprinted (and hence the model cannot be cached).
+        """
+        data_fingerprint = fingerprint_data(data)
+        labels_fingerprint = fingerprint_data(labels) if labels is not None else 'none'
+        if data_fingerprint is None or labels_fingerprint is None:
+            return None
+
+        h = hashlib.sha256()
+        h.update(b'train')
+        h.update(self._fingerprint_function(train.get('function')).encode('utf-8'))
+        h.update(_fingerprint_value(train.get('model', {})).encode('utf-8'))
+        h.update(self._fingerprint_files(train.get('model', {})).encode('utf-8'))
+        h.update(str(data_type).encode('utf-8'))
+        h.update(data_fingerprint.encode('utf-8'))
+        h.update(labels_fingerprint.encode('utf-8'))
+
+        return h.hexdigest()
+
+    def get(self, fingerprint):
+        """Return a flag if the result has been found and the result itself."""
+        pathname = os.path.join(self.path, fingerprint + '.pkl')
+        if not os.path.exists(pathname):
+            return False, None
+        try:
+            with open(pathname, 'rb') as file:
+                return True, pickle.load(file)
+        except Exception as e:
+            log.warning("Error reading from cache file {0}. Exception: {1}".format(pathname, e))
+            return False, None
+
+    def put(self, fingerprint, value):
+        """Store the result in the cache."""
+        pathname = os.path.join(self.path, fingerprint + '.pkl')
+        temp_pathname = pathname + '.tmp'
+        try:
+            with open(temp_pathname, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_pathname, pathname)  # Other processes never see partially written files
+        except Exception as e:
+            log.warning("Error writing to cache file {0}. Exception: {1}".format(pathname, e))
+
+    def fingerprint_file(self, pathname):
+        """Return a fingerprint of the file. Its content is hashed only if its size or modification time have changed."""
+        try:
+            stat = os.stat(pathname)
+        except OSError:
+            return 'missing'
+
+        key = os.path.abspath(pathname)
+        entry = self.file_index.get(key)
+        if entry and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime_ns:
+            return entry.get('hash')
+
+        h = hashlib.sha256()
+        with open(pathname, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+
+        self.file_index[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': h.hexdigest()}
+        try:
+            with open(self.file_index_path, 'w', encoding='utf-8') as f:
+                json.dump(self.file_index, f)
+        except Exception as e:
+            log.warning("Error writing file index {0}. Exception: {1}".format(self.file_index_path, e))
+
+        return self.file_index[key]['hash']
+
+    def _fingerprint_files(self, definition):
+        """Fingerprint all files referenced in the definition (input files, model files etc.)"""
+        files = []
+        _find_files(definition, files)
+        return ','.join(x + '=' + self.fingerprint_file(x) for x in sorted(set(files)))
+
+    def _fingerprint_function(self, func_name):
+        """Fingerprint the function using its source code or the version of its module."""
+        if not func_name or not isinstance(func_name, str):
+            return ''
+
+        func = resolve_full_name(func_name)
+        if func is None:
+            return 'unresolved'
+
+        try:
+            return hashlib.sha256(inspect.getsource(func).encode('utf-8')).hexdigest()
+        except (TypeError, OSError):
+            pass  # Built-in or compiled functions do not have source code
+
+        module_name = getattr(func, '__module__', None) or func_name.split(':', 1)[0]
+        package = sys.modules.get(module_name.split('.')[0])
+        version = getattr(package, '__version__', '')
+        return module_name + ':' + getattr(func, '__qualname__', func_name) + ':' + str(version)
+
+
+def fingerprint_data(data):
+    """Return a fingerprint of the data frame content or None if it cannot be computed."""
+    try:
+        h = hashlib.sha256()
+        h.update(_fingerprint_value([str(x) for x in data.columns]).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        return h.hexdigest()
+    except Exception as e:
+        log.debug("Cannot fingerprint data. Exception: {0}".format(e))
+        return None
+
+def _fingerprint_value(value):
+    return json.dumps(value, sort_keys=True, default=repr)
+
+def _find_files(value, files):
+    """Find strings which reference existing files."""
+    if isinstance(value, str):
+        pathname = value[1:] if value.startswith('$') else value
+        pathname = get_filename_from_uri(pathname)
+        if pathname and os.path.isfile(pathname):
+            files.append(pathname)
+        elif value.startswith('$file:'):
+            files.append(pathname)  # Reference to a file which does not exist yet
+    elif isinstance(value, dict):
+        for v in value.values():
+            _find_files(v, files)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _find_files(v, files)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,10 +1,14 @@
 __author__="Alexandr Savinov"
 
 import json
+import hashlib
 
 from lambdo.utils import *
 from lambdo.resolve import *
 from lambdo.transform import *
+from lambdo.engine import *
+from lambdo.windows import *
+from lambdo.groups import *
 
 from lambdo.Workflow import *
 from lambdo.Table import *
@@ -32,7 +36,11 @@ class Column:
 
         # TODO: Data represents the whole function and is a pandas series with index as row ids of the table data
         self.data = []  # It is a list because one column definition may generate many column data objects
-        self.groupby = None  # Link columns store here a groupby objects which is then (re)used by multiple aggregate columns
+        self.family = None  # Columns generated from the same definition with extensions (including this column)
+        self.family_lock = None  # Columns of one family can be evaluated by different threads
+        self.family_result = None  # Input and output computed by another column of the family
+        self.accumulated = None  # Accumulate columns store here the number and a hash of processed facts and the values of groups
+        self.trained = None  # Incrementally trained models (not stored in files) with their training state
 
         # Assign id
         self.id = self.column_json.get('id', None)
@@ -103,6 +111,13 @@ class Column:
 
         return operation
 
+    def get_engine(self):
+        """Return the execution engine of the column or the default engine of the workflow."""
+        engine = self.column_json.get('engine')
+        if engine is None and self.table is not None and self.table.workflow is not None:
+            engine = self.table.workflow.workflow_json.get('engine')
+        return engine
+
     def is_op_noop(self):
         operation = self.column_json.get('operation')
         if operation == 'noop':
@@ -151,6 +166,12 @@ class Column:
             return True
         return False
 
+    def is_op_accumulate(self):
+        operation = self.get_operation()
+        if operation == 'accumulate' or operation == 'acc':
+            return True
+        return False
+
     def get_input_columns(self):
         """
         Get column names which are consumed by this operation (and hence they have to be evaluated before this operation can be executed).
@@ -175,20 +196,12 @@ class Column:
             dependencies.extend([linked_table_name + '::' + x for x in linked_keys])  # Linked table name as a prefix
 
         elif self.is_op_compose():
-            inputs = self.get_inputs()
-
-            # Link column (first segment) has to be evaluated
-            link_column_name = inputs[0] or None
-            dependencies.append(table_name + '::' + link_column_name)
+            # Link columns of all segments and the last (linked) column of the path have to be evaluated
+            hops, linked_table, linked_column_name = self._get_compose_path()
+            dependencies.extend([table.id + '::' + link_column_name for table, link_column_name, _ in hops])
+            dependencies.append(linked_table.id + '::' + linked_column_name)  # Linked (target) table name as a prefix
 
-            # Linked column path (tail) in the linked table has to exist (recursion)
-            link_column_definitions = self.table.get_definitions_for_columns(link_column_name)
-            link_column_definition = link_column_definitions[0] or None
-            linked_table_name = link_column_definition.column_json['linked_table']
-            linked_column_name = inputs[1] or None
-            dependencies.append(linked_table_name + '::' + linked_column_name)  # Linked (target) table name as a prefix
-
-        elif self.is_op_aggregate():
+        elif self.is_op_aggregate() or self.is_op_accumulate():
             fact_table_name = definition.get('fact_table')
 
             # Group column
@@ -225,15 +238,11 @@ class Column:
             dependencies.append(linked_table_name)
 
         elif self.is_op_compose():
-            # Link column (first segment) is used to retrieve the linked table
-            inputs = self.get_inputs()
-            link_column_name = inputs[0] or None
-            link_column_definitions = self.table.get_definitions_for_columns(link_column_name)
-            link_column_definition = link_column_definitions[0] or None
-            linked_table_name = link_column_definition.column_json['linked_table']
-            dependencies.append(linked_table_name)
+            # Link columns are used to retrieve the linked tables of all segments
+            hops, _, _ = self._get_compose_path()
+            dependencies.extend([linked_table.id for _, _, linked_table in hops])
 
-        elif self.is_op_aggregate():
+        elif self.is_op_aggregate() or self.is_op_accumulate():
             fact_table_name = definition.get('fact_table')
             dependencies.append(fact_table_name)
 
@@ -285,31 +294,18 @@ class Column:
             # This (main) table has to be populated
             dependencies.append(self.table)
 
-            inputs = definition['inputs']
-            # TODO: Validty check. Two elements must be provided in a compose column. (If not two, then they had to be converted to only two by merging them.)
-
-            # Link column (first segment) has to be evaluated
-            link_column_name = next(iter(inputs), None)
-            link_column_definitions = self.table.get_definitions_for_columns(link_column_name)
-            link_column_definition = next(iter(link_column_definitions), None)
-            dependencies.append(link_column_definition)
+            # Link columns of all segments have to be evaluated and their linked tables have to be populated
+            hops, linked_table, linked_column_name = self._get_compose_path()
+            for table, link_column_name, next_table in hops:
+                dependencies.extend(table.get_definitions_for_columns(link_column_name))
+                dependencies.append(next_table)
 
-            # Linked column path (tail) in the linked table has to exist (recursion)
-            linked_table_name = link_column_definition.column_json['linked_table']
-            linked_table = self.table.workflow.get_table(linked_table_name)
-            linked_column_name = inputs[1] if len(inputs) > 1 else None
+            # The last column of the path might not have a definition, e.g., an attribute
+            dependencies.extend(linked_table.get_definitions_for_columns(linked_column_name))
 
-            linked_column_definitions = linked_table.get_definitions_for_columns(linked_column_name)
-            linked_column_definition = next(iter(linked_column_definitions), None)
-            if linked_column_definition:  # A linked column might not have a definition, e.g., an attribute
-                dependencies.append(linked_column_definition)
-            # Here we assume that the tail dependencies will be retrieved separately.
-            # Alternatively, we could retrieve them here using recursion
-
-            # Lined table has to be populated. (Yet, it will added to dependency by the link column.)
-            dependencies.append(linked_table)
+            dependencies = [x for x in dependencies if x != self]
 
-        elif self.is_op_aggregate():
+        elif self.is_op_aggregate() or self.is_op_accumulate():
             # This table has to be populated
             dependencies.append(self.table)
 
@@ -341,24 +337,97 @@ class Column:
         Evaluate this column.
         Evaluation logic depends on the operation (definition) kind.
         """
-        definition = self.column_json
         operation = self.get_operation()
 
         log.info("---> Start evaluating column '{0}'. Operation '{1}'.".format(self.id, operation))
 
+        out = self.compute()
+        if out is None:
+            return
+
+        #
+        # Append the newly generated column(s) to this table
+        #
+        self._append_output_columns(out)
+
+        log.info("<--- Finish evaluating column '{0}'".format(self.id))
+
+    def compute(self):
+        """
+        Compute the output of this column without attaching it to the table.
+        It is used by the executor which can compute many columns simultaneously and then attach their results.
+        Return None if the column cannot be evaluated.
+        """
+        definition = self.column_json
+        operation = self.get_operation()
+
         # Link columns use their own definition schema different from computaional (functional) definitions
         if self.is_op_link():
-            out = self._evaluate_link()
-            self._append_output_columns(out)
-            self.data.append(out)
-            return
+            return self._evaluate_link()
 
         # Compose columns use their own definition schema different from computaional (functional) definitions
         if self.is_op_compose():
-            out = self._evaluate_compose()
-            self._append_output_columns(out)
-            self.data.append(out)
-            return
+            return self._evaluate_compose()
+
+        if self.is_op_aggregate():  # Aggregate functions consume facts from another table
+            func, model = self._prepare_function_and_model()
+            if func is None or model is None:
+                return None
+            return self._evaluate_aggregate(func, model)
+
+        if self.is_op_accumulate():  # Accumulate functions update groups by facts from another table
+            func, model = self._prepare_function_and_model()
+            if func is None or model is None:
+                return None
+            return self._evaluate_accumulate(func, model)
+
+        elif self.is_op_calc():  # Computational functions consume this table records
+            args = self.prepare_calc()
+            if args is None:
+                return None
+            return self._evaluate_calc(*args)
+
+        else:
+            log.warning("Unknown operation '{0}'. Skip column definition.".format(operation))
+            return None
+
+    def prepare_calc(self):
+        """
+        Prepare all arguments of a calculate, roll or all column: function, input data, data type and model.
+        The returned arguments do not reference this table and hence the evaluation can be done in another thread or process.
+        Return None if the column cannot be evaluated.
+        """
+        definition = self.column_json
+
+        func, model = self._prepare_function_and_model()
+        if func is None or model is None:
+            return None
+
+        #
+        # Prepare input data argument to pass to the function (as the first argument)
+        #
+        data = self.table.get_data()
+
+        inputs = definition.get('inputs', [])
+        inputs = get_columns(inputs, data)
+        if inputs is None:
+            log.warning("Error reading column list. Skip column definition.")
+            return None
+
+        # Validation: check if all explicitly specified columns available
+        if not all_columns_exist(inputs, data):
+            log.warning("Not all columns available. Skip column definition.".format())
+            return None
+
+        data = data[inputs]  # Select only the specified input columns
+
+        data_type = definition.get('data_type')
+
+        return func, data, data_type, model
+
+    def _prepare_function_and_model(self):
+        """Resolve the function and prepare its model. Return None for the function if the column cannot be evaluated."""
+        definition = self.column_json
 
         #
         # Resolve the function
@@ -366,12 +435,12 @@ class Column:
         func_name = definition.get('function')
         if not func_name:
             log.warning("Column function is not specified. Skip column definition.".format(func_name))
-            return
+            return None, None
 
         func = resolve_full_name(func_name)
         if not func:
             log.warning("Cannot resolve user-defined function '{0}'. Skip column definition.".format(func_name))
-            return
+            return None, None
 
         #
         # Prepare model object to pass to the function (as the second argument)
@@ -383,59 +452,29 @@ class Column:
         # Or it can be returned y the provided (training) procedure which
         # We pass inputs because 1) they are already prepared 2) we might need them for training
         model = self.prepare_model(definition)
-        if model is None:
-            return
-
-        if self.is_op_aggregate():  # Aggregate functions consume facts from another table
-
-            out = self._evaluate_aggregate(func, model)
-
-        elif self.is_op_calc():  # Computational functions consume this table records
-            #
-            # Prepare input data argument to pass to the function (as the first argument)
-            #
-            data = self.table.data
-
-            inputs = definition.get('inputs', [])
-            inputs = get_columns(inputs, data)
-            if inputs is None:
-                log.warning("Error reading column list. Skip column definition.")
-                return
-
-            # Validation: check if all explicitly specified columns available
-            if not all_columns_exist(inputs, data):
-                log.warning("Not all columns available. Skip column definition.".format())
-                return
-
-            data = data[inputs]  # Select only the specified input columns
 
-            data_type = definition.get('data_type')
+        return func, model
 
-            #
-            # Evaluate column depending on the operation type
-            #
-            if self.is_op_one():
-                out = self._evaluate_calculate(func, data, data_type, model)
-            elif self.is_op_roll():
-                out = self._evaluate_roll(func, data, data_type, model)
-            elif self.is_op_all():
-                out = self._evaluate_all(func, data, data_type, model)
-            else:
-                log.warning("Unknown operation '{0}'. Skip column definition.".format(operation))
-                return
+    def _evaluate_calc(self, func, data, data_type, model):
+        """Evaluate a calculate, roll or all column depending on its window."""
+        if self.is_op_one():
+            out = self._evaluate_calculate(func, data, data_type, model)
+        elif self.is_op_roll():
+            out = self._evaluate_roll(func, data, data_type, model)
+        elif self.is_op_all():
+            out = self._evaluate_all(func, data, data_type, model)
         else:
-            log.warning("Unknown operation '{0}'. Skip column definition.".format(operation))
-            return
-
-        #
-        # Append the newly generated column(s) to this table
-        #
-        self._append_output_columns(out)
-
-        log.info("<--- Finish evaluating column '{0}'".format(self.id))
+            log.warning("Unknown operation '{0}'. Skip column definition.".format(self.get_operation()))
+            return None
+        return out
 
-    def _append_output_columns(self, out):
-        """The specified column(s) are appended to this table."""
+    def _append_output_columns(self, out, rank=None, ranks=None):
+        """
+        The specified column(s) are appended to this table.
+        If the rank of this operation is specified, then new columns are inserted after all columns produced by operations with lower ranks.
+        It is used when columns are evaluated in an arbitrary order but we want to get the same order of columns as in sequential execution.
+        The ranks of existing columns are stored in the provided dictionary (the columns without a rank are assumed to precede all others).
+        """
 
         definition = self.column_json
         outputs = self.get_outputs()
@@ -482,18 +521,24 @@ class Column:
                 attached_column_name = outputs[i]
             else:  # Same name - overwrite input column
                 inputs = definition.get('inputs', [])
-                inputs = get_columns(inputs, self.table.data)
+                inputs = get_columns(inputs, self.table.get_data())
                 attached_column_name = inputs[i]
 
             #
             # Attach this new column name to the table data frame
             #
-            self.table.data[attached_column_name] = out[c]  # A column is attached by matching indexes so indexes have to be consistent (the same)
+            loc = None
+            columns = self.table.get_data().columns
+            if rank is not None and ranks is not None and attached_column_name not in columns:
+                loc = sum(1 for x in columns if ranks.get(x, -1) <= rank)
+                ranks[attached_column_name] = rank
 
-            self.data.append(self.table.data[attached_column_name])  # Note that a column definition may generate many column objects
+            self.table.set_column(attached_column_name, out[c], loc)  # A column is attached by matching indexes so indexes have to be consistent (the same)
 
             if fillna_value is not None:
-                self.table.data[attached_column_name].fillna(fillna_value, inplace=True)
+                self.table.set_column(attached_column_name, self.table.get_data()[attached_column_name].fillna(fillna_value))
+
+            self.data.append(self.table.get_data()[attached_column_name])  # Note that a column definition may generate many column objects
 
     def _evaluate_all(self, func, data, data_type, model):
         """
@@ -526,6 +571,23 @@ class Column:
         Calculate column evaluation. Apply function to each row of the table.
         """
 
+        #
+        # Vectorized functions are applied to whole columns (declared in the definition or detected automatically)
+        #
+        vectorized = self.column_json.get('vectorized')
+        if vectorized is None:
+            vectorized = is_vectorized_function(func, len(data.columns) if isinstance(data, pd.DataFrame) else 1)
+        if vectorized:
+            return self._evaluate_calculate_vectorized(func, data, data_type, model)
+
+        #
+        # Compiled engine: the function and the loop over rows are compiled (fall back to the standard evaluation if not possible)
+        #
+        if self.get_engine() == 'numba' and isinstance(data, pd.DataFrame):
+            out = evaluate_rows(func, data, model)
+            if out is not None:
+                return out
+
         #
         # Single input: Apply to a series. UDF will get single value
         #
@@ -558,6 +620,42 @@ class Column:
 
         return out
 
+    def _evaluate_calculate_vectorized(self, func, data, data_type, model):
+        """
+        Calculate column evaluation by one call of the function which gets whole input columns and returns a column.
+        A single input is passed as a Series (or 1-d ndarray) and multiple inputs as a DataFrame (or 2-d ndarray).
+        NumPy universal functions get multiple inputs as separate arguments.
+        """
+
+        if isinstance(data, pd.DataFrame) and len(data.columns) == 1:
+            data = data[data.columns[0]]
+
+        if data_type == 'ndarray':
+            data_arg = data.values
+        else:
+            data_arg = data
+
+        if isinstance(func, np.ufunc) and isinstance(data, pd.DataFrame):
+            args = [data_arg[:, i] for i in range(data_arg.shape[1])] if data_type == 'ndarray' else [data_arg[c] for c in data_arg.columns]
+        else:
+            args = [data_arg]
+
+        if isinstance(model, dict):
+            out = func(*args, **model)  # Model as keyword arguments
+        elif isinstance(model, (list, tuple)):
+            out = func(*args, *model)  # Model as positional arguments
+        else:
+            out = func(*args, model)  # Model as an arbitrary object
+
+        # Results without index (like ndarray) get the index of the input rows
+        if isinstance(out, np.ndarray):
+            if out.ndim == 1:
+                out = pd.Series(out, index=data.index)
+            else:
+                out = pd.DataFrame(out, index=data.index)
+
+        return out
+
     def _evaluate_roll(self, func, data, data_type, model):
         """
         Roll column evaluation. Apply function to each window of the table.
@@ -573,6 +671,32 @@ class Column:
         rolling_args = {'window': window_size}
         # TODO: try/catch with log message if cannot get window size
 
+        #
+        # Well-known reducers (mean, sum, max etc.) are replaced by built-in rolling aggregations of pandas which are not called for each window
+        #
+        aggregation = get_rolling_aggregation(func)
+        if aggregation is not None and len(data.columns) == 1 and not model and pd.api.types.is_numeric_dtype(data[data.columns[0]]):
+            name, kwargs = aggregation
+
+            # Columns of one family which differ only in their window size are evaluated together in one pass over the input
+            out = self._evaluate_window_family(name, data[data.columns[0]], window_size)
+            if out is not None:
+                return out
+
+            by_window = data[data.columns[0]].rolling(**rolling_args, min_periods=window_size)
+            out = getattr(by_window, name)(**kwargs)
+            if name == 'count':
+                out = out.where(out >= window_size)  # Windows with missing values produce missing values
+            return out
+
+        #
+        # Compiled engine: the function and the loop over windows are compiled (fall back to the standard evaluation if not possible)
+        #
+        if self.get_engine() == 'numba':
+            out = evaluate_windows(func, data, window_size, model)
+            if out is not None:
+                return out
+
         #
         # Single input. Moving aggregation of one input column. Function will get a sub-series as a data argument
         #
@@ -595,21 +719,75 @@ class Column:
         else:
 
             #
-            # Workaround: create a new temporary data frame with all row ids, create a rolling object by using it, apply UDF to it, the UDF will get a window/group of row ids which can be then used to access this window rows from the main data frame:
-            # Link: https://stackoverflow.com/questions/45928761/rolling-pca-on-pandas-dataframe
+            # Windows are read-only strided views of one 2-d array with the input columns (no data is copied for each window)
+            # A data frame is created for each window (sharing the data of the view) only if the function does not expect an ndarray
             #
+            values = data.values
+            if len(values) >= window_size:
+                windows = np.lib.stride_tricks.sliding_window_view(values, window_size, axis=0).transpose(0, 2, 1)  # Shape: (windows, window_size, inputs)
+            else:
+                windows = []
 
-            df_idx = pd.DataFrame(np.arange(data.shape[0]))  # Temporary data frame with all row ids like 0,1,2,...
-            idx_window = df_idx.rolling(**rolling_args)  # Create rolling object from ids-frame
-
-            # Auxiliary function creates a subframe with data and passes it to the user function
-            def window_fn(ids, user_f):
-                return user_f(data.iloc[ids])
+            if data_type == 'ndarray':
+                results = [func(w, **model) for w in windows]
+            elif len(set(data.dtypes)) == 1:
+                columns = data.columns
+                index = data.index
+                results = [func(pd.DataFrame(w, index=index[i:i+window_size], columns=columns, copy=False), **model) for i, w in enumerate(windows)]
+            else:
+                # Columns of different types cannot be represented by one array without losing their types
+                results = [func(data.iloc[i:i+window_size], **model) for i in range(len(windows))]
 
-            out = idx_window.apply(lambda x: window_fn(x, func))
+            out = pd.Series([np.nan] * min(window_size - 1, len(data)) + results, index=data.index)
 
         return out
 
+    def _evaluate_window_family(self, name, ser, window_size):
+        """
+        Evaluate the rolling aggregation for this column and all columns of its family which differ only in their window size.
+        The results for other columns are stored in them and will be used when they are evaluated if their input is the same.
+        Columns without a family (e.g., evaluated in another process) are evaluated in the same way so that the results do not depend on the executor.
+        Return None if the aggregation cannot be evaluated for many windows.
+        """
+        if name not in family_aggregations:
+            return None
+
+        if not self.family:
+            results = evaluate_window_family(name, ser.values, [window_size])
+            return None if results is None else pd.Series(results[0], index=ser.index, name=ser.name)
+
+        with self.family_lock:  # Other columns of the family wait for the results instead of computing them again
+            result, self.family_result = self.family_result, None
+            if result is not None:
+                values, out = result
+                if out.index.equals(ser.index) and np.array_equal(values, ser.values, equal_nan=True):
+                    return out
+
+            siblings = [c for c in self.family if c is not self and c._is_window_sibling(self)]
+            windows = [window_size] + [int(c.column_json.get('window')) for c in siblings]
+            results = evaluate_window_family(name, ser.values, windows)
+            if results is None:
+                return None
+
+            outs = [pd.Series(r, index=ser.index, name=ser.name) for r in results]
+            for column, out in zip(siblings, outs[1:]):
+                column.family_result = (ser.values, out)
+
+        return outs[0]
+
+    def _is_window_sibling(self, column):
+        """Determine if the definitions of this and the specified roll column differ only in their window size."""
+        if not self.is_op_roll():
+            return False
+        try:
+            int(self.column_json.get('window'))
+        except (TypeError, ValueError):
+            return False
+        ignored = ['id', 'outputs', 'window', 'executor', 'cost']
+        this = {k: v for k, v in self.column_json.items() if k not in ignored}
+        that = {k: v for k, v in column.column_json.items() if k not in ignored}
+        return this == that
+
     def _evaluate_aggregate(self, func, model):
         """
         Aggregate column evaluation. Apply function to each group of the fact table.
@@ -636,7 +814,7 @@ class Column:
         #
         # Build input fact frame to pass to the function
         #
-        data = fact_table.data
+        data = fact_table.get_data()
 
         inputs = definition.get('inputs', [])
         inputs = get_columns(inputs, data)
@@ -653,193 +831,271 @@ class Column:
 
         data_type = definition.get('data_type')
 
+        # Group codes are row positions of groups stored in the link column (negative for facts without a group)
+        grouping = group_column._get_grouping(self.table)
+        codes = grouping.codes
+        size = grouping.size
+
+        #
+        # Well-known reducers are evaluated by compiled kernels directly over group codes
+        #
+        aggregation = ('size', {}) if len(inputs) == 0 else get_group_aggregation(func)
+        if aggregation is not None and (not model or len(inputs) == 0):
+            name, kwargs = aggregation
+            if len(inputs) == 0:
+                values = codes
+            elif len(inputs) == 1:
+                values = data[inputs[0]].values
+            else:
+                values = data.values
+            out = evaluate_group_aggregation(name, kwargs, codes, values, size)
+            if out is not None:
+                return pd.Series(out, index=self.table.get_data().index)
+
         #
-        # Retrieve or build a groupby object for the link column used for grouping
+        # Facts are sorted by groups and the function gets a slice with the facts of each group
+        # Single input: udf will get a sub-series with fact values. Multiple inputs: udf will get a sub-dataframe (or ndarray)
         #
-        gb = group_column._get_groupby()
+        order, offsets = grouping.get_segments()
+        facts = data[inputs[0]] if len(inputs) == 1 else data
+        facts = facts.iloc[order]  # The only copy of the input columns
+        if data_type == 'ndarray':
+            facts = facts.values
 
-        if len(inputs) == 0:  # Special case: no input columns (or function is size()
-            out = gb.size()
-        if len(inputs) == 1:  # Single input: udf will get a sub-series with fact values
-            out = gb[inputs[0]].agg(func, **model)  # Apply function to all groups
-        else:  # Multiple inputs. Function will get a sub-dataframe as a data argument
-            pass
+        groups = np.flatnonzero(offsets[1:] > offsets[:-1])  # Groups without facts are not passed to the function
+        if data_type == 'ndarray':
+            results = [func(facts[offsets[g]:offsets[g+1]], **model) for g in groups]
+        else:
+            results = [func(facts.iloc[offsets[g]:offsets[g+1]], **model) for g in groups]
 
-        return out
+        return pd.Series(results, index=self.table.get_data().index[groups], dtype=None if results else np.float64)
 
-    def _evaluate_link(self):
+    def _evaluate_accumulate(self, func, model):
         """
-        Link column evaluation. Generate a column with row ids of the target table.
+        Accumulate column evaluation. The value of each group is updated by the function for each fact of this group: value = func(value, *fact_values, **model).
+        The values of groups are retained and if new facts are appended to the fact table (and new groups to this table), then only the new facts are processed.
         """
 
+        definition = self.column_json
+
         #
-        # Read and validate parameters
+        # Get parameters
         #
 
-        column_name = self.id
-
-        definition = self.column_json
-
-        main_table = self.table
+        fact_table_name = definition.get('fact_table')
+        fact_table = self.table.workflow.get_table(fact_table_name)
+        if fact_table is None:
+            log.error("Cannot find the fact table '{0}'.".format(fact_table_name))
+            return
 
-        main_keys = definition.get('keys', [])
-        if not all_columns_exist(main_keys, main_table.data):
-            log.error("Not all key columns available in the link column definition.".format())
+        group_column_name = definition.get('group_column')
+        if group_column_name not in fact_table.get_data().columns:
+            log.error("Cannot find the group column '{0}'.".format(group_column_name))
             return
 
-        linked_table_name = definition.get('linked_table', '')
-        linked_table = self.table.workflow.get_table(linked_table_name)
-        if not linked_table:
-            log.error("Linked table '{0}' cannot be found in the link column definition..".format(linked_table))
+        inputs = definition.get('inputs', [])
+        inputs = get_columns(inputs, fact_table.get_data())
+        if inputs is None:
+            log.warning("Error reading column list. Skip column definition.")
             return
 
-        linked_keys = definition.get('linked_keys', [])
-        if not all_columns_exist(linked_keys, linked_table.data):
-            log.error("Not all linked key columns available in the link column definition.".format())
+        # Validation: check if all explicitly specified columns available
+        if not all_columns_exist(inputs, fact_table.get_data()):
+            log.warning("Not all columns available. Skip column definition.".format())
             return
 
-        #
-        # 1. Create a column with index values in the target table with the name of the link column.
-        #
-        """
-        INFO:
-        df['index1'] = df.index  # Copy
-        # Use df.reset_index for converting existing index to a column. After that, we AGAIN create an index.
-        # The goal is to preserve the old index even if it is not a continuous range
-        df.reset_index().set_index('index', drop=False)
-        # Or
-        df.reset_index(inplace=True)
-        df.set_index('index', drop=False, inplace=True)
-        # Or
-        df = df.rename_axis('index1').reset_index() # New index1 column will be created
-        """
+        initial = definition.get('initial')
+        state_ref = definition.get('state')  # Reference to a file where the state is stored between executions
 
-        index_column_name = '__row_id__' # It could be 'id', 'index' or whatever other convention
-        linked_table.data[index_column_name] = linked_table.data.index
+        facts = fact_table.get_data()
+        groups_index = self.table.get_data().index
+        codes = _get_positions(groups_index, facts[group_column_name].values)
 
         #
-        # 2. Create left join on the specified keys
+        # Continue from the retained values if the previous facts (their inputs and groups) have not changed (new rows were only appended)
         #
+        state = self.accumulated
+        if state is None and isinstance(state_ref, str) and state_ref.startswith('$'):
+            state = get_value(state_ref)
+
+        # The facts are hashed once: the hash of the previous facts is checked and then it is continued by the new facts
+        h = hashlib.sha256()
+        h.update(json.dumps(list(map(str, inputs))).encode('utf-8'))
+
+        start = 0
+        values = [initial] * len(groups_index)
+        hashed = 0  # Number of facts in the hash
+        if isinstance(state, dict):
+            rows = state.get('rows', 0)
+            previous = state.get('values', [])
+            if rows <= len(facts):
+                _hash_facts(h, facts, inputs, codes, 0, rows)
+                hashed = rows
+            if hashed == rows and len(previous) <= len(groups_index) and state.get('hash') == h.hexdigest():
+                start = rows
+                values = list(previous) + [initial] * (len(groups_index) - len(previous))  # New groups start from the initial value
+            else:
+                log.info("Facts of column '{0}' have changed. Process all facts.".format(self.id))
+        _hash_facts(h, facts, inputs, codes, hashed, len(facts))
 
-        linked_prefix = column_name+'::'  # It will prepended to each linked (secondary) column name
-
-        out_df = pd.merge(
-            main_table.data,  # This table
-            linked_table.data.rename(columns=lambda x: linked_prefix + x, inplace=False),  # Target table to link to. We rename columns (not in place - the original frame preserves column names)
-            how='left',  # This (main) table is not changed - we attach target records
-            left_on=main_keys,  # List of main table key columns
-            right_on= [linked_prefix + x for x in linked_keys],  # List of target table key columns. Note that we renamed them above so we use modified names.
-            left_index=False,
-            right_index=False,
-            #suffixes=('', linked_suffix),  # We do not use suffixes because they cannot be enforced (they are used only in the case of equal column names)
-            sort=False  # Sorting decreases performance
-        )
-        # Here we get linked column names like 'Prefix::OriginalName'
+        log.debug("Accumulate {0} new facts (of {1}).".format(len(facts) - start, len(facts)))
 
         #
-        # 3. Rename according to our convention and store the result
+        # Update the groups by the new facts
         #
+        fact_values = zip(*[facts[x].values[start:] for x in inputs])
 
-        # Rename our link column by using only specified column name
-        out_df.rename({column_name+'::'+index_column_name: column_name}, axis='columns', inplace=True)
+        for code, fact in zip(codes[start:], fact_values):
+            if code >= 0:  # Facts without a group are skipped
+                values[code] = func(values[code], *fact, **model)
 
-        out = out_df[column_name]
+        out = pd.Series(values, index=groups_index, name=self.id)
 
-        # Store the result df with all target columns (in the case they are used in other definitions)
-        #main_table.data = out_df
-        # ??? If the result df includes all columns of this df, then why not to simply replace this df by the new df?
-        # ??? What if this df already has some linked (tareget) columns from another table attached before?
-        # ??? What if the target table already has linked (target) columns from its own target table (recursive)?
+        self.accumulated = {'rows': len(facts), 'hash': h.hexdigest(), 'values': out.tolist()}
+        if isinstance(state_ref, str) and state_ref.startswith('$'):
+            set_value(state_ref, self.accumulated)
 
         return out
 
-    def _evaluate_compose(self):
+    def _evaluate_link(self):
         """
-        Compose column evaluation. Materialize a composition of one link column and one linked (target) column.
+        Link column evaluation. Generate a column with row ids of the target table.
         """
 
-        definition = self.column_json
-
         #
         # Read and validate parameters
         #
 
-        inputs = definition['inputs']
-        # TODO: Validty check. Two elements must be provided in a compose column. (If not two, then they had to be converted to only two by merging them.)
+        column_name = self.id
+
+        definition = self.column_json
 
-        # Link column (first segment) has to be evaluated
-        link_column_name = next(iter(inputs), None)
-        link_column_definitions = self.table.get_definitions_for_columns(link_column_name)
-        link_column_definition = next(iter(link_column_definitions), None)
-        #dependencies.append(link_column_definition)
+        main_table = self.table
 
-        # Linked column path (tail) in the linked table has to exist (recursion)
-        linked_table_name = link_column_definition.column_json['linked_table']
+        main_keys = definition.get('keys', [])
+        if not all_columns_exist(main_keys, main_table.get_data()):
+            log.error("Not all key columns available in the link column definition.".format())
+            return
+
+        linked_table_name = definition.get('linked_table', '')
         linked_table = self.table.workflow.get_table(linked_table_name)
-        linked_column_name = inputs[1] if len(inputs) > 1 else None
+        if not linked_table:
+            log.error("Linked table '{0}' cannot be found in the link column definition..".format(linked_table))
+            return
 
-        linked_column_definitions = linked_table.get_definitions_for_columns(linked_column_name)
-        linked_column_definition = next(iter(linked_column_definitions), None)
-        #dependencies.append(linked_column_definition)
-        # Here we assume that the tail dependencies will be retrieved separately.
-        # Alternatively, we could retrieve them here using recursion
+        linked_keys = definition.get('linked_keys', [])
+        if not all_columns_exist(linked_keys, linked_table.get_data()):
+            log.error("Not all linked key columns available in the link column definition.".format())
+            return
 
         #
-        # 2. Merge this table with the target table using this table link segment and target table index (row id), by actually selecting only the target segment
+        # If the linked table is a projection of this table along these keys, then the row ids are already known from projection
         #
+        row_ids = linked_table.get_projection_codes(main_table, main_keys, linked_keys)
+        if row_ids is not None:
+            return pd.Series(row_ids, index=main_table.get_data().index, name=column_name)
 
-        linked_prefix = link_column_name + '::'  # It will prepended to each linked (secondary) column name
-
-        out_df = pd.merge(
-            self.table.data,
-            linked_table.data.rename(columns=lambda x: linked_prefix + x, inplace=False),  # Target table to link to. We rename columns (not in place - the original frame preserves column names)
-            how='left',  # This (main) table is not changed - we attach target records
-            left_on=link_column_name,
-            right_on=None,
-            left_index=False,
-            right_index=True,  # Use index because link column stores index values
-            #suffixes=('', linked_suffix),  # We do not use suffixes because they cannot be enforced (they are used only in the case of equal column names)
-            sort=False  # Sorting decreases performance
-        )
-        # Here we get linked column names like 'Prefix::OriginalName'
+        #
+        # 1. Find the index of linked key values (it is shared by all link columns with these linked keys)
+        #
+        index, positions = linked_table.get_key_index(linked_keys)
 
         #
-        # 3. Select one column, rename it if necessary
+        # 2. Look up the main key values in the index. Only the key columns are used (and no tables are merged)
         #
+        if len(main_keys) == 1:
+            keys = main_table.get_data()[main_keys[0]]
+            # Missing keys (None or NaN) match a missing linked key like in merge
+            missing_keys = np.flatnonzero(index.isna())
+            missing_position = missing_keys[0] if len(missing_keys) else -1
+            if isinstance(keys.dtype, pd.CategoricalDtype):
+                # Only categories are looked up and rows get the positions of their categories by codes (missing value is the last one with code -1)
+                found = np.append(index.get_indexer(keys.cat.categories), missing_position)
+                found = found[keys.cat.codes.values]
+            else:
+                found = index.get_indexer(keys)
+                found[keys.isna().values] = missing_position
+        else:
+            found = index.get_indexer(pd.MultiIndex.from_frame(main_table.get_data()[main_keys]))
 
-        column_name = link_column_name + '::' + linked_column_name  # If no name specified, then automatically generate by concatenating two segments
+        #
+        # 3. Convert positions to the row ids of the linked table (missing values if the keys are not found)
+        #
+        missing = found < 0
+        if missing.all():
+            row_ids = np.full(len(found), np.nan)
+        else:
+            row_ids = linked_table.get_data().index.values[positions[found]]  # Positions of not found keys (-1) are replaced below
+            if missing.any():
+                row_ids = np.where(missing, np.nan, row_ids)
 
-        out = out_df[column_name]
+        out = pd.Series(row_ids, index=main_table.get_data().index, name=column_name)
 
         return out
 
-    def _get_groupby(self):
-        """Return a pandas groupby object for the link column. If it is not present then it is returned."""
+    def _evaluate_compose(self):
+        """
+        Compose column evaluation. Materialize a column path which starts from a link column of this table and ends with a column of the last linked table.
+        The values are gathered by row positions hop by hop without merging tables and without materializing intermediate columns of the path.
+        """
 
-        definition = self.column_json
+        hops, linked_table, linked_column_name = self._get_compose_path()
+        if not all(link_column_name in table.get_data().columns for table, link_column_name, _ in hops):
+            log.error("Not all link columns of the path available in the compose column definition '{0}'.".format(self.id))
+            return
+        if linked_column_name not in linked_table.get_data().columns:
+            log.error("Linked column '{0}' not available in the compose column definition '{1}'.".format(linked_column_name, self.id))
+            return
 
-        if self.groupby is not None:
-            return self.groupby
+        positions = None  # All rows of this table
+        for table, link_column_name, next_table in hops:
+            row_ids = table.get_data()[link_column_name].values
+            if positions is not None:
+                row_ids = pd.api.extensions.take(row_ids, positions, allow_fill=True)
+            positions = _get_positions(next_table.get_data().index, row_ids)
 
-        main_table = self.table
-        column_name = self.id
-        main_keys = definition.get('keys', [])
-        linked_keys = definition.get('linked_keys', [])
+        values = pd.api.extensions.take(linked_table.get_data()[linked_column_name].values, positions, allow_fill=True)
 
-        # Use link column (with target row ids) to build a groupby object (it will build a group for each target row id)
-        try:
-            gb = main_table.data.groupby(column_name, as_index=True)
-            # Alternatively, we could use target keys or main keys
-        except Exception as e:
-            log.error("Error grouping input table using the specified column(s).".format())
-            log.debug(e)
-            raise e
+        out = pd.Series(values, index=self.table.get_data().index, name=self.id)
+
+        return out
+
+    def _get_compose_path(self):
+        """
+        Return the segments of the column path of this compose column.
+        The inputs are a list of segment names where each segment can be also a path like 'Link::Column'.
+        The path is represented by a list of (table, link column name, linked table) for all link segments, and the last table and column name.
+        """
+        segments = []
+        for x in self.get_inputs():
+            segments.extend([s.strip() for s in x.split('::')])
+
+        hops = []
+        table = self.table
+        for link_column_name in segments[:-1]:
+            link_column_definition = next(iter(table.get_definitions_for_columns(link_column_name)), None)
+            linked_table_name = link_column_definition.column_json['linked_table'] if link_column_definition else None
+            linked_table = self.table.workflow.get_table(linked_table_name)
+            # TODO: Validity check: each segment except for the last one must be a link column
+            hops.append((table, link_column_name, linked_table))
+            table = linked_table
 
-        # TODO: We might want to remove a group for null value (if it is created by the groupby constructor)
+        return hops, table, segments[-1]
 
-        self.groupby = gb
+    def _get_grouping(self, group_table):
+        """
+        Return the grouping of the facts of this table by this link column into the rows of the group table.
+        Groupings are cached in the workflow and shared by all aggregate columns until the data of the tables or this link column are changed.
+        """
+        fact_table = self.table
+        key = (fact_table.id, self.id, group_table.id)
+        versions = fact_table.get_data_version([self.id]) + group_table.get_data_version()
 
-        return gb
+        def build():
+            codes = _get_positions(group_table.get_data().index, fact_table.get_data()[self.id].values)
+            return Grouping(codes, len(group_table.get_data()))
+
+        return fact_table.workflow.groupings.get(key, versions, build)
 
     def prepare_model(self, definition):
         """
@@ -860,7 +1116,14 @@ class Column:
             model = model_ref
 
         train = definition.get('train')
-        if model is None and train:
+        if isinstance(train, dict) and train.get('incremental'):
+
+            # The previous model is updated by the rows which have been appended since its training
+            model = self.update_model(definition, inputs, model, model_ref)
+            if model is None:
+                return None
+
+        elif model is None and train:
 
             model = self.train_model(definition, inputs)
             if model is None:
@@ -879,9 +1142,105 @@ class Column:
     def train_model(self, definition, inputs):
 
         train = definition.get('train')
-        table = self.table.data
+        data_type = definition.get('data_type')
+
+        selected = self._get_train_data(definition, inputs)
+        if selected is None:
+            return None
+        train_func, train_data, train_labels, train_model = selected
+
+        # Find a model trained on the same data with the same parameters
+        cache = self.table.workflow.train_cache
+        fingerprint = None
+        if cache is not None:
+            fingerprint = cache.get_train_fingerprint(train, train_data, train_labels, data_type)
+        if fingerprint is not None:
+            found, model = cache.get(fingerprint)
+            if found:
+                log.info("Load trained model of column '{0}' from cache.".format(self.id))
+                return model
+
+        if train.get('chunksize'):
+            model = self._fit_chunks(train_func, train_data, train_labels, train_model, None, int(train.get('chunksize')), data_type)
+        else:
+            model = _fit(train_func, train_data, train_labels, train_model, data_type)
+
+        if fingerprint is not None and model is not None:
+            cache.put(fingerprint, model)
 
+        return model
+
+    def update_model(self, definition, inputs, model, model_ref):
+        """
+        Update the previous model by the training rows which have been appended since it was trained (or train a new model from all rows if there is no previous model).
+        The train function gets the previous model (or None) in the 'model' argument and returns the updated model.
+        The training state (the number of training rows and a hash of their row ids, values and labels) is stored in a file next to the model file or in this object.
+        If the previous training rows (or their labels) have changed (not only new rows are appended), then the model is trained from scratch.
+        """
+        train = definition.get('train')
         data_type = definition.get('data_type')
+        is_ref = isinstance(model_ref, str) and model_ref.startswith('$')
+
+        selected = self._get_train_data(definition, inputs)
+        if selected is None:
+            return None
+        train_func, train_data, train_labels, train_model = selected
+
+        # Previous state of training
+        if is_ref:
+            state = get_value(model_ref + '.json') if model is not None else None
+        elif self.trained is not None:
+            model, state = self.trained
+        else:
+            state = None
+
+        rows = 0
+        if model is not None and isinstance(state, dict):
+            rows = state.get('rows', 0)
+            if rows > len(train_data) or state.get('hash') != _hash_training(train_data, train_labels, rows):
+                log.info("Training rows of column '{0}' have changed. Train the model from scratch.".format(self.id))
+                model, rows = None, 0
+        elif model is not None:
+            log.info("No training state is stored for the model of column '{0}'. Train the model from scratch.".format(self.id))
+            model = None
+
+        if rows == len(train_data) and model is not None:
+            return model  # No new rows
+
+        log.info("Update model of column '{0}' by {1} new rows.".format(self.id, len(train_data) - rows))
+
+        new_data = train_data.iloc[rows:]
+        new_labels = train_labels.iloc[rows:] if train_labels is not None else None
+        chunksize = int(train.get('chunksize') or len(new_data))
+        model = self._fit_chunks(train_func, new_data, new_labels, train_model, model, chunksize, data_type)
+        if model is None:
+            return None
+
+        state = {'rows': len(train_data), 'hash': _hash_training(train_data, train_labels, len(train_data))}
+        if is_ref:
+            set_value(model_ref, model)
+            set_value(model_ref + '.json', state)
+        else:
+            self.trained = (model, state)
+
+        return model
+
+    def _fit_chunks(self, train_func, train_data, train_labels, train_model, model, chunksize, data_type):
+        """Feed the rows to the train function in chunks. Each call gets the model returned by the previous call (None for the first call)."""
+        for start in range(0, len(train_data), max(chunksize, 1)):
+            data = train_data.iloc[start:start + chunksize]
+            labels = train_labels.iloc[start:start + chunksize] if train_labels is not None else None
+            model = _fit(train_func, data, labels, dict(train_model or {}, model=model), data_type)
+            if model is None:
+                log.warning("Train function of column '{0}' returned no model.".format(self.id))
+                return None
+        return model
+
+    def _get_train_data(self, definition, inputs):
+        """Return the train function, the selected training data, labels and the parameters of training or None if they cannot be selected."""
+
+        train = definition.get('train')
+        table = self.table.data
 
         # 1. Resolve train function
         train_func_name = train.get('function')
@@ -934,26 +1293,61 @@ class Column:
         # 4. Retrieve hyper-model
         train_model = train.get('model', {})
 
-        # Cast data argument
-        if data_type == 'ndarray':
-            data_arg = train_data.values
-            if train_labels is not None:
-                labels_arg = train_labels.values
+        return train_func, train_data, train_labels, train_model
+
+def _fit(train_func, train_data, train_labels, train_model, data_type):
+    """Call the function and generate a model."""
+
+    # Cast data argument
+    if data_type == 'ndarray':
+        data_arg = train_data.values
+        if train_labels is not None:
+            labels_arg = train_labels.values
+    else:
+        data_arg = train_data
+        if train_labels is not None:
+            labels_arg = train_labels
+
+    if train_labels is None:
+        model = train_func(data_arg, **train_model)
+    else:
+        if train_model is None:
+            model = train_func(data_arg, labels_arg)
         else:
-            data_arg = train_data
-            if train_labels is not None:
-                labels_arg = train_labels
+            model = train_func(data_arg, labels_arg, **train_model)
 
-        # 5. Call the function and generate a model
-        if train_labels is None:
-            model = train_func(data_arg, **train_model)
-        else:
-            if train_model is None:
-                model = train_func(data_arg, labels_arg)
-            else:
-                model = train_func(data_arg, labels_arg, **train_model)
+    return model
 
-        return model
+def _hash_training(train_data, train_labels, rows):
+    """Hash of the first training rows: their row ids, values and labels. It is used to check that the previous training rows have not changed."""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(train_data.iloc[:rows], index=True).values.tobytes())
+    if train_labels is not None:
+        h.update(pd.util.hash_pandas_object(train_labels.iloc[:rows], index=False).values.tobytes())
+    return h.hexdigest()
+
+def _hash_facts(h, facts, inputs, codes, start, end):
+    """
+    Update the hash by the rows of the facts from start to end: their row ids, the values of the input columns and the group codes.
+    Each row is hashed separately so that hashing consecutive ranges of rows produces the same hash as hashing all these rows at once.
+    """
+    if end <= start:
+        return
+    rows = pd.util.hash_pandas_object(facts[inputs].iloc[start:end], index=True).values
+    h.update(np.column_stack([rows, np.asarray(codes[start:end], dtype=np.int64).view(np.uint64)]).tobytes())
+
+def _get_positions(index, row_ids):
+    """Convert row ids (index values of a table) to row positions. Missing or unknown row ids get position -1."""
+    missing = pd.isna(row_ids)
+    if isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1:
+        positions = np.full(len(row_ids), -1, dtype=np.int64)
+        valid = ~missing
+        positions[valid] = np.asarray(row_ids[valid], dtype=np.int64)  # Row ids are positions
+        positions[(positions < 0) | (positions >= len(index))] = -1
+        return positions
+    positions = index.get_indexer(row_ids)
+    positions[missing] = -1
+    return positions
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+__author__="Alexandr Savinov"
+
+import os
+import json
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import logging
+log = logging.getLogger('lambdo.store')
+
+
+class ColumnStore:
+    """
+    The class represents columnar storage of table data: a row index and a contiguous array for each column.
+    New columns are added without copying or consolidating the existing columns (as it happens in wide data frames).
+    Data frames are produced only when they are needed (e.g., to pass data to a function) and they reference the arrays without copying them.
+    It provides the subset of the data frame interface used for reading data: columns, index, len and selection of one or many columns.
+    """
+
+    def __init__(self, frame=None):
+
+        self.index = pd.RangeIndex(0)
+        self.arrays = {}  # Column name -> array (in the order of columns)
+
+        self._frame = None  # Data frame with all columns produced for the current arrays
+        self._columns = None
+
+        if frame is not None:
+            self.set_frame(frame)
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self._columns = pd.Index(list(self.arrays.keys()))
+        return self._columns
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, column_name):
+        return column_name in self.arrays
+
+    def __getitem__(self, key):
+        """Return a series for one column name and a data frame for a list of column names. The arrays are not copied."""
+        if isinstance(key, (list, tuple, pd.Index)):
+            return self.get_frame(list(key))
+        if key not in self.arrays:
+            raise KeyError(key)
+        return pd.Series(self.arrays[key], index=self.index, name=key, copy=False)
+
+    def set_frame(self, frame):
+        """Replace all data by the columns of the data frame. Columns of consolidated frames are contiguous and hence they are not copied."""
+        self.index = frame.index
+        self.arrays = {name: _contiguous(frame[name].values) for name in frame.columns}
+        self._frame = None
+        self._columns = None
+
+    def get_frame(self, column_names=None):
+        """Return a data frame with the specified columns (all columns by default) which references the arrays of this store."""
+        if column_names is None:
+            if self._frame is None:
+                self._frame = self._make_frame(list(self.arrays.keys()))
+            return self._frame
+        return self._make_frame(column_names)
+
+    def set_column(self, column_name, values, loc=None):
+        """
+        Add a new column or replace an existing column.
+        A series is aligned with the index (rows which are absent get missing values). New columns are inserted at the specified position or appended.
+        """
+        if isinstance(values, pd.Series):
+            if not values.index.equals(self.index):
+                values = values.reindex(self.index)
+            values = values.values
+        elif np.ndim(values) == 0:
+            values = np.full(len(self.index), values)
+        elif not isinstance(values, pd.api.extensions.ExtensionArray):
+            values = np.asarray(values)
+        values = _contiguous(values)
+
+        if len(values) != len(self.index):
+            raise ValueError("Length of values ({0}) does not match length of index ({1}).".format(len(values), len(self.index)))
+
+        if loc is None or column_name in self.arrays:
+            self.arrays[column_name] = values
+        else:
+            items = list(self.arrays.items())
+            items.insert(loc, (column_name, values))
+            self.arrays = dict(items)
+
+        self._frame = None
+        self._columns = None
+
+    def drop(self, column_names):
+        """Remove the specified columns."""
+        for name in column_names:
+            self.arrays.pop(name, None)
+        self._frame = None
+        self._columns = None
+
+    def get_memory(self):
+        """Memory used by the arrays of the columns (in bytes)."""
+        return sum(x.nbytes for x in self.arrays.values())
+
+    #
+    # Storage on disk: a directory with a binary file for each column and a metadata file with column names, types and the number of rows.
+    # Numeric, boolean and date columns are stored as raw arrays which are memory-mapped when loaded. Categorical columns are stored as codes and categories.
+    # Other (object) columns are pickled and loaded completely.
+    #
+
+    meta_file = 'columns.json'
+
+    def save(self, path, mode='w'):
+        """
+        Write all columns to the directory. If the mode is 'a' and the directory contains columns with the same names, then the rows are appended to them.
+        Only indexes which are not a range are stored.
+        """
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, self.meta_file)
+
+        meta = None
+        if mode == 'a' and os.path.exists(meta_path):
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+            if [x['name'] for x in meta['columns']] != list(self.arrays.keys()):
+                raise ValueError("Columns {0} cannot be appended to columns {1} stored in '{2}'.".format(list(self.arrays.keys()), [x['name'] for x in meta['columns']], path))
+
+        if meta is None:
+            meta = {'length': 0, 'index': None, 'columns': []}
+            for i, name in enumerate(self.arrays.keys()):
+                meta['columns'].append({'name': name, 'file': str(i)})
+            if not isinstance(self.index, pd.RangeIndex):
+                meta['index'] = {'name': self.index.name, 'file': 'index'}
+            append = False
+        else:
+            append = True
+
+        for entry in meta['columns']:
+            _write_array(path, entry, self.arrays[entry['name']], append)
+        if meta['index'] is not None:
+            _write_array(path, meta['index'], np.asarray(self.index), append)
+
+        meta['length'] += len(self.index)
+
+        with open(meta_path, 'w') as file:  # Metadata is written after the data
+            json.dump(meta, file, indent=1)
+
+    @classmethod
+    def load(cls, path, column_names=None, mmap=True):
+        """
+        Read the specified columns (all columns by default) from the directory.
+        Raw arrays are memory-mapped (copy-on-write) so that only their pages which are accessed are read from disk, and changes are never written to the files.
+        """
+        with open(os.path.join(path, cls.meta_file), 'r') as file:
+            meta = json.load(file)
+
+        length = meta['length']
+        entries = {x['name']: x for x in meta['columns']}
+        if column_names is None:
+            column_names = list(entries.keys())
+
+        store = cls()
+        if meta['index'] is not None:
+            store.index = pd.Index(_read_array(path, meta['index'], length, mmap), name=meta['index'].get('name'))
+        else:
+            store.index = pd.RangeIndex(length)
+
+        for name in column_names:
+            if name not in entries:
+                raise KeyError("Column '{0}' cannot be found in '{1}'.".format(name, path))
+            store.arrays[name] = _read_array(path, entries[name], length, mmap)
+
+        return store
+
+    def _make_frame(self, column_names):
+        series = {name: pd.Series(self.arrays[name], index=self.index, name=name, copy=False) for name in column_names}
+        return pd.DataFrame(series, index=self.index, columns=column_names, copy=False)
+
+def _write_array(path, entry, values, append):
+    """Write (or append) the values to the file of the column and update its entry in the metadata."""
+    if 'kind' not in entry:
+        if isinstance(values, pd.Categorical) and _is_json(values.categories):
+            entry.update(kind='category', dtype='int32', categories=values.categories.tolist(), ordered=bool(values.ordered))
+        elif isinstance(values, np.ndarray) and values.dtype.kind in 'biufcmM':
+            entry.update(kind='raw', dtype=values.dtype.str)
+        else:
+            entry.update(kind='object')
+
+    kind = entry['kind']
+    pathname = os.path.join(path, entry['file'])
+
+    if kind == 'category':
+        categories = entry['categories']
+        new = [x for x in pd.unique(np.asarray(values, dtype=object)) if not pd.isna(x) and x not in set(categories)]
+        if new and not _is_json(pd.Index(new)):
+            raise ValueError("Categories {0} of column '{1}' cannot be stored.".format(new, entry['name']))
+        categories.extend(x.item() if isinstance(x, np.generic) else x for x in new)  # New categories get next codes
+        values = pd.Categorical(values, categories=categories).codes.astype(np.int32)
+
+    if kind in ['raw', 'category']:
+        dtype = np.dtype(entry['dtype'])
+        if not isinstance(values, np.ndarray) or not np.can_cast(values.dtype, dtype, casting='same_kind'):
+            raise ValueError("Values of type {0} cannot be appended to column '{1}' of type {2}.".format(getattr(values, 'dtype', None), entry['name'], dtype))
+        values = np.ascontiguousarray(values, dtype=dtype)
+        with open(pathname, 'ab' if append else 'wb') as file:
+            values.tofile(file)
+        return
+
+    if append:  # Pickled values are rewritten
+        with open(pathname, 'rb') as file:
+            values = _concat(pickle.load(file), values)
+    with open(pathname, 'wb') as file:
+        pickle.dump(values, file)
+
+def _read_array(path, entry, length, mmap):
+    """Read the values of the column (memory-mapped raw arrays or codes) from its file."""
+    pathname = os.path.join(path, entry['file'])
+    kind = entry['kind']
+
+    if kind == 'object':
+        with open(pathname, 'rb') as file:
+            return pickle.load(file)
+
+    dtype = np.dtype(entry['dtype'])
+    if length == 0:
+        values = np.empty(0, dtype=dtype)
+    elif mmap:
+        values = np.memmap(pathname, dtype=dtype, mode='c', shape=(length,))
+    else:
+        values = np.fromfile(pathname, dtype=dtype, count=length)
+
+    if kind == 'category':
+        return pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(entry['categories'], ordered=entry['ordered']))
+    return values
+
+def _concat(a, b):
+    return pd.concat([pd.Series(a), pd.Series(b)], ignore_index=True).array
+
+def _is_json(categories):
+    """Categories are stored in the metadata if they are numbers or strings."""
+    return categories.dtype.kind in 'biuf' or all(isinstance(x, str) for x in categories)
+
+def _contiguous(values):
+    """Numpy arrays are stored contiguously while extension arrays (e.g., categorical) are stored as they are."""
+    if isinstance(values, np.ndarray):
+        return np.ascontiguousarray(values)
+    return values
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,640 @@
+__author__="Alexandr Savinov"
+
+import os
+import time
+import heapq
+import collections
+import multiprocessing
+import concurrent.futures
+
+from lambdo.utils import *
+from lambdo.resolve import *
+from lambdo.transform import *
+
+from lambdo.Workflow import *
+from lambdo.Table import *
+from lambdo.Column import *
+from lambdo.Topology import *
+from lambdo.Cache import *
+from lambdo.Stream import *
+
+import logging
+log = logging.getLogger('lambdo.executor')
+
+
+class Executor:
+    """
+    The class executes operations of a topology.
+    Each operation is started as soon as all its dependencies have been executed, and a pool of threads or processes executes them simultaneously.
+    If many operations are ready then the operations on the longest (most expensive) chain of dependent operations are started first.
+    Each table and column definition may have an 'executor' field ('inline', 'thread' or 'process') which overwrites the default mode.
+    If a cache is provided then results of tables and columns are loaded from it if their definitions and inputs have not changed.
+    Tables with a 'stream' field (or all tables if streaming is requested) are executed in chunks of rows together with their columns, filters and sinks.
+    """
+
+    modes = ['inline', 'thread', 'process']
+
+    def __init__(self, workflow, jobs=None, mode=None, cache=None, stream=False, release=False):
+
+        self.workflow = workflow
+
+        # Number of workers. None or 1 means sequential execution. Zero or negative number means all available cores.
+        self.jobs = jobs
+        if self.jobs is not None and self.jobs <= 0:
+            self.jobs = os.cpu_count()
+
+        # Default mode for operations which do not specify their own mode
+        self.mode = mode or 'thread'
+        if self.mode not in self.modes:
+            log.warning("Unknown executor '{0}'. Use 'thread'.".format(self.mode))
+            self.mode = 'thread'
+
+        # Pools are created only if they are really needed
+        self.thread_pool = None
+        self.process_pool = None
+
+        # Persistent store of results (directory name or Cache object)
+        self.cache = cache
+        if isinstance(self.cache, str):
+            self.cache = Cache(self.cache)
+        self.fingerprints = {}
+
+        # Trained models are stored in the same cache unless the workflow has its own store
+        if not self.workflow.workflow_json.get('train_cache'):
+            self.workflow.train_cache = self.cache
+
+        # Execute all tables which can be executed in chunks in the streaming mode (and not only those with the 'stream' field)
+        self.stream = stream
+
+        # Release data of all tables and columns which are not outputs as soon as they are not needed by next operations
+        # Otherwise, only columns which will be removed by table filters are released early
+        self.release = release
+
+        # Topology being executed
+        self.topology = None
+
+        # Operations which have not read the data of an operation yet (for all operations with data which can be released)
+        self.readers = {}
+        self.reads = {}  # Operation -> data (which can be released) read by this operation
+        self.layer_numbers = {}  # Operation -> number of its layer in the topology
+        self.executed = set()
+        self.releasable = []  # Data which is not needed anymore (with the layer of the operation which read it last)
+
+        # Memory released (in bytes) for each layer of the topology
+        self.released = {}
+
+    def execute(self, topology):
+        """Execute all operations of the topology."""
+        self.topology = topology
+        self.fingerprints = {}
+
+        ops = [elem for layer in topology.layers for elem in layer]
+        try:
+            streams = self.get_streams(topology)
+            if not streams:
+                self.readers = self.get_readers(topology)
+            self.reads = {}
+            for x, readers in self.readers.items():
+                for op in readers:
+                    self.reads.setdefault(op, []).append(x)
+            self.layer_numbers = {elem: i for i, layer in enumerate(topology.layers) for elem in layer}
+            self.executed = set()
+            self.releasable = []
+            self.released = {}
+
+            if streams:
+                self.execute_streams(ops, streams)
+            elif all(self.get_mode(elem) == 'inline' for elem in ops):
+                for elem in ops:  # Sequential execution layer by layer
+                    self.execute_inline(elem)
+                    self.finish(elem)
+                    self.release_ready()
+            else:
+                self.execute_graph(topology)
+
+            self.release_ready()
+            for i, size in sorted(self.released.items()):
+                log.info("Layer {0}: released {1} bytes.".format(i, size))
+        finally:
+            self.readers = {}
+            self.reads = {}
+
+            self.shutdown()
+            self.topology = None
+
+            # Results of window families which have not been used (e.g., because some columns were loaded from the cache) are released
+            for table in self.workflow.tables:
+                for column in table.columns:
+                    column.family_result = None
+
+            if len(self.workflow.groupings):
+                log.info("Groupings of fact tables use {0} bytes.".format(self.workflow.groupings.get_memory()))
+
+    def get_streams(self, topology):
+        """Return a dictionary of tables which will be executed in chunks and their streams."""
+        streams = {}
+        for layer in topology.layers:
+            for table in layer:
+                if not isinstance(table, Table):
+                    continue
+
+                options = table.table_json.get('stream')
+                if options is False or (options is None and not self.stream):
+                    continue
+                chunksize = options.get('chunksize') if isinstance(options, dict) else None
+
+                stream = Stream(table, topology, chunksize)
+                reason = stream.get_unsupported()
+                if reason:
+                    if options:
+                        log.warning("Table '{0}' cannot be streamed: {1}. Load the whole table.".format(table.id, reason))
+                    else:
+                        log.debug("Table '{0}' cannot be streamed: {1}.".format(table.id, reason))
+                    continue
+
+                streams[table] = stream
+
+        return streams
+
+    def execute_streams(self, ops, streams):
+        """Sequential execution where the operations of streamed tables are executed chunk by chunk."""
+        log.info("Tables {0} are streamed. Operations are executed sequentially.".format([x.id for x in streams]))
+
+        streamed = set()
+        for stream in streams.values():
+            streamed.update(stream.get_operations())
+
+        for elem in ops:
+            if elem in streams:
+                streams[elem].execute()
+            elif elem not in streamed:
+                self.execute_inline(elem)
+
+    #
+    # Liveness
+    #
+
+    def get_readers(self, topology):
+        """
+        Find operations with data which can be released and the operations which read it.
+        Outputs are tables and columns marked with the 'output' field and targets (as well as all tables and columns if not releasing all data).
+        Columns removed by the filters of their table are never outputs.
+        """
+        targets = set(topology.get_targets())
+        consumers = topology.get_consumers()
+
+        def is_output(elem):
+            if elem in targets:
+                return True
+            if isinstance(elem, Table):
+                return bool(elem.table_json.get('output'))
+            return bool(elem.column_json.get('output'))
+
+        readers = {}
+        for elem, ops in consumers.items():
+            if isinstance(elem, Column):
+                outputs = elem.get_outputs()
+                _, definitions = elem.table._get_column_index()  # Output name -> column definitions
+                if any(len(definitions.get(x, [])) > 1 for x in outputs):
+                    continue  # The same columns are written by other operations
+                if not all(elem.table.is_column_retained(x) for x in outputs):
+                    if (elem.table, 'filter') not in consumers:
+                        continue  # The column is not removed in this execution
+                elif not self.release or is_output(elem) or is_output(elem.table):
+                    continue
+            elif isinstance(elem, Table):
+                if not self.release or is_output(elem) or any(is_output(x) for x in elem.columns):
+                    continue
+            else:
+                continue
+            readers[elem] = set(ops)
+
+        return readers
+
+    def finish(self, elem):
+        """Find the data which is not needed anymore after executing the operation. It is released when its table is not used by running operations."""
+        self.executed.add(elem)
+        if not self.readers:
+            return
+
+        layer = self.layer_numbers.get(elem)
+
+        candidates = ([elem] if elem in self.readers else []) + self.reads.get(elem, [])
+        for x in candidates:
+            if x not in self.readers:
+                continue
+            self.readers[x].discard(elem)
+            if not self.readers[x] and x in self.executed:
+                del self.readers[x]
+                self.releasable.append((x, layer))
+
+    def release_ready(self, is_used=None):
+        """Release the data found by previous operations if their tables are not used (read or written) by running operations."""
+        for item in list(self.releasable):
+            elem, layer = item
+            table = elem.table if isinstance(elem, Column) else elem
+            if is_used is not None and is_used(table):
+                continue
+            self.releasable.remove(item)
+            size = self.release_data(elem)
+            self.released[layer] = self.released.get(layer, 0) + size
+
+    def release_data(self, elem):
+        """Release the data of the table or column and return the size of the released memory."""
+        if isinstance(elem, Column):
+            names = elem.get_outputs()
+            size = elem.table.get_memory(names)
+            elem.table.drop_columns(names)
+            elem.data = []
+        else:
+            size = elem.get_memory()
+            elem.data = None
+            for column in elem.columns:
+                column.data = []
+        log.debug("Release '{0}' ({1} bytes).".format(elem.id, size))
+        return size
+
+    def shutdown(self):
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown(wait=True)
+            self.thread_pool = None
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=True)
+            self.process_pool = None
+
+    def get_mode(self, elem):
+        """Determine how the operation will be executed: 'inline' (in this thread), 'thread' or 'process'."""
+
+        if isinstance(elem, Table):
+            mode = elem.table_json.get('executor')
+        elif isinstance(elem, Column):
+            mode = elem.column_json.get('executor')
+        else:
+            return 'inline'  # Filters are always executed in this thread
+
+        if mode is None:
+            if not self.jobs or self.jobs == 1:
+                return 'inline'  # Sequential execution
+            mode = self.mode
+
+        if mode not in self.modes:
+            log.warning("Unknown executor '{0}' in the definition of '{1}'. Execute inline.".format(mode, elem.id))
+            return 'inline'
+
+        # Only computational columns consume data which can be passed to another process
+        if mode == 'process' and not (isinstance(elem, Column) and elem.is_op_calc()):
+            log.debug("Operation '{0}' cannot be executed in another process. Use a thread.".format(elem.id))
+            mode = 'thread'
+
+        return mode
+
+    def get_cost(self, elem):
+        """
+        Return the cost of the operation used to prioritize long chains of operations.
+        It is either specified in the definition ('cost' field), measured during previous execution or estimated from the operation type.
+        """
+        definition = None
+        if isinstance(elem, Table):
+            definition = elem.table_json
+        elif isinstance(elem, Column):
+            definition = elem.column_json
+
+        cost = definition.get('cost') if definition else None
+        if cost is not None:
+            return float(cost)
+
+        cost = self.workflow.costs.get(elem)
+        if cost is not None:
+            return cost
+
+        # Rough estimate: user-defined functions applied to each row or window are expensive
+        if isinstance(elem, Column):
+            cost = 1.0
+            if elem.is_op_roll():
+                cost = 4.0
+            elif elem.is_op_one() or elem.is_op_aggregate() or elem.is_op_accumulate():
+                cost = 2.0
+            if elem.column_json.get('train'):
+                cost += 10.0
+        elif isinstance(elem, Table):
+            cost = 1.0
+        else:
+            cost = 0.1  # Filters
+
+        return cost
+
+    def get_priorities(self, ops, dependents):
+        """For each operation, find the cost of the most expensive chain of operations starting from it (critical path)."""
+        priorities = {}
+        for elem in reversed(ops):  # Operations are in topological order so dependents are processed before their dependencies
+            tail = max((priorities[x] for x in dependents[elem]), default=0.0)
+            priorities[elem] = self.get_cost(elem) + tail
+        return priorities
+
+    def get_access(self, elem):
+        """
+        Return tables read and tables modified by the operation while it is being executed.
+        Column outputs are attached to their table only if no running operation reads it.
+        """
+        reads = set()
+        writes = set()
+
+        if isinstance(elem, Table):
+            for dep in self.topology.get_dependencies(elem):
+                reads.add(_get_table(dep))
+            reads.discard(elem)
+            writes.add(elem)
+
+        elif isinstance(elem, Column):
+            reads.add(elem.table)
+            for dep in self.topology.get_dependencies(elem):
+                reads.add(_get_table(dep))
+
+        elif isinstance(elem, (tuple, list)):
+            writes.add(elem[0])
+
+        reads.discard(None)
+        return reads, writes
+
+    def execute_graph(self, topology):
+        """
+        Execute operations by starting each of them as soon as its dependencies have been executed.
+        Tables are populated and columns are computed by workers, and column outputs are attached to their tables in this thread.
+        """
+        ops = [elem for layer in topology.layers for elem in layer]
+        ranks = {elem: i for i, elem in enumerate(ops)}
+
+        dependents = {elem: [] for elem in ops}
+        waiting = {}
+        for elem in ops:
+            deps = set(x for x in topology.get_dependencies(elem) if x in ranks)
+            waiting[elem] = len(deps)
+            for dep in deps:
+                dependents[dep].append(elem)
+
+        priorities = self.get_priorities(ops, dependents)
+
+        ready = [(-priorities[elem], ranks[elem], elem) for elem in ops if waiting[elem] == 0]
+        heapq.heapify(ready)
+
+        workers = self.jobs or 1
+        running = {}  # Future -> operation
+        pending = []  # Computed column outputs which have not been attached yet
+        readers = collections.Counter()
+        writers = collections.Counter()
+        column_ranks = collections.defaultdict(dict)  # Table -> column name -> rank of the operation which produced it
+
+        def finish(elem):
+            self.finish(elem)
+            for x in dependents[elem]:
+                waiting[x] -= 1
+                if waiting[x] == 0:
+                    heapq.heappush(ready, (-priorities[x], ranks[x], x))
+
+        def complete(elem, out):
+            if isinstance(elem, Column) and out is not None:
+                pending.append((elem, out))
+            else:
+                finish(elem)
+
+        while ready or running or pending:
+
+            # Release data which is not needed anymore if its table is not being used
+            self.release_ready(lambda t: readers[t] or writers[t])
+
+            #
+            # Attach computed columns to the tables which are not being read
+            #
+            for item in list(pending):
+                elem, out = item
+                if readers[elem.table] or writers[elem.table]:
+                    continue
+                pending.remove(item)
+                elem._append_output_columns(out, rank=ranks[elem], ranks=column_ranks[elem.table])
+                log.info("<--- Finish evaluating column '{0}'".format(elem.id))
+                finish(elem)
+
+            #
+            # Start ready operations with the highest priority
+            #
+            deferred = []
+            while ready and len(running) < workers:
+                entry = heapq.heappop(ready)
+                elem = entry[2]
+
+                reads, writes = self.get_access(elem)
+                pending_tables = set(x[0].table for x in pending)
+                if any(writers[t] or t in pending_tables for t in reads) or any(readers[t] or writers[t] for t in writes):
+                    deferred.append(entry)  # Wait until the tables it needs are not used by other operations
+                    continue
+
+                mode = self.get_mode(elem)
+                if mode == 'inline':
+                    complete(elem, self.run_inline(elem))
+                    continue
+
+                found, out = self.load(elem)
+                if found:
+                    complete(elem, out)
+                    continue
+
+                future = self.submit(elem, mode)
+                if future is None:
+                    complete(elem, None)
+                    continue
+
+                running[future] = (elem, reads, writes)
+                for t in reads:
+                    readers[t] += 1
+                for t in writes:
+                    writers[t] += 1
+
+            for entry in deferred:
+                heapq.heappush(ready, entry)
+
+            if not running:
+                continue
+
+            #
+            # Wait for some running operation to finish
+            #
+            done, _ = concurrent.futures.wait(list(running), return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                elem, reads, writes = running.pop(future)
+                for t in reads:
+                    readers[t] -= 1
+                for t in writes:
+                    writers[t] -= 1
+
+                out, duration = future.result()
+                self.workflow.costs[elem] = duration
+                self.save(elem, out if isinstance(elem, Column) else elem.data)
+                complete(elem, out)
+
+    def execute_inline(self, elem):
+        """Execute one operation in this thread."""
+        if isinstance(elem, Table):
+            found, _ = self.load(elem)
+            if not found:
+                elem.populate()
+                self.save(elem, elem.data)
+        elif isinstance(elem, Column):
+            if self.cache is None:
+                elem.evaluate()
+                return
+            out = self.run_inline(elem)
+            if out is not None:
+                elem._append_output_columns(out)
+                log.info("<--- Finish evaluating column '{0}'".format(elem.id))
+        elif isinstance(elem, (tuple, list)):
+            if isinstance(elem[0], Table) and elem[1] == 'filter':
+                elem[0].execute_filter()
+            else:
+                pass  # Warning: wrong object type in an operation
+        else:
+            pass  # Warning: wrong object type in an operation
+
+    def run_inline(self, elem):
+        """Execute one operation in this thread. Columns return their output which has to be attached."""
+        if isinstance(elem, Column):
+            found, out = self.load(elem)
+            if found:
+                return out
+            log.info("---> Start evaluating column '{0}'. Operation '{1}'.".format(elem.id, elem.get_operation()))
+            out, duration = _timed(elem.compute)
+            self.save(elem, out)
+        else:
+            out, duration = _timed(self.execute_inline, elem)
+        self.workflow.costs[elem] = duration
+        return out
+
+    #
+    # Cache
+    #
+
+    def get_fingerprint(self, elem, visiting=None):
+        """
+        Return a fingerprint of the operation which depends on its definition and fingerprints of its dependencies.
+        Operations reading each other (directly or indirectly) cannot be fingerprinted.
+        """
+        if elem in self.fingerprints:
+            return self.fingerprints[elem]
+
+        if visiting is None:
+            visiting = set()
+        if elem in visiting:
+            return None
+        visiting.add(elem)
+        dependencies = [self.get_fingerprint(x, visiting) for x in self.topology.get_input_operations(elem)]
+        visiting.discard(elem)
+
+        fingerprint = self.cache.get_fingerprint(elem, dependencies)
+
+        self.fingerprints[elem] = fingerprint
+        return fingerprint
+
+    def load(self, elem):
+        """
+        Find the result of the operation in the cache.
+        Return a flag if it has been found and the column output. Tables get their data from the cache.
+        """
+        if self.cache is None or not isinstance(elem, (Table, Column)):
+            return False, None
+
+        fingerprint = self.get_fingerprint(elem)
+        if fingerprint is None:
+            return False, None
+
+        found, value = self.cache.get(fingerprint)
+        if not found:
+            return False, None
+
+        log.info("Load '{0}' from cache.".format(elem.id))
+        if isinstance(elem, Table):
+            elem.data = value
+            return True, None
+        return True, value
+
+    def save(self, elem, value):
+        """Store the result of the operation in the cache. Empty results (e.g., of tables writing files) are not stored."""
+        if self.cache is None or value is None or not isinstance(elem, (Table, Column)):
+            return
+
+        fingerprint = self.get_fingerprint(elem)
+        if fingerprint is None:
+            return
+
+        self.cache.put(fingerprint, value)
+
+    def submit(self, elem, mode):
+        """
+        Start executing one operation by a worker and return a future with its output and duration.
+        Return None if there is nothing to execute.
+        """
+        if isinstance(elem, Table):
+            func, args = elem.populate, ()
+        else:
+            log.info("---> Start evaluating column '{0}'. Operation '{1}'.".format(elem.id, elem.get_operation()))
+            func, args = elem.compute, ()
+
+        if mode == 'process':
+            calc_args = elem.prepare_calc()  # Data is selected and the model is trained in this thread
+            if calc_args is None:
+                return None
+            definition = elem.column_json
+            if elem.get_engine() is not None:
+                definition = dict(definition, engine=elem.get_engine())  # The workflow default is not available in the worker process
+            func, args = _evaluate_calc, (definition,) + tuple(calc_args[1:])
+
+        return self.get_pool(mode).submit(_timed, func, *args)
+
+    def get_pool(self, mode):
+        if mode == 'process':
+            if self.process_pool is None:
+                imports = self.workflow.workflow_json.get('imports', [])
+                self.process_pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.jobs,
+                    mp_context=multiprocessing.get_context('spawn'),  # Forking a process with running threads is not safe
+                    initializer=import_modules,  # Worker processes need the same modules as the workflow
+                    initargs=(imports,)
+                )
+            return self.process_pool
+        else:
+            if self.thread_pool is None:
+                self.thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs)
+            return self.thread_pool
+
+
+def _get_table(elem):
+    """Return the table an operation belongs to."""
+    if isinstance(elem, Table):
+        return elem
+    elif isinstance(elem, Column):
+        return elem.table
+    elif isinstance(elem, (tuple, list)):
+        return elem[0]
+    return None
+
+def _timed(func, *args):
+    """Call the function and return its result along with the duration of the call in seconds."""
+    start = time.perf_counter()
+    out = func(*args)
+    return out, time.perf_counter() - start
+
+def _evaluate_calc(definition, data, data_type, model):
+    """
+    Evaluate a computational column in a worker process.
+    The function is resolved by its name again because functions (e.g., lambdas) cannot be always passed to another process.
+    """
+    func_name = definition.get('function')
+    func = resolve_full_name(func_name)
+    if not func:
+        log.warning("Cannot resolve user-defined function '{0}'. Skip column definition.".format(func_name))
+        return None
+
+    column = Column(None, definition)  # Detached column which is used only for evaluation
+    return column._evaluate_calc(func, data, data_type, model)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,173 @@
+__author__="Alexandr Savinov"
+
+import os
+import json
+import pickle
+import threading
+from collections import OrderedDict
+
+import logging
+log = logging.getLogger('lambdo.models')
+
+#
+# Files with (trained) models referenced from definitions as "$file:model.pkl".
+# The format is determined by the file extension:
+# - '.json': JSON values (for example, parameters)
+# - '.pkl', '.pickle': pickled objects
+# - '.joblib': objects written by joblib where large numpy arrays are stored so that they are memory-mapped when loaded
+# Files with an additional extension '.gz', '.bz2', '.xz' or '.lzma' are compressed (compressed arrays cannot be memory-mapped).
+#
+
+formats = ['.json', '.pkl', '.pickle', '.joblib']
+compressions = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.lzma': 'lzma'}
+
+
+class ModelStore:
+    """
+    The class reads and writes model files and caches the loaded models in memory.
+    A model is cached with the modification time and size of its file, and it is read again only if the file changes.
+    Therefore, a model referenced from many definitions (or read many times) is loaded once and the same object is returned.
+    If the number of cached models exceeds the size, then the least recently used models are removed.
+    """
+
+    default_size = 8
+
+    def __init__(self, size=None):
+        self.size = self.default_size if size is None else size
+        self._entries = OrderedDict()  # Path -> (file state, model) in the order of their use
+        self._lock = threading.Lock()
+
+    def read(self, pathname):
+        """Return the model stored in the file or None if the file does not exist or cannot be read."""
+        path = os.path.abspath(pathname)
+        state = _get_state(path)
+        if state is None:
+            return None  # Having no file means that a value represented by-reference is None
+
+        with self._lock:  # Columns using the same model can be evaluated in different threads
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == state:
+                self._entries.move_to_end(path)
+                return entry[1]
+
+            try:
+                value = read_model(path)
+            except Exception as e:
+                log.error("Error reading from file {0}. Exception: {1}".format(pathname, e))
+                return None
+
+            self._put(path, state, value)
+
+            return value
+
+    def write(self, pathname, value):
+        """Write the model to the file. The written model is cached so that it is not read again."""
+        path = os.path.abspath(pathname)
+        with self._lock:
+            self._entries.pop(path, None)
+            try:
+                write_model(path, value)
+            except Exception as e:
+                log.error("Error writing to file {0}. Exception: {1}".format(pathname, e))
+                return
+
+            state = _get_state(path)
+            if state is not None and not _is_mapped(path):  # Memory-mapped arrays are used only after reading
+                self._put(path, state, value)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _put(self, path, state, value):
+        self._entries[path] = (state, value)
+        self._entries.move_to_end(path)
+        while len(self._entries) > max(self.size, 0):
+            path, _ = self._entries.popitem(last=False)
+            log.debug("Model {0} removed from the cache.".format(path))
+
+def get_format(path):
+    """Return the extension determining the format of the file (without compression) or None if the format is not supported."""
+    base, compression = _split_compression(path)
+    ext = os.path.splitext(base)[1].lower()
+    return ext if ext in formats else None
+
+def read_model(path):
+    """Read the model from the file depending on its format (without caching)."""
+    ext = get_format(path)
+    compression = _split_compression(path)[1]
+
+    if ext == '.json':
+        with _open(path, compression, 'rt') as file:
+            return json.load(file)
+
+    joblib = _import_joblib()
+    if joblib is not None:
+        # Plain pickles are also read by joblib, and arrays written by joblib are memory-mapped (read-only)
+        return joblib.load(path, mmap_mode=None if compression else 'r')
+
+    with _open(path, compression, 'rb') as file:
+        return pickle.load(file)
+
+def write_model(path, value):
+    """Write the model to the file depending on its format."""
+    ext = get_format(path)
+    compression = _split_compression(path)[1]
+
+    if ext == '.json':
+        with _open(path, compression, 'wt') as file:
+            json.dump(value, file)
+        return
+
+    if ext == '.joblib':
+        joblib = _import_joblib()
+        if joblib is not None:
+            joblib.dump(value, path, compress=(compression, 3) if compression else 0)
+            return
+
+    with _open(path, compression, 'wb') as file:
+        pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+def _split_compression(path):
+    base, ext = os.path.splitext(path)
+    compression = compressions.get(ext.lower())
+    if compression is None:
+        return path, None
+    return base, compression
+
+def _open(path, compression, mode):
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(path, mode)
+    if compression == 'bz2':
+        import bz2
+        return bz2.open(path, mode)
+    if compression in ['xz', 'lzma']:
+        import lzma
+        return lzma.open(path, mode)
+    return open(path, mode)
+
+def _is_mapped(path):
+    return get_format(path) == '.joblib' and _split_compression(path)[1] is None
+
+def _get_state(path):
+    """Modification time and size of the file which change if the file is rewritten."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _import_joblib():
+    try:
+        import joblib
+    except ImportError:
+        return None
+    return joblib
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,192 @@
+__author__="Alexandr Savinov"
+
+import inspect
+
+from lambdo.utils import *
+from lambdo.resolve import *
+from lambdo.transform import *
+from lambdo.schema import *
+
+from lambdo.Workflow import *
+from lambdo.Table import *
+from lambdo.Column import *
+
+import logging
+log = logging.getLogger('lambdo.stream')
+
+
+class Stream:
+    """
+    The class represents execution of a table in chunks of rows so that the whole table is never loaded into memory.
+    The table is populated by a function which returns an iterator of chunks when it gets the 'chunksize' argument (like pandas:read_csv).
+    Each chunk is passed through the calculate and roll columns of the table and its filters and then written to sink tables (like pandas:DataFrame.to_csv).
+    Roll columns get also the last rows of the previous chunk so that their windows span chunk boundaries and the results are the same as for the whole table.
+    """
+
+    default_chunksize = 100000
+
+    def __init__(self, table, topology, chunksize=None):
+
+        self.table = table
+        self.topology = topology
+        self.chunksize = chunksize or self.default_chunksize
+
+        ops = [elem for layer in topology.layers for elem in layer]
+
+        # Operations of this table in the order of their execution
+        self.columns = [x for x in ops if isinstance(x, Column) and x.table is table]
+        self.filter = next((x for x in ops if isinstance(x, (tuple, list)) and x[0] is table), None)
+
+        # Tables consuming only this table and which are not used by other operations get chunks instead of the whole table
+        own = set([table] + self.columns + ([self.filter] if self.filter else []))
+        dependents = [x for x in ops if x not in own and any(d in own for d in topology.get_dependencies(x))]
+        self.sinks = [x for x in dependents if self._is_sink(x, ops)]
+
+        # The result is retained only if it is needed by other operations or there are no sinks
+        self.keep = not self.sinks or len(self.sinks) < len(dependents)
+
+    def get_operations(self):
+        """All operations executed by this stream."""
+        return [self.table] + self.columns + ([self.filter] if self.filter else []) + self.sinks
+
+    def get_unsupported(self):
+        """Return the reason why the table cannot be executed in chunks or None if it can be executed."""
+        table = self.table
+        definition = table.table_json
+
+        if not table.is_op_all() or not definition.get('function'):
+            return "table is not populated by a function"
+        if table.workflow.get_tables(definition.get('inputs')):
+            return "table has input tables"
+
+        func = resolve_full_name(definition.get('function'))
+        if func is None:
+            return "function cannot be resolved"
+        try:
+            if 'chunksize' not in inspect.signature(func).parameters:
+                return "function does not accept 'chunksize'"
+        except (TypeError, ValueError):
+            return "function does not accept 'chunksize'"
+
+        for column in self.columns:
+            if not (column.is_op_one() or column.is_op_roll()):
+                return "column '{0}' is neither a calculate nor a roll column".format(column.id)
+            if column.column_json.get('train'):
+                return "column '{0}' trains a model".format(column.id)
+
+        row_filter = definition.get('row_filter') or {}
+        if row_filter.get('sample'):
+            return "row filter samples rows"
+        slice = row_filter.get('slice') or {}
+        if any((slice.get(k) or 0) < 0 for k in ['start', 'end']):
+            return "row filter has a slice with negative bounds"
+
+        return None
+
+    def get_carry(self):
+        """Number of rows of the previous chunk which are needed to evaluate roll columns for the next chunk (including chains of roll columns)."""
+        return sum(int(x.column_json.get('window')) - 1 for x in self.columns if x.is_op_roll())
+
+    def execute(self):
+        """Populate the table chunk by chunk, evaluate its columns and filters and write the results to the sinks."""
+        table = self.table
+        definition = table.table_json
+
+        log.info("===> Start streaming table '{0}'. Chunk size {1}.".format(table.id, self.chunksize))
+
+        func = resolve_full_name(definition.get('function'))
+        model = dict(definition.get('model', {}))
+        model['chunksize'] = self.chunksize
+
+        carry = self.get_carry()
+        row_filter = dict(definition.get('row_filter') or {})
+        slice = row_filter.pop('slice', None)
+
+        tail = None  # Last rows of the previous chunk
+        position = 0  # Number of rows which passed the row filter (used for slices)
+        results = []
+        count = 0
+
+        schema = definition.get('schema')
+
+        for chunk in func(**model):
+            chunk = apply_schema(chunk, schema)
+
+            # Roll columns need the last rows of the previous chunk
+            prefix = len(tail) if tail is not None else 0
+            data = pd.concat([tail, chunk]) if prefix else chunk
+            if carry:
+                tail = data.iloc[max(len(data) - carry, 0):].copy()
+
+            table.data = data
+            for column in self.columns:
+                out = column.compute()
+                if out is not None:
+                    column._append_output_columns(out)
+
+            if prefix:
+                table.data = table.data.iloc[prefix:].copy()
+
+            if self.filter:
+                table.execute_filter(row_filter=row_filter)
+                if slice:
+                    table.data, position = _apply_slice(table.data, slice, position)
+
+            for sink in self.sinks:
+                self._write(sink, table.data, count == 0)
+
+            if self.keep:
+                results.append(table.data)
+
+            count += 1
+
+        if self.keep:
+            table.data = apply_schema(pd.concat(results, ignore_index=True), schema) if results else None  # Categories of chunks can differ
+        else:
+            table.data = None
+
+        log.info("<=== Finish streaming table '{0}'. {1} chunks.".format(table.id, count))
+
+    def _is_sink(self, elem, ops):
+        """A sink table consumes only this table, has no columns or filters and is not used by other operations."""
+        if not isinstance(elem, Table) or not elem.is_op_all():
+            return False
+        if elem.columns or elem.has_filters():
+            return False
+        inputs = elem.table_json.get('inputs')
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        if inputs != [self.table.id]:
+            return False
+        return not any(elem in self.topology.get_dependencies(x) for x in ops)
+
+    def _write(self, sink, data, first):
+        """Pass the chunk to the sink function. Next chunks are appended to the same output."""
+        func = resolve_full_name(sink.table_json.get('function'))
+        model = dict(sink.table_json.get('model', {}))
+
+        if not first:
+            params = inspect.signature(func).parameters
+            if 'mode' in params:
+                model['mode'] = 'a'
+            if 'header' in params:
+                model['header'] = False
+
+        func(data, **model)
+
+def _apply_slice(data, slice, position):
+    """Select rows of the chunk using the slice with respect to the rows of the previous chunks. Return the selected rows and the new position."""
+    start = slice.get("start", 0)
+    end = slice.get("end")
+    step = slice.get("step", 1)
+
+    positions = np.arange(position, position + len(data))
+    mask = (positions >= start) & ((positions - start) % step == 0)
+    if end is not None:
+        mask &= positions < end
+
+    return data[mask].reset_index(drop=True), position + len(data)
+
+
+if __name__ == "__main__":
+    pass
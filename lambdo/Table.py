@@ -1,10 +1,14 @@
 __author__="Alexandr Savinov"
 
 import json
+import threading
+import itertools
 
 from lambdo.utils import *
 from lambdo.resolve import *
 from lambdo.transform import *
+from lambdo.ColumnStore import *
+from lambdo.schema import *
 
 from lambdo.Workflow import *
 from lambdo.Table import *
@@ -13,6 +17,9 @@ from lambdo.Column import *
 import logging
 log = logging.getLogger('lambdo.table')
 
+# Versions of table data and columns (unique for all tables). Derived structures like groupings are valid only for the versions they were built for
+_versions = itertools.count(1)
+
 
 class Table:
     """
@@ -29,6 +36,9 @@ class Table:
         self.table_json = table_json
 
         # TODO: Data represents the whole populated set and is a pandas index without columns (while columns are represented separately in columns using row ids as index)
+        self.version = 0  # Changes each time the data is replaced (e.g., populated or filtered)
+        self.column_versions = {}  # Changes each time a column is written
+        self._store = None  # Column store used instead of a data frame if the storage is 'columns'
         self.data = None
 
         # Assign id
@@ -42,9 +52,72 @@ class Table:
         columns_json = self.table_json.get("columns", [])
         self.columns = self._create_columns_from_descriptions()
 
+        # Index of column definitions by their ids and output names. It is rebuilt if the list of columns changes.
+        self._column_index = None
+
+        # Indexes of key column values used by link columns. They are rebuilt if the data of the table changes.
+        self._key_indexes = {}
+        self._key_indexes_lock = threading.Lock()
+
+        # Codes of source rows produced by the projection (and the versions of data) which can be used instead of the link column to this table
+        self._projection = None
+
     def __repr__(self):
         return '['+self.id+']'
 
+    @property
+    def data(self):
+        if self._store is not None:
+            return self._store.get_frame()  # A frame referencing the column arrays is produced only when it is requested
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        if isinstance(value, ColumnStore):  # For example, memory-mapped columns loaded from disk
+            self._store = value
+            self._data = None
+        elif isinstance(value, pd.DataFrame) and self.get_storage() == 'columns':
+            self._store = ColumnStore(value)
+            self._data = None
+        else:
+            self._store = None
+            self._data = value
+        self.version = next(_versions)
+
+    def get_storage(self):
+        """Return the storage of table data: 'frame' (a data frame) or 'columns' (an array for each column). The default storage is specified in the workflow."""
+        storage = self.table_json.get('storage')
+        if storage is None and self.workflow is not None:
+            storage = self.workflow.workflow_json.get('storage')
+        return storage or 'frame'
+
+    def get_data(self):
+        """
+        Return the table data for reading columns: a data frame or a column store depending on the storage.
+        Selecting columns from a column store produces a data frame without copying and consolidating all columns.
+        """
+        if self._store is not None:
+            return self._store
+        return self._data
+
+    def set_column(self, column_name, values, loc=None):
+        """Add or replace a column. Series are attached by matching indexes. A new column is inserted at the specified position (appended by default)."""
+        if self._store is not None:
+            self._store.set_column(column_name, values, loc)
+        elif loc is None or column_name in self._data.columns:
+            self._data[column_name] = values
+        else:
+            self._data.insert(loc, column_name, values)
+        self.update_column_version(column_name)
+
+    def update_column_version(self, column_name):
+        """Mark the column as changed so that the structures built from its previous values are not used anymore."""
+        self.column_versions[column_name] = next(_versions)
+
+    def get_data_version(self, column_names=[]):
+        """Return the version of the data and the specified columns. The version changes if any of them is written."""
+        return (self.version,) + tuple(self.column_versions.get(x, 0) for x in column_names)
+
     def _create_columns_from_descriptions(self):
         """
         Create a list of Column objects from json.
@@ -56,9 +129,17 @@ class Table:
             # One column definition may have extensions and hence we will get a list of concrete column definitions
             columns_json = build_json_extensions(family_col_json)
 
+            family = []
             for col_json in columns_json:
                 col = Column(self, col_json)
                 columns.append(col)
+                family.append(col)
+
+            if len(family) > 1:
+                lock = threading.Lock()
+                for col in family:
+                    col.family = family
+                    col.family_lock = lock
 
         return columns
 
@@ -80,10 +161,56 @@ class Table:
 
         return column
 
+    def _get_column_index(self):
+        """
+        Return two dictionaries which map column ids and output column names to the column definitions.
+        They are used to find definitions without scanning all columns which is important for tables with thousands of definitions.
+        """
+        index = self._column_index
+        if index is not None and index[0] is self.columns and index[1] == len(self.columns):
+            return index[2], index[3]
+
+        ids = {}
+        outputs = {}
+        for col in self.columns:
+            ids.setdefault(col.id, col)  # The first definition with this id
+            for name in col.get_outputs():
+                outputs.setdefault(name, []).append(col)
+
+        self._column_index = (self.columns, len(self.columns), ids, outputs)
+
+        return ids, outputs
+
+    def get_key_index(self, keys):
+        """
+        Return a hash index which maps values of the specified key columns to row positions, and the row positions of its entries.
+        The index is built once and is reused by all link columns with these linked keys until the data of the table changes.
+        If key values are not unique, then the first row with these values is used.
+        """
+        keys = tuple(keys)
+        with self._key_indexes_lock:  # Link columns of different tables can use the same index in different threads
+            version = self.get_data_version(keys)
+            entry = self._key_indexes.get(keys)
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+
+            key_data = self.get_data()[list(keys)]
+            first = ~key_data.duplicated(keep='first').values
+            positions = np.flatnonzero(first)
+            if len(keys) == 1:
+                index = pd.Index(key_data.iloc[:, 0].values[first])
+            else:
+                index = pd.MultiIndex.from_frame(key_data[first])
+
+            self._key_indexes[keys] = (version, index, positions)  # Old data is not retained
+
+            return index, positions
+
     def get_column(self, column_name):
         """Find a column definition object with the specified name"""
         if not column_name: return None
-        return next((x for x in self.columns if x.id == column_name), None)
+        ids, _ = self._get_column_index()
+        return ids.get(column_name)
 
     def get_column_number(self, column_name):
         """Find column definition number with this name"""
@@ -92,6 +219,7 @@ class Table:
     def get_columns(self, column_names):
         """Find column definitions with the specified names"""
         if not column_names: return None
+        column_names = set(column_names)
         columns = filter(lambda x: x.id in column_names, self.columns)
         return list(columns)
 
@@ -100,64 +228,53 @@ class Table:
 
         if isinstance(column_names, str):
             column_names = [column_names]
-        column_names_set = set(column_names)
+
+        _, outputs = self._get_column_index()
 
         ret = []
-        for col in self.columns:  # For each existing definition, check if it generates at least one of the column names
-            if set(col.get_outputs()) & column_names_set:
-                ret.append(col)  # This definition generates some column specified in the argument
+        for name in column_names:  # For each name, find definitions which generate it
+            for col in outputs.get(name, []):
+                if col not in ret:
+                    ret.append(col)  # This definition generates some column specified in the argument
 
-        return list(set(ret))
+        return ret
 
     def add_compose_column(self, complex_name):
         """
         Given a complex column name, add a compose column definition if it does not exist.
-        Add recursively compose columns to the linked table if they do not exist (if it exists then the recursion is stopped).
-        If it is not a complex column then do nothing (is used to stop the recursion).
+        The whole path is materialized by one compose column which follows all its link segments (compose columns for the tails of the path are not added to the linked tables).
+        If it is not a complex column then do nothing.
+        Return the definition which generates this column or None if it is not a complex column.
         """
 
-        table_name = self.id
-        table = self
-
         #
-        # Check if the column with such nae already exists
+        # Check if the column with such name already exists
         # It could be either defined explicitly by the user or added due to the use in a previously analyzed definition.
         #
-        complex_name_definitions = table.get_definitions_for_columns(complex_name)
+        complex_name_definitions = self.get_definitions_for_columns(complex_name)
         if complex_name_definitions:
-            return  # There exists a definition which generates this column name (used also to stop recursion)
+            return complex_name_definitions[0]
 
         #
-        # Break the path into link (in this table) and tail (in the linked table).
+        # Break the path into segments: link columns and the last (linked) column
         #
-        segments = complex_name.split('::', 1)
-        segments = [x.strip() for x in segments]
-        link_column = segments[0]
-        linked_column = segments[1:] or None
+        segments = [x.strip() for x in complex_name.split('::')]
 
         # Check if the column is primitive (not a path)
-        if linked_column is None:
-            return  # It is not a complex path. No operation is needed (used also to stop recursion)
+        if len(segments) < 2:
+            return None
+        # TODO: Validity check: all segments except for the last one must be link columns
 
         #
-        # Add compose operation to materialize this pair
+        # Add compose operation to materialize this path
         #
-        complex_name_definitions = {
+        definition = {
             "id": complex_name,
             "operation": "compose",
-            "inputs": [link_column, linked_column],
+            "inputs": segments,
         }
 
-        #
-        # Call the same method for the tail (it will do nothing if the tail is simple)
-        #
-        link_column_definitions = table.get_definitions_for_columns(link_column)  # Find definition of link column
-        link_column = link_column_definitions[0] or None
-        # TODO: Validity check: link_column must be a link column operation (retrieve its type and check). Error: wrong column path. All its segments except for the last one must be link columns.
-        linked_table_name = link_column['linked_table']
-        linked_table = self.workflow.get_table(linked_table_name)
-
-        linked_table.add_compose_column(linked_column)
+        return self.create_column(definition)
 
     def is_op_noop(self):
         operation = self.table_json.get('operation')
@@ -377,7 +494,10 @@ class Table:
             log.warning("Unknown operation type '{0}' in the definition of table {1}".format(operation, self.id))
 
         if new_data is not None:
-            self.data = new_data
+            self.data = apply_schema(new_data, self.table_json.get('schema'))  # Columns are stored in the declared (compact) types
+
+            if self.is_op_project() and self._projection is not None:
+                self._projection = self._projection + (self.version,)  # Codes are valid only for this data
 
         log.info("<=== Finish populating table '{0}'".format(self.id))
 
@@ -396,18 +516,78 @@ class Table:
 
         return False
 
-    def execute_filter(self):
+    def get_filter_inputs(self):
+        """Return the names of columns read by the row filter of this table. None means all columns."""
+        row_filter = self.table_json.get("row_filter") or {}
+        names = []
+        for key in ['dropna', 'predicate']:
+            value = row_filter.get(key)
+            if value is None or value is False:
+                continue
+            if isinstance(value, str):
+                value = [value]
+            if not isinstance(value, list) or not all(isinstance(x, str) for x in value):
+                return None  # For example, all columns or column numbers
+            names.extend(value)
+        return names
+
+    def is_column_retained(self, column_name):
+        """Determine if the column remains in the table after applying the filters of this table."""
+        column = self.get_column(column_name)
+        if column is not None and column.column_json.get("exclude") is True:
+            return False
+
+        column_filter = self.table_json.get("column_filter")
+        if isinstance(column_filter, str):
+            column_filter = [column_filter]
+        if isinstance(column_filter, list) and column_filter and all(isinstance(x, str) for x in column_filter):
+            return column_name in column_filter
+        if isinstance(column_filter, dict):
+            exclude = column_filter.get("exclude")
+            if isinstance(exclude, str):
+                exclude = [exclude]
+            if isinstance(exclude, list) and column_name in exclude:
+                return False
+
+        return True
+
+    def drop_columns(self, column_names):
+        """Remove the specified columns (if they exist) without copying other columns."""
+        data = self.get_data()
+        if data is None:
+            return
+        for name in column_names:
+            if name not in data.columns:
+                continue
+            if self._store is not None:
+                self._store.drop([name])
+            else:
+                del self._data[name]
+            self.update_column_version(name)
+
+    def get_memory(self, column_names=None):
+        """Memory used by the specified columns (or by all columns and the index) in bytes."""
+        data = self.get_data()
+        if data is None:
+            return 0
+        if column_names is None:
+            return int(data.index.memory_usage()) + sum(int(data[x].memory_usage(index=False)) for x in data.columns)
+        return sum(int(data[x].memory_usage(index=False)) for x in column_names if x in data.columns)
+
+    def execute_filter(self, row_filter=None):
         """
         Apply filters for post-processing after the table and all its columns have been evaluated.
         It is a kind of a convenience approach where we define filters directly in the table without defining a new table.
         All other elements which depend on this table, will see the filtered result table.
         Therefore, in general, we need to apply filters before any element which depends on this table.
+        :param row_filter: Row filter used instead of the row filter of the definition (e.g., without the parts applied separately)
         """
 
         #
         # Row filter
         #
-        row_filter = self.table_json.get("row_filter")
+        if row_filter is None:
+            row_filter = self.table_json.get("row_filter")
         if row_filter:
             self.data = apply_row_filter(self.data, row_filter)
 
@@ -421,7 +601,7 @@ class Table:
                 columns_exclude.append(col.id)
 
         if columns_exclude:
-            self.data.drop(columns=columns_exclude, inplace=True)
+            self.data = self.data.drop(columns=columns_exclude, errors='ignore')  # They might have been released
 
         #
         # Column filter
@@ -528,19 +708,13 @@ class Table:
         outputs = definition.get('outputs')
 
         #
-        # Produce all unique combinations of the input columns
+        # Produce all unique combinations of the input columns in the order of their first occurrence
+        # The source rows are factorized in one pass and the codes (row ids of the new table) are retained for link columns of the source table
         #
-        """
-        INFO:
-        df_new = df.drop_duplicates(subset=['C1', 'C2', 'C3'])  # Drop duplicates
-        a_df = df.drop_duplicates(['col1', 'col2'])[['col1', 'col2']]
-        df = df.groupby(by=['C1', 'C2', 'C3'], as_index=False).first()  # Using groupby
-        np.unique(df[['col1', 'col2']], axis=0)  # Not for object data (error for object types)
-        """
-        out = source_table.data.drop_duplicates(subset=inputs)  # Really do projection
-        out = out[inputs]  # Leave only project columns (de-duplicate will return all source columns)
+        data = source_table.get_data()
+        codes, first = _factorize([data[x].values for x in inputs])
 
-        out.reset_index(drop=True, inplace=True)
+        out = pd.DataFrame({x: data[x].iloc[first].values for x in inputs}, columns=inputs)  # Only unique rows are copied
 
         # Rename to output names
         if outputs:
@@ -551,8 +725,57 @@ class Table:
             rename_dict = dict(zip(inputs, outputs))
             out.rename(columns=rename_dict, inplace=True)
 
+        self._projection = (source_table.id, list(inputs), source_table.get_data_version(inputs), codes)
+
         return out
 
+    def get_projection_codes(self, source_table, keys, linked_keys):
+        """
+        Return row ids of this (projected) table for all rows of the source table if this table is a projection of the source table along the specified keys.
+        They are computed during projection and can be used as a link column of the source table without looking up the keys.
+        Return None if the table is not such a projection or the source table or this table has changed since projection.
+        """
+        if self._projection is None:
+            return None
+        if len(self._projection) < 5:
+            return None
+        source_table_name, inputs, source_version, codes, version = self._projection
+
+        outputs = self.table_json.get('outputs') or inputs
+        if source_table_name != source_table.id or list(keys) != inputs or list(linked_keys) != list(outputs):
+            return None
+        if source_version != source_table.get_data_version(inputs) or version != self.version:
+            return None
+
+        return self.get_data().index.values[codes]
+
+
+def _factorize(arrays):
+    """
+    Assign a code to each unique combination of values of the arrays (rows) in the order of their first occurrence.
+    Missing values are treated as normal values.
+    Return the codes of all rows and the positions of the first rows with each code.
+    """
+    codes = None
+    for values in arrays:
+        c, uniques = pd.factorize(values)
+        count = len(uniques)
+        if (c < 0).any():  # Missing values get their own code
+            c[c < 0] = count
+            count += 1
+
+        if codes is None:
+            codes = c.astype(np.int64)
+        else:
+            codes = codes * count + c  # Combinations of codes are unique and less than the product of the numbers of codes
+
+        codes, _ = pd.factorize(codes)  # Codes in the order of first occurrence (and the product of their numbers does not overflow)
+
+    # Codes are in the order of first occurrence and hence each new code is greater than all previous codes
+    first = np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)
+
+    return codes, first
+
 
 if __name__ == "__main__":
     pass
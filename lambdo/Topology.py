@@ -29,11 +29,18 @@ class Topology:
         # Here we store the graph of translated and executable operations
         self.layers = []
 
-    def translate(self):
+        # Operations each operation depends upon (edges of the graph)
+        self.dependencies = {}
+
+        # Tables and columns requested to be computed (if any)
+        self.targets = None
+
+    def translate(self, targets=None):
         """
         Build a graph of operations by analyzing table and column definitions.
         The graph consists of table, column and possibly other operations.
         New operations can be added if necessary.
+        :param targets: Table names or column names like 'Table::Column'. If specified, then only operations needed to compute them are included.
         """
 
         #
@@ -62,45 +69,225 @@ class Topology:
         # Build graph of operations by analyzing dependencies
         #
 
-        # Empty collection of already processed elements (they can be simultaneously removed from all)
-        done = []
+        # Dependencies are computed only once for each operation
+        self.dependencies = {}
+        for elem in all_operations:
+            self.dependencies[elem] = self._get_dependencies(elem)
+
+        # Leave only operations which are needed to compute the targets
+        self.targets = targets
+        if targets:
+            required = self._get_required_operations(targets)
+            all_operations = [x for x in all_operations if x in required]
+
+        position = {elem: i for i, elem in enumerate(all_operations)}
+        dependents = {elem: [] for elem in all_operations}
+        waiting = {}  # Number of dependencies which have not been executed yet
+        for elem in all_operations:
+            deps = set(self.dependencies[elem])
+            waiting[elem] = len(deps)
+            for dep in deps:
+                if dep in dependents:
+                    dependents[dep].append(elem)
+                # Otherwise the dependency is not an operation and hence this element will never be executed
+
         # Topology to be built is a list of layers in the order of execution of their operations. First layer does not have dependencies.
+        # Each next layer consists of operations with all dependencies in the previous layers (Kahn's algorithm)
         layers = []
-        while True:
-            layer = []
+        layer = [elem for elem in all_operations if waiting[elem] == 0]
+        while layer:
+            layers.append(layer)
+
+            next_layer = []
+            for elem in layer:
+                for dependent in dependents[elem]:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        next_layer.append(dependent)
+
+            layer = sorted(next_layer, key=lambda x: position[x])  # Preserve the order of definitions within one layer
+
+        self.layers = layers
+
+        return layers
+
+    def _get_target_operations(self, target):
+        """Find operations which produce the target table (with all its columns and filters) or the target column."""
+        segments = target.split('::', 1)
+        table = self.workflow.get_table(segments[0].strip())
+        if table is None:
+            log.warning("Target table '{0}' cannot be found. Ignored.".format(segments[0]))
+            return []
+
+        if len(segments) == 1:
+            return table.get_all_own_dependencies()
+
+        column_name = segments[1].strip()
+        columns = table.get_definitions_for_columns(column_name)
+        if not columns:
+            column = table.get_column(column_name)
+            columns = [column] if column else []
+        if not columns:
+            log.warning("Target column '{0}' cannot be found. Ignored.".format(target))
+        return columns
+
+    def _get_required_operations(self, targets):
+        """Find all operations the targets depend upon directly or indirectly (including the target operations)."""
+        if isinstance(targets, str):
+            targets = [targets]
+
+        required = set()
+        stack = []
+        for target in targets:
+            stack.extend(self._get_target_operations(target))
 
-            # We will build this new layer from the available (not added to previous layers) operations
-            for elem in all_operations:
+        while stack:
+            elem = stack.pop()
+            if elem is None or elem in required:
+                continue
+            required.add(elem)
+            stack.extend(self.dependencies.get(elem, []))
+
+        return required
+
+    def _get_dependencies(self, elem):
+        """Find all operations which have to be executed before the specified operation."""
+        if isinstance(elem, (Table, Column)):
+            deps = elem.get_dependencies()  # Get all element definitions this element depends upon
+            if isinstance(elem, Column):
+                deps = deps + [x for x in self._get_implicit_dependencies(elem) if x not in deps]
+        elif isinstance(elem, (tuple, list)) and isinstance(elem[0], Table):
+            deps = [elem[0]]  # Filter depends on its table
+            deps.extend(elem[0].columns)  # Filter is applied only after all columns have been evaluated
+        else:
+            deps = []  # Error: unknown operation
+        return deps
+
+    def _get_implicit_dependencies(self, elem):
+        """
+        A calculate column with implicit inputs (an empty list means all columns, or all columns except for the excluded ones) reads all columns of its table.
+        Therefore, it depends on all column definitions of its table preceding it (except for those excluded) so that it sees the same columns independent of the order of execution.
+        """
+        if not elem.is_op_calc():
+            return []
+        exclude = self._get_excluded_inputs(elem)
+        if exclude is None:
+            return []  # Explicit inputs
 
-                if elem in done:
+        columns = elem.table.columns
+        position = next((i for i, x in enumerate(columns) if x is elem), len(columns))
+        deps = [x for x in columns[:position] if not all(name in exclude for name in x.get_outputs())]  # Excluded columns are not read
+
+        # Columns computed from this column are evaluated after it
+        depending = self._get_depending(deps, elem)
+        return [x for x in deps if not depending[x]]
+
+    def _get_excluded_inputs(self, elem):
+        """Return names of the columns excluded from the implicit inputs of the column or None if its inputs are explicit."""
+        inputs = elem.get_inputs()
+        if isinstance(inputs, dict):
+            exclude = inputs.get('exclude') or []
+            return exclude if isinstance(exclude, list) else [exclude]
+        if isinstance(inputs, list) and inputs and all(isinstance(x, str) for x in inputs):
+            return None
+        return []  # All columns (an empty list or columns specified by their positions)
+
+    def _get_depending(self, ops, dep):
+        """
+        Determine for each of the operations if it depends on the other operation directly or indirectly (only already known dependencies are used).
+        All operations are checked in one traversal of the graph where each operation is visited only once.
+        """
+        depending = {dep: True}
+        visited = set()
+        for op in ops:
+            stack = [op]
+            while stack:
+                x = stack[-1]
+                if x in depending:
+                    stack.pop()
+                    continue
+                deps = [y for y in self.dependencies.get(x, []) if y is not None]
+                if x not in visited:
+                    visited.add(x)
+                    stack.extend(y for y in deps if y not in depending and y not in visited)
                     continue
+                stack.pop()
+                depending[x] = any(depending.get(y, False) for y in deps)  # Dependencies in a cycle are not followed
+        return depending
 
-                #
-                # Find dependencies of this operation
-                #
-                if isinstance(elem, (Table, Column)):
-                    deps = elem.get_dependencies()  # Get all element definitions this element depends upon
-                elif isinstance(elem, (tuple, list)) and isinstance(elem[0], Table):
-                    deps = [elem[0]]  # Filter depends on its table
-                    deps.extend(elem[0].columns)  # Filter is applied only after all columns have been evaluated
-                else:
-                    pass  # Error: unknown operation
-
-                #
-                # If all dependencies have been executed then add this element to the current layer
-                #
-                if set(deps) <= set(done):
-                    layer.append(elem)
-
-            if len(layer) == 0:
-                break
+    def get_dependencies(self, elem):
+        """Return operations of the topology which have to be executed before the specified operation."""
+        deps = self.dependencies.get(elem, [])
+        return [x for x in deps if x is not None]
 
-            layers.append(layer)
-            done.extend(layer)
+    def get_input_operations(self, elem):
+        """
+        Return the dependencies of the operation and other operations producing data it reads (e.g., all columns of a fact table read by an aggregate column with implicit inputs).
+        Operations which depend on this operation are not included.
+        """
+        deps = self.get_dependencies(elem)
+        reads = [x for x in self._get_read_dependencies(elem) if x is not None and x is not elem and x not in deps]
+        depending = self._get_depending(reads, elem)
+        reads = [x for x in reads if not depending[x]]
+        return deps + list(dict.fromkeys(reads))
 
-        self.layers = layers
+    def get_targets(self):
+        """Return operations which produce the targets (tables with all their columns or columns)."""
+        if not self.targets:
+            return []
+        targets = [self.targets] if isinstance(self.targets, str) else self.targets
+        return [x for target in targets for x in self._get_target_operations(target)]
 
-        return layers
+    def get_consumers(self):
+        """
+        For each operation, find the operations of this topology which read its data.
+        A column is read by the operations which depend on it.
+        A table is read by the operations which depend on this table or its columns and by its own columns and filter.
+        The filter of a table reads only the columns used by its row filter.
+        """
+        ops = [elem for layer in self.layers for elem in layer]
+        consumers = {elem: set() for elem in ops}
+
+        for elem in ops:
+            for dep in self._get_read_dependencies(elem):
+                if dep in consumers and dep is not elem:
+                    consumers[dep].add(elem)
+
+        for elem in ops:
+            if not isinstance(elem, Table):
+                continue
+            own = [x for x in elem.get_all_own_dependencies() if x in consumers and x is not elem]
+            for x in own:
+                consumers[elem].add(x)
+                consumers[elem].update(consumers[x])
+            consumers[elem].discard(elem)
+
+        return consumers
+
+    def _get_read_dependencies(self, elem):
+        """Find operations which produce data read by the specified operation."""
+        if isinstance(elem, (tuple, list)):
+            table = elem[0]
+            names = table.get_filter_inputs()
+            if names is None:
+                return [table] + table.columns
+            return [table] + [x for x in table.columns if set(x.get_outputs()) & set(names)]
+
+        deps = self.get_dependencies(elem)
+
+        # Operations executed after the filter of a table do not read the columns removed by this filter
+        filtered = [x[0] for x in deps if isinstance(x, (tuple, list))]
+        deps = [x for x in deps if not (isinstance(x, Column) and x.table in filtered and not all(x.table.is_column_retained(name) for name in x.get_outputs()))]
+
+        # All fact columns (except for the excluded ones) are read by aggregations with implicit inputs (e.g., an empty list means all columns)
+        # Calculate columns with implicit inputs read only the preceding columns of their table which are already their dependencies
+        if isinstance(elem, Column) and (elem.is_op_aggregate() or elem.is_op_accumulate()):
+            exclude = self._get_excluded_inputs(elem)
+            table = self.workflow.get_table(elem.column_json.get('fact_table'))
+            if exclude is not None and table is not None:
+                deps = deps + [x for x in table.columns if not all(name in exclude for name in x.get_outputs())]
+
+        return deps
 
 
 if __name__ == '__main__':
@@ -5,11 +5,13 @@ import json
 from lambdo.utils import *
 from lambdo.resolve import *
 from lambdo.transform import *
+from lambdo.groups import *
 
 from lambdo.Workflow import *
 from lambdo.Table import *
 from lambdo.Column import *
 from lambdo.Topology import *
+from lambdo.Executor import *
 
 import logging
 log = logging.getLogger('lambdo.workflow')
@@ -40,6 +42,17 @@ class Workflow:
         imports = self.workflow_json.get('imports', [])
         self.modules = import_modules(imports)
 
+        # Measured durations of operations (in seconds) which are used to prioritize long chains of operations
+        self.costs = {}
+
+        # Groupings of fact tables by link columns shared by aggregate columns (their memory is limited by the budget in bytes)
+        self.groupings = Groupings(budget=self.workflow_json.get('grouping_budget'))
+
+        # Store of trained models which are reused if the training data and parameters do not change (the cache of results is used by default)
+        self.train_cache = self.workflow_json.get('train_cache')
+        if isinstance(self.train_cache, str):
+            self.train_cache = Cache(self.train_cache)
+
         #
         # Create table objects
         #
@@ -88,29 +101,24 @@ class Workflow:
     # Data operations
     #
 
-    def execute(self):
+    def execute(self, jobs=None, executor=None, cache=None, targets=None, stream=False, release=False):
         """
         Execute the whole workflow.
         This means executing all tables according to their dependencies.
+        :param jobs: Number of workers used to execute independent operations simultaneously. None or 1 means sequential execution. Zero or negative value means all cores.
+        :param executor: Kind of workers: 'thread' (default) or 'process'. Table and column definitions can overwrite it in their 'executor' field.
+        :param cache: Directory where results of tables and columns are stored and reused in next executions if their definitions and inputs do not change.
+        :param targets: Names of tables or columns ('Table::Column') to be computed. Only operations they depend upon will be executed. All operations are executed by default.
+        :param stream: Execute all tables which can be loaded in chunks (and not only those with the 'stream' field) chunk by chunk.
+        :param release: Release data of tables and columns as soon as they are not needed by next operations unless they are outputs ('output' field) or targets.
         """
         log.info("Start executing workflow '{0}'.".format(self.id))
 
         topology = Topology(self)
-        topology.translate()
-        for layer in topology.layers:
-            # Execute operations in one layer
-            for elem in layer:
-                if isinstance(elem, Table):
-                    elem.populate()
-                elif isinstance(elem, Column):
-                    elem.evaluate()
-                elif isinstance(elem, (tuple, list)):
-                    if isinstance(elem[0], Table) and elem[1] == 'filter':
-                        elem[0].execute_filter()
-                    else:
-                        pass  # Warning: wrong object type in an operation
-                else:
-                    pass  # Warning: wrong object type in an operation
+        topology.translate(targets=targets)
+
+        runner = Executor(self, jobs=jobs, mode=executor, cache=cache, stream=stream, release=release)
+        runner.execute(topology)
 
         log.info("Finish executing workflow '{0}'.".format(self.id))
 
@@ -0,0 +1,187 @@
+__author__="Alexandr Savinov"
+
+import inspect
+
+import numpy as np
+import pandas as pd
+
+import logging
+log = logging.getLogger('lambdo.engine')
+
+#
+# Compiled execution engine.
+# User-defined functions are compiled by numba (optional dependency) in nopython mode, and the loops over rows and windows are also compiled.
+# If a function cannot be compiled then None is returned and the caller falls back to the standard (interpreted) evaluation.
+#
+
+_compiled = {}  # Function key -> compiled function (or an error message if it cannot be compiled)
+_loops = {}  # (Function key, loop kind) -> compiled loop (or an error message if it cannot be compiled)
+
+def evaluate_rows(func, data, model):
+    """
+    Apply the function to each row using compiled code.
+    A single input column is passed as a value and multiple input columns as a 1-d ndarray with the row values.
+    Return a Series or None if the function cannot be compiled.
+    """
+    kind = 'row' if len(data.columns) == 1 else 'rows'
+    return _evaluate(func, data, model, kind, 0)
+
+def evaluate_windows(func, data, window, model):
+    """
+    Apply the function to each window using compiled code.
+    A single input column is passed as a 1-d ndarray and multiple input columns as a 2-d ndarray with the window rows.
+    Return a Series or None if the function cannot be compiled.
+    """
+    kind = 'window' if len(data.columns) == 1 else 'windows'
+    return _evaluate(func, data, model, kind, window)
+
+def _evaluate(func, data, model, kind, window):
+
+    numba = _import_numba()
+    if numba is None:
+        return None
+
+    try:
+        args = _get_model_args(func, model)
+    except Exception as e:
+        log.info("Function '{0}' will not be compiled. Model cannot be passed as positional arguments: {1}".format(_get_name(func), e))
+        return None
+
+    try:
+        values = data.values.astype(np.float64)
+    except Exception as e:
+        log.info("Function '{0}' will not be compiled. Input data is not numeric: {1}".format(_get_name(func), e))
+        return None
+    if kind in ['row', 'window']:
+        values = values[:, 0]
+
+    key = _get_key(func)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = _compile(numba, func)
+        _compiled[key] = compiled
+    if isinstance(compiled, str):
+        log.info("Function '{0}' will not be compiled: {1}".format(_get_name(func), compiled))
+        return None
+
+    loop = _loops.get((key, kind))
+    if loop is None:
+        loop = _make_loop(numba, compiled, kind)
+        _loops[(key, kind)] = loop
+    if isinstance(loop, str):
+        log.info("Function '{0}' will not be compiled: {1}".format(_get_name(func), loop))
+        return None
+
+    try:
+        out = loop(values, window, *args)
+    except Exception as e:
+        # Typing errors are detected only when the function is called with concrete argument types
+        reason = str(e).split('\n')[0]
+        log.info("Function '{0}' cannot be compiled: {1}. Use the standard engine.".format(_get_name(func), reason))
+        if isinstance(e, numba.core.errors.NumbaError):
+            _loops[(key, kind)] = reason  # Do not try to compile it again
+        return None
+
+    return pd.Series(out, index=data.index)
+
+def _import_numba():
+    try:
+        import numba
+    except ImportError:
+        log.warning("Engine 'numba' requires the numba package which is not installed. Use the standard engine.")
+        return None
+    return numba
+
+def _get_name(func):
+    return getattr(func, '__qualname__', None) or getattr(func, '__name__', None) or str(func)
+
+def _get_key(func):
+    """
+    Functions produced from the same lambda definition have equal code objects and hence they are compiled only once.
+    Functions with the same code but different default values or globals are compiled separately because these values are frozen by compilation.
+    """
+    code = getattr(func, '__code__', None)
+    if code is None or getattr(func, '__closure__', None):
+        return func
+    kwdefaults = tuple(sorted((func.__kwdefaults__ or {}).items()))
+    key = (code, func.__defaults__, kwdefaults, id(func.__globals__))
+    try:
+        hash(key)
+    except TypeError:
+        return func  # Unhashable default values
+    return key
+
+def _get_model_args(func, model):
+    """Compiled functions cannot get keyword arguments. Therefore, the model is converted to positional arguments according to the function signature."""
+    if not model:
+        return ()
+    if isinstance(model, (list, tuple)):
+        return tuple(model)
+    if not isinstance(model, dict):
+        return (model,)
+
+    params = list(inspect.signature(func).parameters)[1:]  # The first parameter is data
+    missing = [x for x in model if x not in params]
+    if missing:
+        raise ValueError("unknown parameters {0}".format(missing))
+    args = []
+    for name in params:
+        if name not in model:
+            break  # Remaining parameters have default values
+        args.append(model[name])
+    return tuple(args)
+
+def _compile(numba, func):
+    """Compile the function or return a string with the reason why it cannot be compiled."""
+    if isinstance(func, numba.core.registry.CPUDispatcher):
+        return func  # Already compiled
+
+    if getattr(func, '__code__', None) is None:
+        return "it is not a Python function"
+
+    try:
+        return numba.njit(func)
+    except Exception as e:
+        return str(e).split('\n')[0]
+
+def _make_loop(numba, cfunc, kind):
+    """Compile a loop calling the compiled function for each row or window."""
+
+    if kind == 'row':
+        def loop(x, w, *args):
+            out = np.empty(x.shape[0])
+            for i in range(x.shape[0]):
+                out[i] = cfunc(x[i], *args)
+            return out
+
+    elif kind == 'rows':
+        def loop(x, w, *args):
+            out = np.empty(x.shape[0])
+            for i in range(x.shape[0]):
+                out[i] = cfunc(x[i, :], *args)
+            return out
+
+    elif kind == 'window':
+        def loop(x, w, *args):
+            n = x.shape[0]
+            out = np.full(n, np.nan)
+            for i in range(w - 1, n):
+                win = x[i - w + 1:i + 1]
+                if np.isnan(win).any():
+                    continue  # Windows with missing values produce missing values (as in pandas rolling)
+                out[i] = cfunc(win, *args)
+            return out
+
+    else:
+        def loop(x, w, *args):
+            n = x.shape[0]
+            out = np.full(n, np.nan)
+            for i in range(w - 1, n):
+                out[i] = cfunc(x[i - w + 1:i + 1, :], *args)
+            return out
+
+    return numba.njit(loop)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,215 @@
+__author__="Alexandr Savinov"
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import logging
+log = logging.getLogger('lambdo.groups')
+
+#
+# Aggregation of facts by their groups.
+# Groups are represented by integer codes (row positions in the group table) which are computed from the link column of the fact table.
+# Therefore, facts can be reduced directly by codes (e.g., using bincount) without hashing or sorting their keys.
+#
+
+group_aggregations = ['size', 'count', 'sum', 'mean', 'var', 'std', 'min', 'max', 'first', 'last', 'median', 'nunique', 'mean_weighted']
+
+def evaluate_group_aggregation(name, kwargs, codes, values, size):
+    """
+    Aggregate the values for each group.
+    Codes are group numbers from 0 to size-1 for each value (negative codes mean that the value does not belong to any group).
+    Values are a 1-d array, or a 2-d array for aggregations with many inputs (mean_weighted).
+    Return an array with one value for each group (missing value for groups without facts) or None if the aggregation cannot be applied to these values.
+    """
+    if name not in group_aggregations:
+        return None
+    if values.ndim != (2 if name == 'mean_weighted' else 1):
+        return None
+
+    in_group = codes >= 0
+    sizes = np.bincount(codes[in_group], minlength=size)
+    empty = sizes == 0
+
+    if name == 'size':
+        return _set_missing(sizes, empty)
+
+    if name == 'mean_weighted':
+        if values.shape[1] != 2 or values.dtype.kind not in 'biuf':
+            return None
+        x = values[in_group, 0].astype(np.float64)
+        w = values[in_group, 1].astype(np.float64)
+        c = codes[in_group]
+        products = np.bincount(c, weights=x * w, minlength=size)  # Missing values produce missing sums (as the dot product)
+        weights = np.bincount(c[~np.isnan(w)], weights=w[~np.isnan(w)], minlength=size)  # Missing weights are skipped
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = products / weights
+        return _set_missing(out, empty)
+
+    if name == 'nunique':
+        out = pd.Series(values[in_group]).groupby(codes[in_group]).nunique()
+        return _set_missing(out.reindex(range(size), fill_value=0).values, empty)
+
+    valid = in_group & ~pd.isna(values)
+    if name == 'count':
+        return _set_missing(np.bincount(codes[valid], minlength=size), empty)
+
+    if name in ['first', 'last']:
+        positions = np.flatnonzero(valid)
+        if name == 'first':
+            selected = np.full(size, len(values))
+            np.minimum.at(selected, codes[positions], positions)
+        else:
+            selected = np.full(size, -1)
+            np.maximum.at(selected, codes[positions], positions)
+        found = (selected >= 0) & (selected < len(values))
+        out = pd.api.extensions.take(values, np.where(found, selected, -1), allow_fill=True)
+        return out
+
+    if values.dtype.kind not in 'biuf':
+        return None  # Only numeric values are reduced by codes
+
+    if name == 'sum' and values.dtype.kind in 'biu':
+        # Integers are added exactly (floats represent integers exactly only up to 2**53)
+        out = np.zeros(size, dtype=np.uint64 if values.dtype.kind == 'u' else np.int64)
+        np.add.at(out, codes[in_group], values[in_group].astype(out.dtype))
+        return _set_missing(out, empty)
+
+    x = values.astype(np.float64)
+    c = codes[valid]
+    x = x[valid]
+
+    if name == 'median':
+        out = pd.Series(x).groupby(c).median()
+        return out.reindex(range(size)).values
+
+    if name in ['min', 'max']:
+        out = np.full(size, np.nan)
+        (np.fmin if name == 'min' else np.fmax).at(out, c, x)  # Initial missing values are ignored
+        return _set_missing(out, empty)
+
+    counts = np.bincount(c, minlength=size)
+    sums = np.bincount(c, weights=x, minlength=size)
+
+    if name == 'sum':
+        return _set_missing(sums, empty)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        if name == 'mean':
+            return means
+
+        # Variance is computed from deviations from group means (two passes) for precision
+        ddof = kwargs.get('ddof', 1)
+        squares = np.bincount(c, weights=(x - means[c]) ** 2, minlength=size)
+        out = squares / (counts - ddof)
+        out[counts - ddof <= 0] = np.nan
+        return np.sqrt(out) if name == 'std' else out
+
+def get_segments(codes, size):
+    """
+    Sort facts by their groups.
+    Return the positions of facts in the sorted order and offsets of the groups, that is, facts of group g are at positions order[offsets[g]:offsets[g+1]].
+    Facts without a group (negative codes) are excluded.
+    """
+    valid = np.flatnonzero(codes >= 0)
+    order = valid[np.argsort(codes[valid], kind='stable')]  # Facts of one group retain their order
+
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes[valid], minlength=size), out=offsets[1:])
+
+    return order, offsets
+
+class Grouping:
+    """
+    Facts of one table grouped by a link column: group codes for each fact and (on demand) facts sorted by groups.
+    Arrays use 32 bit integers if possible.
+    """
+
+    def __init__(self, codes, size):
+        self.codes = _compact(codes, size)
+        self.size = size  # Number of groups
+        self._segments = None
+        self._lock = threading.Lock()
+
+    def get_segments(self):
+        """Return the positions of facts sorted by groups and offsets of the groups. They are computed once when requested for the first time."""
+        with self._lock:
+            if self._segments is None:
+                order, offsets = get_segments(self.codes, self.size)
+                self._segments = (_compact(order, len(self.codes)), _compact(offsets, len(self.codes)))
+            return self._segments
+
+    def get_memory(self):
+        """Memory used by the arrays of this grouping (in bytes)."""
+        return self.codes.nbytes + sum(x.nbytes for x in self._segments or [])
+
+class Groupings:
+    """
+    Cache of groupings shared by the aggregate columns of one workflow.
+    Each grouping is stored with the versions of the data it was built from and it is rebuilt if the versions change.
+    If the memory used by the groupings exceeds the budget (in bytes), then the least recently used groupings are evicted.
+    """
+
+    default_budget = 256 * 2**20
+
+    def __init__(self, budget=None):
+        self.budget = self.default_budget if budget is None else budget
+        self._entries = OrderedDict()  # Key -> (versions, grouping) in the order of their use
+        self._lock = threading.Lock()
+
+    def get(self, key, versions, build):
+        """Return the grouping for the key which has been built from the data with these versions. Otherwise, build a new grouping."""
+        with self._lock:  # Aggregate columns using the same grouping can be evaluated in different threads
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+            grouping = build()
+            self._entries[key] = (versions, grouping)
+            self._entries.move_to_end(key)
+
+            self._evict()
+
+            log.debug("Grouping {0} built. Groupings use {1} bytes.".format(key, self._get_memory()))
+
+            return grouping
+
+    def get_memory(self):
+        """Memory used by all cached groupings (in bytes)."""
+        with self._lock:
+            return self._get_memory()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get_memory(self):
+        return sum(grouping.get_memory() for _, grouping in self._entries.values())
+
+    def _evict(self):
+        """Remove the least recently used groupings (except for the last one) until the memory is within the budget."""
+        while len(self._entries) > 1 and self._get_memory() > self.budget:
+            key, _ = self._entries.popitem(last=False)
+            log.info("Grouping {0} evicted from the cache.".format(key))
+
+def _compact(a, bound):
+    """Store integers less than the bound using the smallest sufficient type (32 or 64 bits)."""
+    return a.astype(np.int32 if bound < 2**31 else np.int64, copy=False)
+
+def _set_missing(out, empty):
+    """Groups without facts get missing values."""
+    if empty.any():
+        out = out.astype(np.float64)
+        out[empty] = np.nan
+    return out
+
+
+if __name__ == "__main__":
+    pass
@@ -14,7 +14,7 @@ import logging
 log = logging.getLogger('lambdo')
 
 
-def run(workflow_file):
+def run(workflow_file, jobs=None, executor=None, cache=None, targets=None, stream=False, release=False):
 
     with open(workflow_file, encoding='utf-8') as f:
         wf_str = f.read()
@@ -24,7 +24,7 @@ def run(workflow_file):
 
         wf_json = json.loads(wf_str)
     wf = Workflow(wf_json)
-    wf.execute()
+    wf.execute(jobs=jobs, executor=executor, cache=cache, targets=targets, stream=stream, release=release)
 
     return 0
 
@@ -39,6 +39,14 @@ def main(args = None):
 
     parser.add_argument('-l', '--log', dest="loglevel", required=False, choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default='INFO', help="Set the logging level (default INFO)")
 
+    parser.add_argument('-j', '--jobs', dest="jobs", type=int, required=False, default=None, help="Number of workers executing independent operations simultaneously (default sequential execution, 0 means all cores)")
+    parser.add_argument('-e', '--executor', dest="executor", required=False, choices=['thread', 'process'], default='thread', help="Kind of workers used with --jobs (default thread)")
+    parser.add_argument('-c', '--cache', dest="cache", required=False, default=None, help="Directory for storing results of tables and columns which will be reused if their definitions and inputs do not change")
+    parser.add_argument('-t', '--target', dest="targets", action='append', required=False, default=None, help="Table or column ('Table::Column') to be computed along with only the operations it depends upon (can be repeated)")
+    parser.add_argument('-s', '--stream', dest="stream", action='store_true', required=False, default=False, help="Load and process tables in chunks of rows if possible (and not only tables with the 'stream' field)")
+
+    parser.add_argument('-r', '--release', dest="release", action='store_true', required=False, default=False, help="Release data of tables and columns as soon as they are not needed unless they are outputs ('output' field) or targets")
+
     parser.add_argument('workflow_file', type=str, help='workflow JSON file')
 
     arguments = parser.parse_args(args)
@@ -51,7 +59,7 @@ def main(args = None):
 
     exitcode = 1
     try:
-        exitcode = run(arguments.workflow_file)
+        exitcode = run(arguments.workflow_file, jobs=arguments.jobs, executor=arguments.executor, cache=arguments.cache, targets=arguments.targets, stream=arguments.stream, release=arguments.release)
     except Exception as e:
         log.error("Error executing workflow file {}. ".format(arguments.workflow_file))
         log.exception(e)
@@ -48,6 +48,97 @@ def resolve_full_name(full_name: str):
 
     return None
 
+def is_vectorized_function(func, inputs_count=1):
+    """
+    Determine if the function can be applied to whole columns instead of individual values producing the same result.
+    These are NumPy universal functions (with the number of arguments equal to the number of input columns),
+    methods of pandas Series and pandas functions which accept both single values and columns.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(func, np.ufunc):
+        return func.nin == inputs_count
+
+    if inputs_count != 1:
+        return False
+
+    name = getattr(func, '__name__', None)
+    if not name:
+        return False
+
+    # Method of Series like 'pandas.core.series:Series.abs'
+    if getattr(pd.Series, name, None) is func:
+        return True
+
+    # Functions which are applied to a column element-wise
+    if name in ['to_datetime', 'to_numeric', 'to_timedelta', 'isna', 'isnull', 'notna', 'notnull'] and getattr(pd, name, None) is func:
+        return True
+
+    return False
+
+def get_rolling_aggregation(func):
+    """
+    Find a built-in rolling aggregation of pandas which produces the same result as the function applied to each window.
+    Return the name of the method of the rolling object and its arguments or None if the function is not a well-known reducer.
+    """
+    import builtins
+    import numpy as np
+    import pandas as pd
+
+    # Windows with missing values produce missing values so NaN-aware functions are equivalent to the normal ones
+    reducers = [
+        ('mean', {}, [np.mean, np.nanmean, np.average, pd.Series.mean]),
+        ('sum', {}, [np.sum, np.nansum, builtins.sum, pd.Series.sum]),
+        ('min', {}, [np.min, np.amin, np.nanmin, builtins.min, pd.Series.min]),
+        ('max', {}, [np.max, np.amax, np.nanmax, builtins.max, pd.Series.max]),
+        ('std', {'ddof': 0}, [np.std, np.nanstd]),
+        ('std', {'ddof': 1}, [pd.Series.std]),
+        ('var', {'ddof': 0}, [np.var, np.nanvar]),
+        ('var', {'ddof': 1}, [pd.Series.var]),
+        ('median', {}, [np.median, np.nanmedian, pd.Series.median]),
+        ('count', {}, [builtins.len, pd.Series.count]),
+    ]
+
+    for name, kwargs, funcs in reducers:
+        if any(func is f for f in funcs):
+            return name, kwargs
+
+    return None
+
+def get_group_aggregation(func):
+    """
+    Find a built-in group aggregation which produces the same result as the function applied to each group of facts.
+    Return the name of the aggregation and its arguments or None if the function is not a well-known reducer.
+    Missing values are skipped as in pandas groupby (which also uses one delta degree of freedom for NumPy std and var).
+    """
+    import builtins
+    import numpy as np
+    import pandas as pd
+    import lambdo.std
+
+    reducers = [
+        ('sum', {}, [np.sum, np.nansum, builtins.sum, pd.Series.sum]),
+        ('mean', {}, [np.mean, np.nanmean, pd.Series.mean]),
+        ('min', {}, [np.min, np.amin, np.nanmin, builtins.min, pd.Series.min]),
+        ('max', {}, [np.max, np.amax, np.nanmax, builtins.max, pd.Series.max]),
+        ('std', {'ddof': 1}, [np.std, np.nanstd, pd.Series.std]),
+        ('var', {'ddof': 1}, [np.var, np.nanvar, pd.Series.var]),
+        ('median', {}, [np.median, np.nanmedian, pd.Series.median]),
+        ('count', {}, [pd.Series.count]),
+        ('size', {}, [np.size, builtins.len]),
+        ('first', {}, [lambdo.std.first]),
+        ('last', {}, [lambdo.std.last]),
+        ('nunique', {}, [pd.Series.nunique]),
+        ('mean_weighted', {}, [lambdo.std.mean_weighted]),
+    ]
+
+    for name, kwargs, funcs in reducers:
+        if any(func is f for f in funcs):
+            return name, kwargs
+
+    return None
+
 def all_modules():
     modules = []
     return modules
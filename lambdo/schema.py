@@ -0,0 +1,130 @@
+__author__="Alexandr Savinov"
+
+import numpy as np
+import pandas as pd
+
+import logging
+log = logging.getLogger('lambdo.schema')
+
+#
+# Table schema: types of columns which are applied when the table data is populated.
+# A schema allows for storing columns in compact types: categorical (dictionary-encoded) columns, (Arrow-backed) strings, dates and smaller numbers.
+#
+# "schema": {
+#   "columns": {"Symbol": "category", "Name": "string[pyarrow]", "Date": {"type": "datetime", "format": "%Y-%m-%d"}, "Volume": "int32"},
+#   "strings": "category",  # Type of all other string (object) columns
+#   "downcast": true  # Other float columns are stored as float32 and integer columns as the smallest integer type ("float" or "integer" for only one kind)
+# }
+#
+
+def apply_schema(data, schema):
+    """
+    Convert the columns of the data frame to the types declared in the schema and return the result.
+    Columns are converted one by one. A column which cannot be converted is retained as it is and the reason is logged.
+    """
+    if not schema or not isinstance(data, pd.DataFrame):
+        return data
+    if not isinstance(schema, dict):
+        log.warning("Schema '{0}' has to be an object. Ignored.".format(schema))
+        return data
+
+    columns = schema.get('columns') or {}
+    strings = schema.get('strings')
+    downcast = _get_downcast(schema.get('downcast'))
+
+    converted = {}
+    for name in data.columns:
+        values = data[name]
+        spec = columns.get(name)
+        try:
+            if spec is not None:
+                out = convert_column(values, spec)
+            elif strings and values.dtype == object:
+                out = convert_column(values, strings)
+            elif downcast:
+                out = _downcast(values, downcast)
+            else:
+                continue
+        except Exception as e:
+            log.warning("Column '{0}' cannot be converted to '{1}'. Exception: {2}".format(name, spec or strings, e))
+            continue
+
+        if out is not values:
+            converted[name] = out
+
+    for name in columns:
+        if name not in data.columns:
+            log.warning("Column '{0}' declared in the schema cannot be found. Skip column.".format(name))
+
+    if not converted:
+        return data
+
+    out = data.copy(deep=False)  # Columns which are not converted are not copied
+    for name, values in converted.items():
+        out[name] = values
+
+    return out
+
+def convert_column(values, spec):
+    """
+    Convert the series to the type specified as a dtype name (like 'int32', 'category' or 'string[pyarrow]') or as an object with the 'type' field and parameters:
+    'datetime' with 'format', 'category' with 'categories' and 'ordered', or any dtype with 'errors': 'coerce' to convert invalid numbers to missing values.
+    """
+    if isinstance(spec, str):
+        spec = {'type': spec}
+
+    dtype = spec.get('type')
+
+    if dtype in ['datetime', 'datetime64', 'datetime64[ns]']:
+        return pd.to_datetime(values, format=spec.get('format'), errors=spec.get('errors', 'raise'), utc=spec.get('utc', False))
+
+    if dtype == 'category':
+        categories = spec.get('categories')
+        if categories is None and not spec.get('ordered'):
+            return values.astype('category')
+        return values.astype(pd.CategoricalDtype(categories=categories, ordered=spec.get('ordered', False)))
+
+    if dtype == 'string[pyarrow]':
+        try:
+            import pyarrow
+        except ImportError:
+            log.warning("Type 'string[pyarrow]' requires the pyarrow package which is not installed. Use type 'string'.")
+            dtype = 'string'
+
+    if spec.get('errors') == 'coerce':
+        values = pd.to_numeric(values, errors='coerce')
+
+    return values.astype(dtype)
+
+def get_schema(data):
+    """Return the schema with the current types of the columns of the data frame (for example, to store it together with the data)."""
+    columns = {}
+    for name in data.columns:
+        dtype = data[name].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns[name] = {'type': 'category', 'categories': dtype.categories.tolist(), 'ordered': bool(dtype.ordered)}
+        else:
+            columns[name] = str(dtype)
+    return {'columns': columns}
+
+def _get_downcast(downcast):
+    if downcast is True:
+        return ['float', 'integer']
+    if not downcast:
+        return []
+    if isinstance(downcast, str):
+        downcast = [downcast]
+    return ['float' if x in ['float', 'float32'] else x for x in downcast]
+
+def _downcast(values, downcast):
+    """Store floats as float32 and integers in the smallest integer type which can represent all values."""
+    kind = values.dtype.kind
+    if kind == 'f' and 'float' in downcast and values.dtype.itemsize > 4:
+        return values.astype(np.float32)
+    if kind in 'iu' and 'integer' in downcast:
+        return pd.to_numeric(values, downcast='integer' if kind == 'i' else 'unsigned')
+    return values
+
+
+if __name__ == "__main__":
+    pass
@@ -4,10 +4,12 @@ import os
 import pickle
 import urllib.parse
 
+import numpy as np
 import pandas as pd
 
 from lambdo.utils import *
 from lambdo.resolve import *
+from lambdo.ColumnStore import *
 
 import logging
 log = logging.getLogger('lambdo.std')
@@ -133,13 +135,71 @@ def _aggregate_simple(gb, out, model, col_json):
     #
     out[outputs] = sr
 
+def read_columns(path, columns=None, mmap=True, chunksize=None):
+    """
+    Read a table stored by write_columns from the directory.
+    Columns are memory-mapped and hence the table is loaded without reading its data, and only the columns (and rows) which are used are read from disk.
+    Return a column store with the specified columns (all by default), or an iterator of data frames if the chunk size is specified.
+    """
+    store = ColumnStore.load(path, columns, mmap=mmap)
+    if chunksize:
+        return _iterate_chunks(store.get_frame(), int(chunksize))
+    return store
+
+def _iterate_chunks(df, chunksize):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize].copy(deep=False)  # Chunks reference the arrays but they can get new columns
+
+def write_columns(df, path, mode='w', **model):
+    """
+    Write the table to the directory with a binary file for each column which can be memory-mapped by read_columns.
+    If the mode is 'a', then the rows are appended to the stored columns (for example, when tables are streamed in chunks).
+    """
+    store = df if isinstance(df, ColumnStore) else ColumnStore(df)
+    store.save(path, mode=mode)
+
+def partial_fit(X, y=None, model=None, estimator=None, params=None, **fit_params):
+    """
+    Train function for incremental training by estimators with the partial_fit method (like sklearn.linear_model:SGDRegressor).
+    The model is updated by the new data. If there is no model yet, then a new estimator of the specified class is created with the parameters.
+    """
+    if model is None:
+        cls = resolve_full_name(estimator) if isinstance(estimator, str) else estimator
+        if cls is None:
+            log.error("Cannot resolve estimator '{0}'.".format(estimator))
+            return None
+        model = cls(**(params or {}))
+
+    if y is None:
+        model.partial_fit(X, **fit_params)
+    else:
+        if getattr(y, 'ndim', 1) == 2 and y.shape[1] == 1:
+            y = y.iloc[:, 0] if isinstance(y, pd.DataFrame) else y[:, 0]  # Estimators expect 1-d labels
+        model.partial_fit(X, y, **fit_params)
+
+    return model
+
+def first(sr, **model):
+    """Return the first non-missing value of the series."""
+    sr = sr.dropna()
+    return sr.iloc[0] if len(sr) else None
+
+def last(sr, **model):
+    """Return the last non-missing value of the series."""
+    sr = sr.dropna()
+    return sr.iloc[-1] if len(sr) else None
+
 def mean_weighted(df, **model):
     '''Find mean value of the first column weighted by the values in the second column.
     In the case all weights are equal, the result is mean value of the first column.
+    The data can be a data frame or a 2-d ndarray.
     '''
     if df is None or len(df) == 0:
         return None
 
+    if isinstance(df, np.ndarray):
+        return np.dot(df[:,0], df[:,1]) / df[:,1].sum()
+
     sum_weights = df.iloc[:,1].sum()
 
     # Use dot product of two columns
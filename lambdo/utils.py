@@ -6,9 +6,15 @@ import urllib.parse
 
 import pandas as pd
 
+from lambdo.ColumnStore import ColumnStore
+from lambdo.ModelStore import ModelStore, get_format
+
 import logging
 log = logging.getLogger('lambdo.utils')
 
+# Models referenced by file are cached in memory and shared by all definitions
+models = ModelStore()
+
 
 def build_json_extensions(definition_json):
     """
@@ -59,54 +65,22 @@ def get_filename_from_uri(uri):
         return uri
 
 def read_value_from_file(link):
-    """Read Python object from the specified URI treated as a local file."""
-    is_json = link.lower().endswith('json')
-    is_pkl = link.lower().endswith('pkl')
+    """Read Python object from the specified URI treated as a local file. The format is determined by the extension (JSON, pickle or joblib)."""
     pathname = get_filename_from_uri(link)
-
-    ret = None
-    if is_pkl:
-        if not os.path.exists(pathname):
-            # Having no file means that a value represented by-reference is None
-            return None
-        try:
-            with open(pathname, 'rb') as file:
-                try:
-                    ret = pickle.load(file)
-                except Exception as e:
-                    log.error("Error reading from file {0}. Exception: {1}".format(pathname, e))
-                    return None
-        except IOError as e:
-            log.warning("Error reading from file {0}. Exception: {1}".format(pathname, e))
-            return None
-    elif is_json:
-        return None
-    else:
+    if get_format(pathname) is None:
+        log.warning("Unknown format of file {0}. Use extensions .json, .pkl or .joblib.".format(pathname))
         return None
 
-    return ret
+    return models.read(pathname)
 
 def write_value_to_file(link, value):
-    """Write Python object to the specified URI treated as a local file."""
-    is_json = link.lower().endswith('json')
-    is_pkl = link.lower().endswith('pkl')
+    """Write Python object to the specified URI treated as a local file. The format is determined by the extension (JSON, pickle or joblib)."""
     pathname = get_filename_from_uri(link)
+    if get_format(pathname) is None:
+        log.warning("Unknown format of file {0}. Use extensions .json, .pkl or .joblib.".format(pathname))
+        return
 
-    if is_pkl:
-        try:
-            with open(pathname, 'wb') as file:
-                try:
-                    pickle.dump(value, file)
-                except Exception as e:
-                    log.error("Error writing to file {0}. Exception: {1}".format(pathname, e))
-                    return
-        except IOError as e:
-            log.warning("Error writing to file {0}. Exception: {1}".format(pathname, e))
-            return
-    elif is_json:
-        pass
-    else:
-        pass
+    models.write(pathname, value)
 
 def get_columns(names, df=None):
     """Produce a list of column names by also validating them against the data frame."""
@@ -134,7 +108,9 @@ def get_columns(names, df=None):
 
     elif isinstance(names, dict):  # An object specifying which columns to select
         exclude = names.get("exclude")
-        if not isinstance(exclude, dict):
+        if isinstance(exclude, (str, list)) and all(isinstance(x, str) for x in ([exclude] if isinstance(exclude, str) else exclude)):
+            exclude_columns = get_columns(exclude)  # Names of absent columns (e.g., released) are not excluded
+        elif not isinstance(exclude, dict):
             exclude_columns = get_columns(exclude, df)
         else:
             log.error("Error reading column '{0}'. Excluded columns have to be (a list of) strings or integers.".format(exclude))
@@ -155,7 +131,7 @@ def get_columns(names, df=None):
     # Check that all columns are available
     if df is None:
         return result
-    elif isinstance(df, pd.DataFrame):
+    elif isinstance(df, (pd.DataFrame, ColumnStore)):
         out = []
         for col in result:
             if col in df.columns:
@@ -185,7 +161,7 @@ def get_columns(names, df=None):
 def get_all_columns(df):
     if df is None:
         return []
-    elif isinstance(df, pd.DataFrame):
+    elif isinstance(df, (pd.DataFrame, ColumnStore)):
         return df.columns.tolist()
     elif isinstance(df, pd.core.groupby.groupby.DataFrameGroupBy):
         # TODO: We need to exclude key columns which are used for gropuing
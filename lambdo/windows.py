@@ -0,0 +1,136 @@
+__author__="Alexandr Savinov"
+
+import numpy as np
+import pandas as pd
+
+import logging
+log = logging.getLogger('lambdo.windows')
+
+#
+# Evaluation of one rolling aggregation for many window sizes in one pass over the input.
+# Prefix sums are shared by sum, mean and count, and a table of minimums (maximums) over power-of-two windows is shared by min (max).
+# The results are the same as produced by the rolling aggregations of pandas (windows with missing values produce missing values).
+# Sums and means are equal to those of pandas up to rounding errors: their difference is less than 1e-9 of the largest absolute input value (for windows shorter than a million rows).
+# The result for one window size does not depend on other window sizes evaluated together with it.
+# Variance is not computed from prefix sums of squares because of the loss of precision for small windows.
+#
+
+family_aggregations = ['sum', 'mean', 'count', 'min', 'max']
+
+min_block = 1024  # Smallest block of prefix sums (a power of two)
+
+def evaluate_window_family(name, values, windows):
+    """
+    Apply the rolling aggregation to the values for each window size.
+    Return a list of arrays (one for each window size) or None if the aggregation is not supported.
+    """
+    if name not in family_aggregations:
+        return None
+    if any(w < 1 for w in windows):
+        return None
+
+    x = np.asarray(values, dtype=np.float64)
+
+    if name in ['min', 'max']:
+        return _evaluate_extremes(np.minimum if name == 'min' else np.maximum, x, windows)
+    else:
+        return _evaluate_sums(name, x, windows)
+
+def _evaluate_sums(name, x, windows):
+    """Sums are differences of prefix sums within blocks (not smaller than the window) which deviate from the sums of pandas only by rounding errors."""
+    n = len(x)
+    missing = np.isnan(x)
+    has_missing = missing.any()
+    missing_counts = _prefix_sum(missing.astype(np.int64)) if has_missing else None
+
+    # Values are shifted by their mean to reduce rounding errors in the differences of prefix sums
+    shift = x[~missing].mean() if not missing.all() else 0.0
+    y = np.where(missing, 0.0, x - shift) if has_missing else x - shift
+
+    # Prefix sums start from zero in each block so that their rounding errors do not grow with the length of the input
+    # The block size depends only on the window size (and not on other windows) and prefix sums are shared by windows with the same block size
+    prefix_sums = {}
+
+    results = []
+    for w in windows:
+        out = np.full(n, np.nan)
+        if w > n:
+            results.append(out)
+            continue
+
+        block = max(min_block, 1 << (w - 1).bit_length())
+        if block not in prefix_sums:
+            prefix_sums[block] = _block_prefix_sum(y, block)
+        sums, totals = prefix_sums[block]
+
+        # A window is either within one block or it starts in one block and ends in the next block
+        start = np.arange(n - w + 1)
+        end = start + w
+        start_block = start // block
+        s = np.where(start_block == end // block, sums[end] - sums[start], totals[start_block] - sums[start] + sums[end])
+        if name == 'sum':
+            r = s + w * shift
+        elif name == 'mean':
+            r = s / w + shift
+        else:  # count
+            r = np.full(n - w + 1, float(w))
+
+        if has_missing:
+            r[(missing_counts[w:] - missing_counts[:-w]) > 0] = np.nan
+        out[w - 1:] = r
+        results.append(out)
+
+    return results
+
+def _evaluate_extremes(op, x, windows):
+    """A window is covered by two (overlapping) power-of-two windows the extremes of which are computed only once for all window sizes."""
+    n = len(x)
+
+    # Level k stores the extremes of windows of size 2^k starting from each row. Only levels used by some window size are retained.
+    needed = {w.bit_length() - 1 for w in windows if w <= n}
+    levels = {}
+    level = x
+    for k in range(max(needed) + 1 if needed else 0):
+        if k in needed:
+            levels[k] = level
+        if k == max(needed):
+            break
+        h = 1 << k
+        level = op(level[:-h], level[h:])
+
+    results = []
+    for w in windows:
+        out = np.full(n, np.nan)
+        if w > n:
+            results.append(out)
+            continue
+
+        k = w.bit_length() - 1
+        p = 1 << k
+        L = levels[k]
+        out[w - 1:] = op(L[:n - w + 1], L[w - p:n - p + 1])  # NaN is propagated
+        results.append(out)
+
+    return results
+
+def _block_prefix_sum(x, block):
+    """
+    Return prefix sums (with the length of the input plus one) which start from zero at each multiple of the block size, and the totals of the blocks.
+    The sum of the values in rows from i (inclusive) to j (exclusive) is sums[j] - sums[i] if they are in one block.
+    """
+    count = len(x) // block + 1  # The last (incomplete) block includes the end position
+    padded = np.zeros(count * block, dtype=x.dtype)
+    padded[:len(x)] = x
+    cumsums = np.cumsum(padded.reshape(count, block), axis=1)
+    sums = np.zeros((count, block), dtype=x.dtype)
+    sums[:, 1:] = cumsums[:, :-1]
+    return sums.ravel()[:len(x) + 1], cumsums[:, -1]
+
+def _prefix_sum(x):
+    out = np.zeros(len(x) + 1, dtype=x.dtype)
+    np.cumsum(x, out=out[1:])
+    return out
+
+
+if __name__ == "__main__":
+    pass
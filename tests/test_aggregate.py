@@ -1,7 +1,16 @@
 import unittest
+import os
+import shutil
+import tempfile
 
 from lambdo.Workflow import *
 
+accumulate_calls = []
+
+def add_fn(x, value):  # Record calls of the update function
+    accumulate_calls.append(value)
+    return x + value
+
 class AggregateTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -71,13 +80,382 @@ class AggregateTestCase(unittest.TestCase):
 
         groups_tb = wf.tables[1]
         self.assertEqual(len(groups_tb.data), 3)  # Same number of rows
-        self.assertEqual(len(groups_tb.data.columns), 3)  # One aggregate column was added (and one technical "id" column was added which might be removed in future)
+        self.assertEqual(len(groups_tb.data.columns), 2)  # One aggregate column was added (link columns do not add technical columns to the linked table)
 
         agg_column = groups_tb.data['Aggregate']
         self.assertEqual(agg_column[0], 3.0)
         self.assertEqual(agg_column[1], 7.0)
         self.assertEqual(agg_column[2], 0.0)
 
+    def test_aggregate_reducers(self):
+        #
+        # Well-known reducers produce the same results as applying them to each group
+        #
+        functions = [
+            "numpy:sum", "numpy:mean", "numpy:amin", "numpy:amax", "numpy:std", "numpy:var", "numpy:median",
+            "builtins:len", "pandas:Series.count", "pandas:Series.nunique", "lambdo.std:first", "lambdo.std:last"
+        ]
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Facts",
+                    "columns": [
+                        {
+                            "id": "Group Link",
+                            "operation": "link",
+                            "keys": ["A"],
+                            "linked_table": "Groups",
+                            "linked_keys": ["A"]
+                        }
+                    ]
+                },
+                {
+                    "id": "Groups",
+                    "operation": "noop",
+                    "columns": [
+                        {
+                            "id": func + "(" + m + ")",
+                            "operation": "aggregate",
+                            "fact_table": "Facts",
+                            "group_column": "Group Link",
+                            "function": func,
+                            "inputs": [m]
+                        }
+                        for func in functions for m in ["M", "N"]
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        # Facts (with missing values, groups without facts and facts without groups)
+        facts = pd.DataFrame({
+            'A': ['a', 'b', 'a', 'b', 'd', 'a', 'e', 'e'],
+            'M': [1.0, None, 3.0, 2.0, 5.0, 3.0, None, None],
+            'N': [4, 1, 2, 1, 7, 5, 3, 6]
+        })
+        wf.tables[0].data = facts
+        wf.tables[1].data = pd.DataFrame({'A': ['a', 'b', 'c', 'd', 'e']})
+
+        wf.execute()
+
+        groups_tb = wf.tables[1]
+        gb = facts.groupby(wf.tables[0].data['Group Link'])
+        for func in functions:
+            for m in ["M", "N"]:
+                expected = gb[m].agg(resolve_full_name(func)).reindex(groups_tb.data.index)
+                pd.testing.assert_series_equal(groups_tb.data[func + "(" + m + ")"], expected, check_names=False, check_dtype=False, check_index_type=False)
+
+        # Integer sums are exact also for values which cannot be represented by floats
+        values = np.array([2**53 + 1, 1, 2**62, 3], dtype=np.int64)
+        out = evaluate_group_aggregation('sum', {}, np.array([0, 0, 1, -1]), values, 2)
+        self.assertEqual(out.dtype, np.int64)
+        self.assertEqual(out.tolist(), [2**53 + 2, 2**62])
+
+    def test_aggregate_many_inputs(self):
+        #
+        # Functions with many inputs get facts of each group (sorted by groups) as a sub-dataframe or ndarray
+        #
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Facts",
+                    "columns": [
+                        {
+                            "id": "Group Link",
+                            "operation": "link",
+                            "keys": ["A"],
+                            "linked_table": "Groups",
+                            "linked_keys": ["A"]
+                        }
+                    ]
+                },
+                {
+                    "id": "Groups",
+                    "operation": "noop",
+                    "columns": [
+                        {
+                            "id": "mean_weighted",
+                            "operation": "aggregate",
+                            "fact_table": "Facts",
+                            "group_column": "Group Link",
+                            "function": "lambdo.std:mean_weighted",
+                            "inputs": ["M", "W"]
+                        },
+                        {
+                            "id": "udf",
+                            "operation": "aggregate",
+                            "fact_table": "Facts",
+                            "group_column": "Group Link",
+                            "function": "lambda x, k: (x['M'] * x['W']).sum() + k",
+                            "inputs": ["M", "W"],
+                            "model": {"k": 100}
+                        },
+                        {
+                            "id": "udf_ndarray",
+                            "operation": "aggregate",
+                            "fact_table": "Facts",
+                            "group_column": "Group Link",
+                            "function": "lambda x: x[0, 0] - x[-1, 1]",
+                            "data_type": "ndarray",
+                            "inputs": ["M", "W"]
+                        }
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        facts = pd.DataFrame({
+            'A': ['a', 'b', 'a', 'b', 'd', 'a', 'e'],
+            'M': [1.0, 4.0, 3.0, 2.0, 5.0, 3.0, 6.0],
+            'W': [1.0, 1.0, 3.0, 1.0, 2.0, 1.0, 1.0]
+        })
+        wf.tables[0].data = facts
+        wf.tables[1].data = pd.DataFrame({'A': ['a', 'b', 'c', 'd']})
+
+        wf.execute()
+
+        groups_tb = wf.tables[1]
+
+        self.assertAlmostEqual(groups_tb.data['mean_weighted'][0], 2.6)
+        self.assertAlmostEqual(groups_tb.data['mean_weighted'][1], 3.0)
+        self.assertTrue(pd.isna(groups_tb.data['mean_weighted'][2]))
+        self.assertAlmostEqual(groups_tb.data['mean_weighted'][3], 5.0)
+
+        self.assertAlmostEqual(groups_tb.data['udf'][0], 113.0)
+        self.assertAlmostEqual(groups_tb.data['udf'][1], 106.0)
+        self.assertTrue(pd.isna(groups_tb.data['udf'][2]))
+
+        self.assertAlmostEqual(groups_tb.data['udf_ndarray'][0], 0.0)  # First fact of the group minus the weight of its last fact
+        self.assertAlmostEqual(groups_tb.data['udf_ndarray'][1], 3.0)
+        self.assertAlmostEqual(groups_tb.data['udf_ndarray'][3], 3.0)
+
+    def test_groupings(self):
+        #
+        # Groupings are shared by aggregate columns and rebuilt if the facts change
+        #
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Facts",
+                    "columns": [
+                        {
+                            "id": "Group Link",
+                            "operation": "link",
+                            "keys": ["A"],
+                            "linked_table": "Groups",
+                            "linked_keys": ["A"]
+                        }
+                    ]
+                },
+                {
+                    "id": "Groups",
+                    "operation": "noop",
+                    "columns": [
+                        {
+                            "id": "sum(M)",
+                            "operation": "aggregate",
+                            "fact_table": "Facts",
+                            "group_column": "Group Link",
+                            "function": "numpy:sum",
+                            "inputs": ["M"]
+                        },
+                        {
+                            "id": "udf(M)",
+                            "operation": "aggregate",
+                            "fact_table": "Facts",
+                            "group_column": "Group Link",
+                            "function": "lambda x: x.max() - x.min()",
+                            "inputs": ["M"]
+                        }
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+        facts_tb = wf.tables[0]
+        groups_tb = wf.tables[1]
+
+        facts_tb.data = pd.DataFrame({'A': ['a', 'b', 'a', 'b'], 'M': [1.0, 2.0, 3.0, 5.0]})
+        groups_tb.data = pd.DataFrame({'A': ['a', 'b']})
+
+        wf.execute()
+
+        self.assertEqual(len(wf.groupings), 1)
+        self.assertGreater(wf.groupings.get_memory(), 0)
+        self.assertEqual(groups_tb.data['sum(M)'].tolist(), [4.0, 7.0])
+        self.assertEqual(groups_tb.data['udf(M)'].tolist(), [2.0, 3.0])
+
+        # Filtering the facts (new data) invalidates the grouping
+        facts_tb.data = facts_tb.data.iloc[1:]
+        groups_tb.data = groups_tb.data[['A']]
+        for column in groups_tb.columns:
+            column._append_output_columns(column.compute())
+
+        self.assertEqual(groups_tb.data['sum(M)'].tolist(), [3.0, 7.0])
+        self.assertEqual(groups_tb.data['udf(M)'].tolist(), [0.0, 3.0])
+
+        # Writing the link column invalidates the grouping
+        facts_tb.set_column('Group Link', [0, 0, 0])
+        for column in groups_tb.columns:
+            column._append_output_columns(column.compute())
+
+        self.assertEqual(groups_tb.data['sum(M)'].tolist()[0], 10.0)
+        self.assertTrue(pd.isna(groups_tb.data['sum(M)'][1]))
+
+        # Groupings exceeding the budget are evicted (except for the last one)
+        wf.groupings.budget = 0
+        wf.groupings.get(('Other',), (0,), lambda: Grouping(np.array([0, 1]), 2))
+
+        self.assertEqual(len(wf.groupings), 1)
+
+    def test_accumulate(self):
+        #
+        # Groups are updated by each fact and only new facts are processed if facts are appended
+        #
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Facts",
+                    "columns": [
+                        {
+                            "id": "Group Link",
+                            "operation": "link",
+                            "keys": ["A"],
+                            "linked_table": "Groups",
+                            "linked_keys": ["A"]
+                        }
+                    ]
+                },
+                {
+                    "id": "Groups",
+                    "operation": "noop",
+                    "columns": [
+                        {
+                            "id": "sum(M)",
+                            "operation": "accumulate",
+                            "fact_table": "Facts",
+                            "group_column": "Group Link",
+                            "function": "test_aggregate:add_fn",
+                            "inputs": ["M"],
+                            "initial": 0.0
+                        },
+                        {
+                            "id": "count",
+                            "operation": "accumulate",
+                            "fact_table": "Facts",
+                            "group_column": "Group Link",
+                            "function": "lambda x, value, step: x + step",
+                            "inputs": ["M"],
+                            "model": {"step": 1},
+                            "initial": 0
+                        }
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+        facts_tb = wf.tables[0]
+        groups_tb = wf.tables[1]
+
+        facts_tb.data = pd.DataFrame({'A': ['a', 'b', 'a', 'c'], 'M': [1.0, 2.0, 3.0, 4.0]})
+        groups_tb.data = pd.DataFrame({'A': ['a', 'b', 'c']})
+
+        wf.execute()
+
+        self.assertEqual(groups_tb.data['sum(M)'].tolist(), [4.0, 2.0, 4.0])
+        self.assertEqual(groups_tb.data['count'].tolist(), [2, 1, 1])
+
+        # Append facts and groups. Only new facts are processed
+        del accumulate_calls[:]
+        facts_tb.data = pd.concat([facts_tb.data, pd.DataFrame({'A': ['b', 'c', 'd'], 'M': [5.0, 6.0, 7.0]}, index=[4, 5, 6])])
+        groups_tb.data = pd.concat([groups_tb.data, pd.DataFrame({'A': ['d']}, index=[3])])
+
+        wf.execute()
+
+        self.assertEqual(accumulate_calls, [5.0, 6.0, 7.0])
+        self.assertEqual(groups_tb.data['sum(M)'].tolist(), [4.0, 7.0, 10.0, 7.0])
+        self.assertEqual(groups_tb.data['count'].tolist(), [2, 2, 2, 1])
+
+        # If the values of processed facts are changed, then all facts are processed again
+        del accumulate_calls[:]
+        facts_tb.data = facts_tb.data.assign(M=100.0)
+
+        wf.execute()
+
+        self.assertEqual(len(accumulate_calls), 7)
+        self.assertEqual(groups_tb.data['sum(M)'].tolist(), [200.0, 200.0, 200.0, 100.0])
+        self.assertEqual(groups_tb.data['count'].tolist(), [2, 2, 2, 1])
+
+        # If the facts are changed (not appended), then all facts are processed
+        facts_tb.data = facts_tb.data.iloc[1:]
+
+        wf.execute()
+
+        self.assertEqual(groups_tb.data['sum(M)'].tolist(), [100.0, 200.0, 200.0, 100.0])
+        self.assertEqual(groups_tb.data['count'].tolist(), [1, 2, 2, 1])
+
+    def test_accumulate_state(self):
+        #
+        # The state of accumulation is stored in a file and used by the next executions (e.g., in another process)
+        #
+        path = tempfile.mkdtemp()
+
+        def execute(facts):
+            wf_json = {
+                "id": "My workflow",
+                "tables": [
+                    {
+                        "id": "Facts",
+                        "columns": [
+                            {"id": "Group Link", "operation": "link", "keys": ["A"], "linked_table": "Groups", "linked_keys": ["A"]}
+                        ]
+                    },
+                    {
+                        "id": "Groups",
+                        "operation": "noop",
+                        "columns": [
+                            {
+                                "id": "sum(M)",
+                                "operation": "accumulate",
+                                "fact_table": "Facts",
+                                "group_column": "Group Link",
+                                "function": "test_aggregate:add_fn",
+                                "inputs": ["M"],
+                                "initial": 0.0,
+                                "state": "$file://" + os.path.join(path, "sum.json")
+                            }
+                        ]
+                    }
+                ]
+            }
+            wf = Workflow(wf_json)
+            wf.tables[0].data = facts
+            wf.tables[1].data = pd.DataFrame({'A': ['a', 'b']})
+            wf.execute()
+            return wf.tables[1].data['sum(M)'].tolist()
+
+        try:
+            del accumulate_calls[:]
+            self.assertEqual(execute(pd.DataFrame({'A': ['a', 'b'], 'M': [1.0, 2.0]})), [1.0, 2.0])
+
+            # Facts are read again (with a new range index) and a new fact is appended
+            del accumulate_calls[:]
+            self.assertEqual(execute(pd.DataFrame({'A': ['a', 'b', 'a'], 'M': [1.0, 2.0, 3.0]})), [4.0, 2.0])
+            self.assertEqual(accumulate_calls, [3.0])
+
+            # Revised history is detected
+            del accumulate_calls[:]
+            self.assertEqual(execute(pd.DataFrame({'A': ['a', 'b', 'a'], 'M': [10.0, 2.0, 3.0]})), [13.0, 2.0])
+            self.assertEqual(len(accumulate_calls), 3)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+import shutil
+import tempfile
+
+from lambdo.Workflow import *
+
+#
+# Functions for testing which count their calls
+#
+calls = []
+
+def add_one_fn(value):
+    calls.append(value)
+    return value + 1
+
+def read_fn(pathname):
+    calls.append(pathname)
+    return pd.read_csv(pathname)
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        del calls[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_cache(self):
+        csv_file = os.path.join(self.path, 'data.csv')
+        pd.DataFrame({'A': [1, 2, 3]}).to_csv(csv_file, index=False)
+        cache_dir = os.path.join(self.path, 'cache')
+
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "function": "test_cache:read_fn",
+                    "model": {"pathname": csv_file},
+                    "columns": [
+                        {
+                            "id": "B",
+                            "function": "test_cache:add_one_fn",
+                            "window": "one",
+                            "inputs": ["A"]
+                        },
+                        {
+                            "id": "C",
+                            "function": "lambda x: x * 2",
+                            "window": "one",
+                            "inputs": ["B"]
+                        }
+                    ]
+                }
+            ]
+        }
+
+        wf = Workflow(wf_json)
+        wf.execute(cache=cache_dir)
+        self.assertEqual(len(calls), 4)  # Reading the file and 3 rows
+
+        # Nothing has changed so all results are loaded from the cache
+        wf = Workflow(wf_json)
+        wf.execute(cache=cache_dir)
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(wf.tables[0].data['C'].tolist(), [4, 6, 8])
+
+        # Changed definition of the last column does not require reading data and evaluating the first column
+        wf_json["tables"][0]["columns"][1]["function"] = "lambda x: x * 3"
+        wf = Workflow(wf_json)
+        wf.execute(cache=cache_dir)
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(wf.tables[0].data['C'].tolist(), [6, 9, 12])
+
+        # Changed input file requires executing all operations
+        pd.DataFrame({'A': [1, 2, 3, 4]}).to_csv(csv_file, index=False)
+        wf_json["tables"][0]["columns"][1]["function"] = "lambda x: x * 2"
+        wf = Workflow(wf_json)
+        wf.execute(jobs=2, cache=cache_dir)
+        self.assertEqual(len(calls), 4 + 5)
+        self.assertEqual(wf.tables[0].data['C'].tolist(), [4, 6, 8, 10])
+
+    def test_data(self):
+        cache_dir = os.path.join(self.path, 'cache')
+
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            "id": "B",
+                            "function": "test_cache:add_one_fn",
+                            "window": "one",
+                            "inputs": ["A"]
+                        }
+                    ]
+                }
+            ]
+        }
+
+        # Data provided directly is fingerprinted by its content
+        for values, expected_calls in [([1, 2], 2), ([1, 2], 2), ([1, 5], 4)]:
+            wf = Workflow(wf_json)
+            wf.tables[0].data = pd.DataFrame({'A': values})
+            wf.execute(cache=cache_dir)
+            self.assertEqual(len(calls), expected_calls)
+            self.assertEqual(wf.tables[0].data['B'].tolist(), [x + 1 for x in values])
+
+    def test_implicit_inputs(self):
+        cache_dir = os.path.join(self.path, 'cache')
+
+        def execute(function):
+            wf_json = {
+                "id": "My workflow",
+                "tables": [
+                    {
+                        "id": "My table",
+                        "columns": [
+                            {"id": "A", "function": function, "window": "one", "inputs": ["x"]},
+                            {"id": "S", "function": "lambda df: df.sum(axis=1)", "window": "all", "inputs": {"exclude": ["S", "T"]}},
+                            {"id": "T", "function": "lambda df: df.sum(axis=1)", "window": "all", "inputs": {"exclude": ["S", "T"]}}
+                        ]
+                    }
+                ]
+            }
+            wf = Workflow(wf_json)
+            wf.tables[0].data = pd.DataFrame({'x': [1, 2]})
+            wf.execute(cache=cache_dir)
+            return wf.tables[0].data['S'].tolist(), wf.tables[0].data['T'].tolist()
+
+        self.assertEqual(execute("lambda x: x + 1"), ([3, 5], [3, 5]))
+
+        # Columns with implicit inputs are evaluated again if any of the columns they read changes
+        self.assertEqual(execute("lambda x: x + 100"), ([102, 104], [102, 104]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -51,6 +51,65 @@ class CalculateTestCase(unittest.TestCase):
         self.assertIsInstance(v1, float)
         self.assertIsInstance(v2, float)
 
+    def test_vectorized(self):
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            # Declared vectorized function gets whole columns
+                            "id": "mean(A,B)",
+                            "function": "lambda X, k: X.mean(axis=1) * k",
+                            "window": "one",
+                            "inputs": ["A", "B"],
+                            "model": {"k": 2.0},
+                            "vectorized": True
+                        },
+                        {
+                            # NumPy universal function is detected automatically
+                            "id": "add(A,B)",
+                            "function": "numpy:add",
+                            "window": "one",
+                            "inputs": ["A", "B"]
+                        },
+                        {
+                            # Method of pandas Series is detected automatically
+                            "id": "abs(C)",
+                            "function": "pandas:Series.abs",
+                            "window": "one",
+                            "inputs": ["C"]
+                        },
+                        {
+                            "id": "sqrt(A)",
+                            "function": "numpy:sqrt",
+                            "window": "one",
+                            "inputs": ["A"],
+                            "data_type": "ndarray"
+                        }
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        # Provide data directly (without table population)
+        df = pd.DataFrame({'A': [1.0, 4.0, 9.0], 'B': [3.0, 2.0, 1.0], 'C': [-1, 2, -3]})
+        tb = wf.tables[0]
+        tb.data = df
+
+        wf.execute()
+
+        self.assertEqual(tb.data['mean(A,B)'].tolist(), [4.0, 6.0, 10.0])
+        self.assertEqual(tb.data['add(A,B)'].tolist(), [4.0, 6.0, 10.0])
+        self.assertEqual(tb.data['abs(C)'].tolist(), [1, 2, 3])
+        self.assertEqual(tb.data['sqrt(A)'].tolist(), [1.0, 2.0, 3.0])
+
+        self.assertTrue(is_vectorized_function(resolve_full_name("numpy:add"), 2))
+        self.assertFalse(is_vectorized_function(resolve_full_name("numpy:add"), 1))
+        self.assertFalse(is_vectorized_function(resolve_full_name("builtins:float"), 1))
+
     def test_all(self):
         #
         # Shift one column: https://pandas.pydata.org/pandas-docs/stable/generated/pandas.DataFrame.shift.html
@@ -0,0 +1,147 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from lambdo.Workflow import *
+from lambdo.std import read_columns, write_columns
+
+class ColumnStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_column_store(self):
+        wf_json = {
+            "id": "My workflow",
+            "storage": "frame",
+            "tables": [
+                {
+                    "id": "Facts",
+                    "columns": [
+                        {
+                            "id": "B",
+                            "function": "lambda x: x * 2",
+                            "window": "one",
+                            "inputs": ["M"]
+                        },
+                        {
+                            "id": "C",
+                            "function": "numpy:mean",
+                            "window": "2",
+                            "inputs": ["B"],
+                            "fillna_value": 0.0
+                        },
+                        {
+                            "id": "Group Link",
+                            "operation": "link",
+                            "keys": ["A"],
+                            "linked_table": "Groups",
+                            "linked_keys": ["A"]
+                        }
+                    ]
+                },
+                {
+                    "id": "Groups",
+                    "operation": "noop",
+                    "columns": [
+                        {
+                            "id": "sum(C)",
+                            "operation": "aggregate",
+                            "fact_table": "Facts",
+                            "group_column": "Group Link",
+                            "function": "lambda x: x.sum()",
+                            "inputs": ["C"]
+                        }
+                    ],
+                    "column_filter": {"exclude": ["A"]}
+                }
+            ]
+        }
+
+        # The same results for both storages
+        expected = Workflow(wf_json)
+        expected.tables[0].data = pd.DataFrame({'A': ['a', 'b', 'a', 'c'], 'M': [1.0, 2.0, 3.0, 4.0]})
+        expected.tables[1].data = pd.DataFrame({'A': ['a', 'b', 'd']})
+        expected.execute()
+
+        wf_json["storage"] = "columns"
+        wf = Workflow(wf_json)
+        wf.tables[0].data = pd.DataFrame({'A': ['a', 'b', 'a', 'c'], 'M': [1.0, 2.0, 3.0, 4.0]})
+        wf.tables[1].data = pd.DataFrame({'A': ['a', 'b', 'd']})
+        wf.execute()
+
+        for table, expected_table in zip(wf.tables, expected.tables):
+            self.assertIsInstance(table.get_data(), ColumnStore)
+            pd.testing.assert_frame_equal(table.data, expected_table.data)
+
+        # Columns are stored as contiguous arrays which are not copied when selected
+        store = wf.tables[0].get_data()
+        self.assertTrue(store.arrays['C'].flags['C_CONTIGUOUS'])
+        self.assertTrue(np.shares_memory(store[['B', 'C']]['C'].values, store.arrays['C']))
+
+        # New columns are aligned with the index
+        store.set_column('D', pd.Series([10.0, 30.0], index=[1, 3]), loc=0)
+        self.assertEqual(store.columns.tolist()[0], 'D')
+        self.assertTrue(np.isnan(store['D'][0]))
+        self.assertEqual(store['D'][3], 30.0)
+
+    def test_files(self):
+        input_path = os.path.join(self.path, 'input')
+        output_path = os.path.join(self.path, 'output')
+
+        df = pd.DataFrame({'A': pd.Categorical(['a', 'b', None, 'a']), 'M': [1.0, 2.0, 3.0, 4.0], 'S': ['x', None, 'y', 'z']})
+        write_columns(df, input_path)
+
+        # Columns are memory-mapped when loaded and only the selected columns are read
+        store = read_columns(input_path, columns=['M', 'A'])
+        self.assertIsInstance(store.arrays['M'], np.memmap)
+        self.assertEqual(store.columns.tolist(), ['M', 'A'])
+        pd.testing.assert_frame_equal(store.get_frame(), df[['M', 'A']])
+
+        # Streamed table is read and written in chunks (appended to the output)
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Facts",
+                    "function": "lambdo.std:read_columns",
+                    "model": {"path": input_path},
+                    "stream": {"chunksize": 3},
+                    "columns": [
+                        {
+                            "id": "B",
+                            "function": "lambda x: x * 2",
+                            "window": "one",
+                            "inputs": ["M"]
+                        }
+                    ]
+                },
+                {
+                    "id": "Output",
+                    "function": "lambdo.std:write_columns",
+                    "inputs": "Facts",
+                    "model": {"path": output_path}
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+        wf.execute()
+
+        out = read_columns(output_path).get_frame()
+        self.assertEqual(out['B'].tolist(), [2.0, 4.0, 6.0, 8.0])
+        pd.testing.assert_frame_equal(out[['A', 'M', 'S']], df)
+
+        # Changes of loaded columns are not written to the files
+        wf.tables[0].table_json.pop('stream')
+        wf.execute()
+        self.assertIsInstance(wf.tables[0].get_data(), ColumnStore)
+        wf.tables[0].data['M'] += 1
+        self.assertEqual(read_columns(input_path)['M'].tolist(), [1.0, 2.0, 3.0, 4.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
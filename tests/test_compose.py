@@ -147,9 +147,25 @@ class ComposeTestCase(unittest.TestCase):
         thd_tb = wf.tables[2]
         thd_tb.data = df
 
+        # Add a column for a path in the second table (nothing is added for a primitive column)
+        self.assertIsNone(sec_tb.add_compose_column("C"))
+        self.assertEqual(sec_tb.add_compose_column("Link::C").id, "Link::C")
+        self.assertEqual(len(sec_tb.columns), 2)
+        self.assertEqual(sec_tb.add_compose_column("Link::C").id, "Link::C")  # Already exists
+        self.assertEqual(len(sec_tb.columns), 2)
+
+        wf.execute()
+
         # Complex column values: [1, 1, 2, 2]
+        self.assertEqual(main_tb.data['Compose'].tolist(), [1, 1, 2, 2])
+
+        # Intermediate segments are not materialized in the main table
+        self.assertEqual(main_tb.data.columns.tolist(), ['A', 'Link', 'Compose'])
 
-        # Check if a nested compose column was created correctly in the second table: [1, 2, None]
+        # A compose column added for a path in the second table: [1, 2, None]
+        self.assertEqual(sec_tb.data['Link::C'][0], 1)
+        self.assertEqual(sec_tb.data['Link::C'][1], 2)
+        self.assertTrue(pd.isna(sec_tb.data['Link::C'][2]))
 
 
 if __name__ == '__main__':
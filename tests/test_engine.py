@@ -0,0 +1,143 @@
+import unittest
+
+from lambdo.Workflow import *
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+def scale_fn(x, factor, shift=0.0):
+    return x * factor + shift
+
+def range_fn(x):
+    return x.max() - x.min()
+
+@unittest.skipIf(numba is None, "numba is not installed")
+class EngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def test_calculate(self):
+        wf_json = {
+            "id": "My workflow",
+            "engine": "numba",  # Default for all columns
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            "id": "scale(A)",
+                            "function": "test_engine:scale_fn",
+                            "inputs": ["A"],
+                            "model": {"factor": 2.0, "shift": 1.0}
+                        },
+                        {
+                            "id": "A+B",
+                            "function": "lambda x: x[0] + x[1]",
+                            "inputs": ["A", "B"],
+                            "model": {}
+                        },
+                        {
+                            "id": "str(A)",
+                            "function": "lambda x: str(x)",  # Cannot be compiled
+                            "inputs": ["A"],
+                            "model": {}
+                        }
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        df = pd.DataFrame({'A': [1.0, 2.0, 3.0], 'B': [3.0, 2.0, 1.0]})
+        tb = wf.tables[0]
+        tb.data = df
+
+        wf.execute()
+
+        self.assertEqual(tb.data['scale(A)'].tolist(), [3.0, 5.0, 7.0])
+        self.assertEqual(tb.data['A+B'].tolist(), [4.0, 4.0, 4.0])
+        self.assertEqual(tb.data['str(A)'].tolist(), ['1.0', '2.0', '3.0'])  # Standard engine
+
+    def test_defaults(self):
+        wf_json = {
+            "id": "My workflow",
+            "engine": "numba",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            "id": "A*2",
+                            "function": "lambda x, k=2.0: x * k",
+                            "inputs": ["A"],
+                            "model": {}
+                        },
+                        {
+                            "id": "A*3",
+                            "function": "lambda x, k=3.0: x * k",  # Same code but another default value
+                            "inputs": ["A"],
+                            "model": {}
+                        }
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        tb = wf.tables[0]
+        tb.data = pd.DataFrame({'A': [1.0, 2.0, 3.0]})
+
+        wf.execute()
+
+        self.assertEqual(tb.data['A*2'].tolist(), [2.0, 4.0, 6.0])
+        self.assertEqual(tb.data['A*3'].tolist(), [3.0, 6.0, 9.0])
+
+    def test_roll(self):
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            "id": "range(A)",
+                            "function": "test_engine:range_fn",
+                            "window": "2",
+                            "inputs": ["A"],
+                            "engine": "numba"
+                        },
+                        {
+                            "id": "sum(A,B)",
+                            "function": "lambda x: x.sum()",
+                            "window": "2",
+                            "inputs": ["A", "B"],
+                            "engine": "numba"
+                        }
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        df = pd.DataFrame({'A': [1.0, 4.0, None, 2.0], 'B': [1.0, 2.0, 3.0, 4.0]})
+        tb = wf.tables[0]
+        tb.data = df
+
+        wf.execute()
+
+        v = tb.data['range(A)']
+        self.assertTrue(pd.isna(v[0]))
+        self.assertAlmostEqual(v[1], 3.0)
+        self.assertTrue(pd.isna(v[2]))  # Missing values in the window
+        self.assertTrue(pd.isna(v[3]))
+
+        v = tb.data['sum(A,B)']
+        self.assertTrue(pd.isna(v[0]))
+        self.assertAlmostEqual(v[1], 8.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
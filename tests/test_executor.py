@@ -0,0 +1,295 @@
+import unittest
+
+from lambdo.Workflow import *
+
+def column_count(df):  # Number of columns visible to the function
+    return pd.Series(df.shape[1] if df.ndim == 2 else 1, index=df.index)
+
+class ExecutorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def _check_workflow(self, wf):
+        tb = wf.tables[0]
+
+        # Columns are attached in the same order as in sequential execution
+        self.assertEqual(tb.data.columns.tolist(), ['A', 'float(A)', 'sum(A)_0', 'sum(A)_1', 'sum(sum(A)_0)'])
+
+        self.assertEqual(len(tb.data), 2)
+        self.assertAlmostEqual(tb.data['sum(A)_0'][0], 5.0)
+        self.assertAlmostEqual(tb.data['sum(A)_1'][1], 9.0)
+        self.assertAlmostEqual(tb.data['sum(sum(A)_0)'][1], 12.0)
+
+    def test_executors(self):
+        for executor in ["thread", "process"]:
+            wf_json = {
+                "id": "My workflow",
+                "tables": [
+                    {
+                        "id": "My table",
+                        "columns": [
+                            {
+                                "id": "float(A)",
+                                "function": "builtins:float",
+                                "window": "one",
+                                "inputs": ["A"]
+                            },
+                            {
+                                "id": "sum(A)",
+                                "function": "numpy:sum",
+                                "inputs": ["A"],
+                                "extensions": [
+                                    {"window": "2"},
+                                    {"window": "3"}
+                                ]
+                            },
+                            {
+                                "id": "sum(sum(A)_0)",
+                                "function": "numpy:sum",
+                                "window": "2",
+                                "inputs": ["sum(A)_0"]
+                            }
+                        ],
+                        "row_filter": {"slice": {"start": 2}}
+                    }
+                ]
+            }
+            wf = Workflow(wf_json)
+
+            # Provide data directly (without table population)
+            df = pd.DataFrame({'A': [1, 2, 3, 4]})
+            wf.tables[0].data = df
+
+            wf.execute(jobs=2, executor=executor)
+            self._check_workflow(wf)
+
+    def test_hints(self):
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            "id": "float(A)",
+                            "function": "builtins:float",
+                            "window": "one",
+                            "inputs": ["A"]
+                        },
+                        {
+                            "id": "sum(A)",
+                            "function": "numpy:sum",
+                            "inputs": ["A"],
+                            "extensions": [
+                                {"window": "2"},
+                                {"window": "3"}
+                            ]
+                        },
+                        {
+                            "id": "sum(sum(A)_0)",
+                            "function": "numpy:sum",
+                            "window": "2",
+                            "inputs": ["sum(A)_0"]
+                        }
+                    ],
+                    "row_filter": {"slice": {"start": 2}}
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        # Provide data directly (without table population)
+        df = pd.DataFrame({'A': [1, 2, 3, 4]})
+        wf.tables[0].data = df
+
+        # Force executing some operations in a separate process or thread even if the workflow is executed sequentially
+        wf.tables[0].columns[1].column_json['executor'] = 'process'
+        wf.tables[0].columns[2].column_json['executor'] = 'thread'
+
+        executor = Executor(wf)
+        self.assertEqual(executor.get_mode(wf.tables[0]), 'inline')
+        self.assertEqual(executor.get_mode(wf.tables[0].columns[0]), 'inline')
+        self.assertEqual(executor.get_mode(wf.tables[0].columns[1]), 'process')
+        self.assertEqual(executor.get_mode(wf.tables[0].columns[2]), 'thread')
+
+        wf.execute()
+        self._check_workflow(wf)
+
+    def test_priorities(self):
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            "id": "float(A)",
+                            "function": "builtins:float",
+                            "window": "one",
+                            "inputs": ["A"]
+                        },
+                        {
+                            "id": "sum(A)",
+                            "function": "numpy:sum",
+                            "inputs": ["A"],
+                            "extensions": [
+                                {"window": "2"},
+                                {"window": "3"}
+                            ]
+                        },
+                        {
+                            "id": "sum(sum(A)_0)",
+                            "function": "numpy:sum",
+                            "window": "2",
+                            "inputs": ["sum(A)_0"]
+                        }
+                    ],
+                    "row_filter": {"slice": {"start": 2}}
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        # Provide data directly (without table population)
+        df = pd.DataFrame({'A': [1, 2, 3, 4]})
+        wf.tables[0].data = df
+
+        tp = Topology(wf)
+        tp.translate()
+
+        # A long chain of operations is started before independent operations
+        wf.tables[0].columns[0].column_json['cost'] = 1.0
+        wf.tables[0].columns[1].column_json['cost'] = 5.0
+        wf.tables[0].columns[2].column_json['cost'] = 1.0
+        wf.tables[0].columns[3].column_json['cost'] = 5.0
+
+        ops = [elem for layer in tp.layers for elem in layer]
+        dependents = {elem: [x for x in ops if elem in tp.get_dependencies(x)] for elem in ops}
+
+        executor = Executor(wf, jobs=2)
+        priorities = executor.get_priorities(ops, dependents)
+
+        self.assertAlmostEqual(priorities[wf.tables[0].columns[1]], 10.0 + 0.1)  # Including the filter
+        self.assertAlmostEqual(priorities[wf.tables[0].columns[2]], 1.0 + 0.1)
+        self.assertAlmostEqual(priorities[wf.tables[0]], 1.0 + 10.0 + 0.1)
+
+        # Measured durations are used if the cost is not specified explicitly
+        wf.execute(jobs=2)
+        self._check_workflow(wf)
+        self.assertIn(wf.tables[0], wf.costs)
+
+    def test_release(self):
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Facts",
+                    "columns": [
+                        {
+                            "id": "B",
+                            "function": "lambda x: x * 2",
+                            "window": "one",
+                            "inputs": ["A"]
+                        },
+                        {
+                            "id": "C",
+                            "function": "lambda x: x + 1",
+                            "window": "one",
+                            "inputs": ["B"]
+                        },
+                        {
+                            "id": "D",
+                            "function": "lambda x: x + 1",
+                            "window": "one",
+                            "inputs": ["A"]
+                        }
+                    ],
+                    "column_filter": {"exclude": ["B"]}
+                },
+                {
+                    "id": "Result",
+                    "function": "pandas:DataFrame.copy",
+                    "inputs": ["Facts"],
+                    "columns": [
+                        {
+                            "id": "E",
+                            "function": "lambda x: x * 10",
+                            "window": "one",
+                            "inputs": ["C"]
+                        }
+                    ],
+                    "output": True
+                }
+            ]
+        }
+
+        # Columns removed by filters are released as soon as they are not needed
+        wf = Workflow(wf_json)
+        wf.tables[0].data = pd.DataFrame({'A': [1.0, 2.0, 3.0]})
+        tp = Topology(wf)
+        tp.translate()
+        executor = Executor(wf)
+
+        readers = executor.get_readers(tp)
+        self.assertEqual(list(readers.keys()), [wf.tables[0].columns[0]])
+        self.assertEqual(readers[wf.tables[0].columns[0]], {wf.tables[0].columns[1]})
+
+        executor.execute(tp)
+        self.assertEqual(sum(executor.released.values()), 3 * 8)
+        self.assertEqual(wf.tables[0].data.columns.tolist(), ['A', 'D', 'C'])
+        self.assertEqual(wf.tables[1].data['E'].tolist(), [30.0, 50.0, 70.0])
+
+        # All data except for outputs is released (in sequential and parallel execution)
+        for jobs in [None, 2]:
+            wf_json["tables"][0]["columns"][2]["output"] = True
+            wf = Workflow(wf_json)
+            wf.tables[0].data = pd.DataFrame({'A': [1.0, 2.0, 3.0]})
+
+            wf.execute(jobs=jobs, release=True)
+
+            self.assertIsNotNone(wf.tables[0].data)  # The table has an output column
+            self.assertEqual(wf.tables[0].data.columns.tolist(), ['A', 'D'])
+            self.assertEqual(wf.tables[1].data.columns.tolist(), ['A', 'D', 'C', 'E'])
+            self.assertEqual(wf.tables[1].data['E'].tolist(), [30.0, 50.0, 70.0])
+
+            del wf_json["tables"][0]["columns"][2]["output"]
+            wf = Workflow(wf_json)
+            wf.tables[0].data = pd.DataFrame({'A': [1.0, 2.0, 3.0]})
+            wf.execute(jobs=jobs, release=True)
+
+            self.assertIsNone(wf.tables[0].data)
+            self.assertEqual(wf.tables[1].data['E'].tolist(), [30.0, 50.0, 70.0])
+
+    def test_implicit_inputs(self):
+        # Columns with implicit inputs see all previous columns independent of the order of execution
+        for jobs in [None, 4]:
+            wf_json = {
+                "id": "My workflow",
+                "tables": [
+                    {
+                        "id": "My table",
+                        "columns": [
+                            {"id": "A", "function": "lambda x: x + 1", "window": "one", "inputs": ["x"]},
+                            {"id": "B", "function": "lambda x: x + 2", "window": "one", "inputs": ["x"]},
+                            {"id": "C", "function": "test_executor:column_count", "window": "all", "inputs": []},
+                            {"id": "D", "function": "test_executor:column_count", "window": "all", "inputs": {"exclude": ["A"]}}
+                        ]
+                    }
+                ]
+            }
+            wf = Workflow(wf_json)
+            wf.tables[0].data = pd.DataFrame({'x': [1, 2, 3]})
+
+            tp = Topology(wf)
+            tp.translate()
+            self.assertEqual(set(tp.get_dependencies(wf.tables[0].columns[3])), {wf.tables[0], wf.tables[0].columns[1], wf.tables[0].columns[2]})
+
+            wf.execute(jobs=jobs)
+
+            self.assertEqual(wf.tables[0].data['C'].tolist(), [3, 3, 3])
+            self.assertEqual(wf.tables[0].data['D'].tolist(), [3, 3, 3])  # Columns x, B and C
+
+
+if __name__ == '__main__':
+    unittest.main()
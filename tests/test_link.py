@@ -115,6 +115,115 @@ class LinkTestCase(unittest.TestCase):
         self.assertEqual(link_column[2], 1)
         self.assertTrue(pd.isna(link_column[3]))
 
+    def test_key_index(self):
+
+        #
+        # Two link columns with the same linked keys use one index
+        #
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Table 1",
+                    "columns": [
+                        {
+                            "id": "Link 1",
+                            "operation": "link",
+                            "keys": ["A"],
+                            "linked_table": "Table 2",
+                            "linked_keys": ["B"]
+                        },
+                        {
+                            "id": "Link 2",
+                            "operation": "link",
+                            "keys": ["C"],
+                            "linked_table": "Table 2",
+                            "linked_keys": ["B"]
+                        }
+                    ]
+                },
+                {
+                    "id": "Table 2",
+                    "operation": "noop",
+                    "columns": [
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        # Main table
+        df = pd.DataFrame({'A': ['a', 'c', 'b'], 'C': ['b', 'x', 'a']})
+        main_tb = wf.tables[0]
+        main_tb.data = df
+
+        # Secondary table with row ids which are not positions and with a duplicate key
+        df = pd.DataFrame({'B': ['a', 'b', 'c', 'a']}, index=[10, 11, 12, 13])
+        sec_tb = wf.tables[1]
+        sec_tb.data = df
+
+        wf.execute()
+
+        self.assertEqual(main_tb.data['Link 1'].tolist(), [10, 12, 11])  # First row for duplicate keys
+        self.assertEqual(main_tb.data['Link 2'][0], 11)
+        self.assertTrue(pd.isna(main_tb.data['Link 2'][1]))
+
+        self.assertEqual(len(sec_tb._key_indexes), 1)
+        self.assertEqual(sec_tb.data.columns.tolist(), ['B'])  # Linked table is not changed
+
+    def test_categorical_keys(self):
+
+        #
+        # Categorical keys are looked up only once for each category
+        #
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Table 1",
+                    "columns": [
+                        {
+                            "id": "Link",
+                            "operation": "link",
+                            "keys": ["A"],
+                            "linked_table": "Table 2",
+                            "linked_keys": ["B"]
+                        }
+                    ]
+                },
+                {
+                    "id": "Table 2",
+                    "operation": "noop",
+                    "columns": [
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        main_tb = wf.tables[0]
+        main_tb.data = pd.DataFrame({'A': pd.Categorical(['a', 'c', None, 'x', 'a'])})
+
+        sec_tb = wf.tables[1]
+        sec_tb.data = pd.DataFrame({'B': pd.Categorical(['c', 'a'])}, index=[10, 11])
+
+        wf.execute()
+
+        self.assertEqual(main_tb.data['Link'].fillna(-1).tolist(), [11, 10, -1, -1, 11])
+
+        #
+        # Missing keys are linked to the missing linked key independent of the type of the key columns
+        #
+        sec_tb.data = pd.DataFrame({'B': ['c', None, 'a']}, index=[10, 11, 12])
+
+        main_tb.data = pd.DataFrame({'A': pd.Categorical(['a', 'c', None, 'x', 'a'])})
+        wf.execute()
+        self.assertEqual(main_tb.data['Link'].fillna(-1).tolist(), [12, 10, 11, -1, 12])
+
+        main_tb.data = pd.DataFrame({'A': ['a', 'c', np.nan, 'x', 'a']})
+        wf.execute()
+        self.assertEqual(main_tb.data['Link'].fillna(-1).tolist(), [12, 10, 11, -1, 12])
+
 
 if __name__ == '__main__':
     unittest.main()
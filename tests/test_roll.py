@@ -172,5 +172,147 @@ class RollTestCase(unittest.TestCase):
         self.assertAlmostEqual(v1, 1.4)
         self.assertAlmostEqual(v2, 2.33333333)
 
+        #
+        # The same function gets windows as ndarrays
+        #
+        wf.tables[0].columns[0].column_json['data_type'] = 'ndarray'
+        tb.data = df[['A', 'W']]
+
+        wf.execute()
+
+        self.assertTrue(pd.isna(tb.data['mean_w(A)'][0]))
+        self.assertAlmostEqual(tb.data['mean_w(A)'][1], 1.4)
+        self.assertAlmostEqual(tb.data['mean_w(A)'][2], 2.33333333)
+
+    def test_roll_reducers(self):
+        #
+        # Well-known reducers are computed by built-in rolling aggregations and produce the same results as applying them to each window
+        #
+        functions = [
+            "numpy.core.fromnumeric:mean", "numpy:sum", "numpy:amin", "numpy:amax", "numpy:std", "numpy:var", "numpy:median",
+            "builtins:len", "pandas:Series.std", "pandas:Series.count"
+        ]
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            "id": func,
+                            "function": func,
+                            "window": "3",
+                            "inputs": ["A"],
+                            "model": {}
+                        }
+                        for func in functions
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        # Provide data directly (without table population)
+        data = {'A': [1.0, 5.0, 2.0, None, 4.0, 3.0, 7.0, 6.0]}
+        df = pd.DataFrame(data)
+        tb = wf.tables[0]
+        tb.data = df
+
+        wf.execute()
+
+        for func in functions:
+            expected = df['A'].rolling(window=3).apply(resolve_full_name(func), raw=False)
+            pd.testing.assert_series_equal(tb.data[func], expected, check_names=False)
+
+    def test_roll_window_family(self):
+        #
+        # Columns of a family which differ only in window size are evaluated together
+        #
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            "id": "mean(A)",
+                            "function": "numpy:mean",
+                            "inputs": ["A"],
+                            "extensions": [{"window": "2"}, {"window": "3"}, {"window": "5"}]
+                        },
+                        {
+                            "id": "max(A)",
+                            "function": "numpy:amax",
+                            "inputs": ["A"],
+                            "extensions": [{"window": "2"}, {"window": "3"}, {"window": "5"}]
+                        }
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        data = {'A': [1.0, 5.0, 2.0, None, 4.0, 3.0, 7.0, 6.0, 2.0]}
+        df = pd.DataFrame(data)
+        tb = wf.tables[0]
+        tb.data = df
+
+        wf.execute()
+
+        for i, window in enumerate([2, 3, 5]):
+            pd.testing.assert_series_equal(tb.data['mean(A)_' + str(i)], df['A'].rolling(window).mean(), check_names=False)
+            pd.testing.assert_series_equal(tb.data['max(A)_' + str(i)], df['A'].rolling(window).max(), check_names=False)
+
+        #
+        # Results produced for other columns are not used if the input changes
+        #
+        tb.data = pd.DataFrame({'A': [1.0, 2.0, 3.0]})
+        tb.columns[0].evaluate()
+        tb.data['A'] = [30.0, 20.0, 10.0]
+        tb.columns[1].evaluate()
+        self.assertAlmostEqual(tb.data['mean(A)_0'][2], 2.5)
+        self.assertAlmostEqual(tb.data['mean(A)_1'][2], 20.0)
+
+        #
+        # Sums are equal to those of pandas up to rounding errors and do not depend on other columns of the family
+        #
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": [
+                        {
+                            "id": "sum(A)",
+                            "function": "numpy:sum",
+                            "inputs": ["A"],
+                            "extensions": [{"window": "2"}, {"window": "50"}, {"window": "2000"}]
+                        },
+                        {
+                            "id": "sum50(A)",
+                            "function": "numpy:sum",
+                            "inputs": ["A"],
+                            "window": "50"
+                        }
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        values = np.random.RandomState(0).lognormal(5.0, 3.0, 5000)
+        values[100] = np.nan
+        df = pd.DataFrame({'A': values})
+        tb = wf.tables[0]
+        tb.data = df
+
+        wf.execute()
+
+        for i, window in enumerate([2, 50, 2000]):
+            expected = df['A'].rolling(window).sum()
+            np.testing.assert_allclose(tb.data['sum(A)_' + str(i)], expected, rtol=0, atol=1e-9 * np.nanmax(np.abs(values)))
+            self.assertEqual(tb.data['sum(A)_' + str(i)].isna().tolist(), expected.isna().tolist())
+        np.testing.assert_array_equal(tb.data['sum50(A)'], tb.data['sum(A)_1'])
+
 if __name__ == '__main__':
     unittest.main()
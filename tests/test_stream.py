@@ -0,0 +1,130 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from lambdo.Workflow import *
+
+class StreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+        self.input_file = os.path.join(self.path, 'input.csv')
+        df = pd.DataFrame({'A': [1.0, 2.0, None, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0, 11.0]})
+        df.to_csv(self.input_file, index=False)
+
+        self.output_file = os.path.join(self.path, 'output.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_stream(self):
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "function": "pandas:read_csv",
+                    "inputs": [],
+                    "model": {"filepath_or_buffer": self.input_file},
+                    "columns": [
+                        {
+                            "id": "B",
+                            "function": "lambda x: x * 2",
+                            "window": "one",
+                            "inputs": ["A"]
+                        },
+                        {
+                            "id": "sum(B)",
+                            "function": "numpy:sum",
+                            "window": "3",
+                            "inputs": ["B"]
+                        },
+                        {
+                            "id": "mean(sum(B))",
+                            "function": "lambda x: x.mean()",
+                            "window": "2",
+                            "inputs": ["sum(B)"]
+                        }
+                    ],
+                    "row_filter": {"slice": {"start": 1, "step": 2}}
+                },
+                {
+                    "id": "Output table",
+                    "function": "pandas:DataFrame.to_csv",
+                    "inputs": "My table",
+                    "model": {"path_or_buf": self.output_file, "index": False}
+                }
+            ]
+        }
+
+        # Load and process the whole table
+        wf = Workflow(wf_json)
+        wf.execute()
+        expected = pd.read_csv(self.output_file)
+        os.remove(self.output_file)
+
+        self.assertEqual(len(expected), 5)
+
+        # Process in chunks which are written to the sink
+        wf_json["tables"][0]["stream"] = {"chunksize": 3}
+        wf = Workflow(wf_json)
+        wf.execute()
+        out = pd.read_csv(self.output_file)
+
+        pd.testing.assert_frame_equal(out, expected)
+        self.assertIsNone(wf.tables[0].data)  # Not retained because it is written to the sink
+
+        # Without sinks, the result is retained in the table
+        del wf_json["tables"][0]["stream"]
+        del wf_json["tables"][1]
+        wf = Workflow(wf_json)
+        wf.execute(stream=True)
+
+        pd.testing.assert_frame_equal(wf.tables[0].data, expected)
+
+    def test_unsupported(self):
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "function": "pandas:read_csv",
+                    "inputs": [],
+                    "model": {"filepath_or_buffer": self.input_file},
+                    "columns": [
+                        {
+                            "id": "B",
+                            "function": "lambda x: x * 2",
+                            "window": "one",
+                            "inputs": ["A"]
+                        },
+                        {
+                            "id": "sum(B)",
+                            "function": "numpy:sum",
+                            "window": "3",
+                            "inputs": ["B"]
+                        },
+                        {
+                            "id": "mean(sum(B))",
+                            "function": "lambda x: x.mean()",
+                            "window": "2",
+                            "inputs": ["sum(B)"]
+                        }
+                    ],
+                    "row_filter": {"sample": True},
+                    "stream": {"chunksize": 3}
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        # Tables which cannot be streamed are loaded completely
+        wf.execute()
+
+        self.assertEqual(len(wf.tables[0].data), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -96,6 +96,41 @@ class TablePopulateTestCase(unittest.TestCase):
         self.assertEqual(ext_column[1], 4.0)
         self.assertEqual(ext_column[2], 5.0)
 
+    def test_schema(self):
+
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "function": "pandas:read_csv",
+                    "inputs": [],
+                    "model": {
+                        "filepath_or_buffer": "./tests/test1.csv",
+                        "nrows": 4
+                    },
+                    "schema": {
+                        "columns": {
+                            "Column A": "int16",
+                            "Column C": {"type": "category", "categories": ["string value 0", "string value 1"]}
+                        },
+                        "downcast": "float"
+                    }
+                }
+            ]
+        }
+
+        wf = Workflow(wf_json)
+
+        wf.execute()
+
+        tb = wf.tables[0].data
+
+        self.assertEqual(tb['Column A'].dtype, 'int16')
+        self.assertEqual(tb['Column B'].dtype, 'float32')
+        self.assertEqual(tb['Column C'].dtype, 'category')
+        self.assertEqual(tb['Column C'].cat.codes.tolist(), [0, 1, -1, -1])  # Values which are not declared categories are missing
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -52,6 +52,60 @@ class TableProjectTestCase(unittest.TestCase):
         self.assertEqual(out_column[0], 'a')
         self.assertEqual(out_column[1], 'b')
 
+    def test_project_link(self):
+
+        #
+        # Project two columns and link the source table to the projection
+        #
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Source",
+                    "columns": [
+                        {
+                            "id": "Link",
+                            "operation": "link",
+                            "keys": ["A", "B"],
+                            "linked_table": "Destination",
+                            "linked_keys": ["X", "Y"]
+                        }
+                    ]
+                },
+                {
+                    "id": "Destination",
+                    "operation": "project",
+
+                    "source_table": "Source",
+                    "inputs": ["A", "B"],
+                    "outputs": ["X", "Y"],
+
+                    "columns": [
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        df = pd.DataFrame({'A': ['b', 'a', 'b', None, 'a', None], 'B': [1, 2, 1, 3, 1, 3], 'M': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]})
+        facts_tb = wf.tables[0]
+        facts_tb.data = df
+
+        wf.execute()
+
+        # Unique rows in the order of their first occurrence (as dropping duplicates)
+        proj_tb = wf.tables[1]
+        expected = df.drop_duplicates(subset=['A', 'B'])[['A', 'B']].reset_index(drop=True)
+        expected.columns = ['X', 'Y']
+        pd.testing.assert_frame_equal(proj_tb.data, expected)
+
+        # Link column values are codes of the projection
+        self.assertEqual(facts_tb.data['Link'].tolist(), [0, 1, 0, 2, 3, 2])
+        self.assertIsNotNone(proj_tb.get_projection_codes(facts_tb, ['A', 'B'], ['X', 'Y']))
+
+        # Codes are not used if the source table changes
+        facts_tb.data = facts_tb.data.iloc[1:]
+        self.assertIsNone(proj_tb.get_projection_codes(facts_tb, ['A', 'B'], ['X', 'Y']))
 
 if __name__ == '__main__':
     unittest.main()
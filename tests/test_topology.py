@@ -252,6 +252,88 @@ class TopologyTestCase(unittest.TestCase):
         self.assertEqual(layers[0][0].id, 'Base Table')
         self.assertEqual(layers[1][0].id, 'Extended Table')
 
+    def test_many_columns(self):
+
+        # Binary tree of columns where each column depends on its parent
+        columns_json = [{"id": "C0", "operation": "calculate", "inputs": ["A"]}]
+        for i in range(1, 5000):
+            columns_json.append({"id": "C" + str(i), "operation": "calculate", "inputs": ["C" + str((i - 1) // 2), "A"]})
+
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "My table",
+                    "columns": columns_json
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        tp = Topology(wf)
+        tp.translate()
+
+        layers = tp.layers
+        self.assertEqual(len(layers), 14)  # Table and 13 levels of the tree
+        self.assertEqual(sum(len(x) for x in layers), 5001)
+
+        self.assertEqual([x.id for x in layers[2]], ['C1', 'C2'])  # The order of definitions is preserved
+
+        # The index of output names is updated when new columns are added
+        tb = wf.tables[0]
+        self.assertEqual(tb.get_definitions_for_columns(['C3', 'C4']), [tb.columns[3], tb.columns[4]])
+        new_column = tb.create_column({"id": "D", "operation": "calculate", "inputs": ["C3"], "outputs": ["D1", "D2"]})
+        self.assertEqual(tb.get_definitions_for_columns('D2'), [new_column])
+        self.assertEqual(tb.get_column('D'), new_column)
+
+    def test_targets(self):
+
+        wf_json = {
+            "id": "My workflow",
+            "tables": [
+                {
+                    "id": "Table 1",
+                    "columns": [
+                        {"id": "A", "operation": "calculate", "inputs": ["X"]},
+                        {"id": "B", "operation": "calculate", "inputs": ["A"]},
+                        {"id": "C", "operation": "calculate", "inputs": ["X"]}
+                    ]
+                },
+                {
+                    "id": "Table 2",
+                    "function": "lambdo.std:join",
+                    "inputs": ["Table 1"],
+                    "columns": [
+                        {"id": "D", "operation": "calculate", "inputs": ["A"]},
+                        {"id": "E", "operation": "calculate", "inputs": ["X"]}
+                    ]
+                },
+                {
+                    "id": "Table 3",
+                    "columns": [
+                        {"id": "F", "operation": "calculate", "inputs": ["X"]}
+                    ]
+                }
+            ]
+        }
+        wf = Workflow(wf_json)
+
+        # One column of this table
+        tp = Topology(wf)
+        tp.translate(targets=["Table 1::B"])
+        self.assertEqual([[x.id for x in layer] for layer in tp.layers], [['Table 1'], ['A'], ['B']])
+
+        # One column of a table which depends on another table
+        tp = Topology(wf)
+        tp.translate(targets=["Table 2::D"])
+        self.assertEqual([[x.id for x in layer] for layer in tp.layers], [['Table 1'], ['A', 'C'], ['B'], ['Table 2'], ['D']])
+
+        # Whole table
+        tp = Topology(wf)
+        tp.translate(targets="Table 3")
+        self.assertEqual(len(tp.layers), 7)  # Extended table depends on the previous table with all its columns
+        self.assertEqual([x.id for x in tp.layers[-1]], ['F'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,7 @@
 import unittest
+import os
+import shutil
+import tempfile
 
 import sklearn.preprocessing  # To get rid of ImportWarning
 from sklearn import linear_model
@@ -15,6 +18,20 @@ def train_func_1(value):  # Retrun constant model (no data is needed to train it
     trained_model = {"model_param": 1.0}
     return trained_model
 
+train_calls = []
+
+def train_func_2(X, y, step=1.0):  # Record training calls
+    train_calls.append(len(X))
+    return {"model_param": float(y.values.mean()) + step}
+
+def transform_func_3(value, n, s):  # Add mean label of all training rows
+    return value + s / n
+
+def train_func_3(X, y, model=None):  # Update the model by new rows
+    train_calls.append(len(X))
+    model = model or {"n": 0, "s": 0.0}
+    return {"n": model["n"] + len(y), "s": model["s"] + float(y.values.sum())}
+
 def regression_predict(X, model):
     X_array = X.values
     y = model.predict(X_array.reshape(-1, 1))
@@ -106,5 +123,120 @@ class TrainTestCase(unittest.TestCase):
 
         pass
 
+    def test_train_cache(self):
+        path = tempfile.mkdtemp()
+
+        def execute(data, step=1.0):
+            wf_json = {
+                "id": "My workflow",
+                "train_cache": path,
+                "tables": [
+                    {
+                        "id": "My table",
+                        "columns": [
+                            {
+                                "id": "My column",
+                                "function": "test_train:transform_func_1",
+                                "window": "one",
+                                "inputs": ["A"],
+                                "train": {
+                                    "function": "test_train:train_func_2",
+                                    "row_filter": {"slice": {"end": 2}},
+                                    "inputs": ["A"],
+                                    "outputs": ["B"],
+                                    "model": {"step": step}
+                                }
+                            }
+                        ]
+                    }
+                ]
+            }
+            wf = Workflow(wf_json)
+            wf.tables[0].data = pd.DataFrame(data)
+            wf.execute()
+            return wf.tables[0].data['My column'].tolist()
+
+        try:
+            del train_calls[:]
+
+            out = execute({'A': [1, 2, 3], 'B': [1.0, 3.0, 5.0]})
+            self.assertEqual(out, [4.0, 5.0, 6.0])
+            self.assertEqual(len(train_calls), 1)
+
+            # Rows which are not used for training change but the model is loaded from the cache
+            out = execute({'A': [1, 2, 30], 'B': [1.0, 3.0, 50.0]})
+            self.assertEqual(out, [4.0, 5.0, 33.0])
+            self.assertEqual(len(train_calls), 1)
+
+            # Training data or parameters change
+            execute({'A': [1, 2, 3], 'B': [1.0, 5.0, 5.0]})
+            self.assertEqual(len(train_calls), 2)
+            execute({'A': [1, 2, 3], 'B': [1.0, 3.0, 5.0]}, step=2.0)
+            self.assertEqual(len(train_calls), 3)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_incremental(self):
+        path = tempfile.mkdtemp()
+
+        def execute(data, index=None, chunksize=None):
+            wf_json = {
+                "id": "My workflow",
+                "tables": [
+                    {
+                        "id": "My table",
+                        "columns": [
+                            {
+                                "id": "My column",
+                                "function": "test_train:transform_func_3",
+                                "window": "one",
+                                "inputs": ["A"],
+                                "model": "$file://" + os.path.join(path, "model.pkl"),
+                                "train": {
+                                    "function": "test_train:train_func_3",
+                                    "incremental": True,
+                                    "chunksize": chunksize,
+                                    "inputs": ["A"],
+                                    "outputs": ["B"]
+                                }
+                            }
+                        ]
+                    }
+                ]
+            }
+            wf = Workflow(wf_json)
+            wf.tables[0].data = pd.DataFrame(data, index=index)
+            wf.execute()
+            return wf.tables[0].data['My column'].tolist()
+
+        try:
+            del train_calls[:]
+
+            out = execute({'A': [1, 2], 'B': [1.0, 3.0]})
+            self.assertEqual(out, [3.0, 4.0])
+            self.assertEqual(train_calls, [2])
+
+            # Only appended rows are used to update the stored model
+            out = execute({'A': [1, 2, 3, 4], 'B': [1.0, 3.0, 5.0, 7.0]})
+            self.assertEqual(out, [5.0, 6.0, 7.0, 8.0])
+            self.assertEqual(train_calls, [2, 2])
+
+            # No new rows
+            execute({'A': [1, 2, 3, 4], 'B': [1.0, 3.0, 5.0, 7.0]})
+            self.assertEqual(train_calls, [2, 2])
+
+            # Labels of previous rows have been revised (with the same row ids): train from scratch
+            out = execute({'A': [1, 2, 3, 4], 'B': [5.0, 3.0, 5.0, 7.0]})
+            self.assertEqual(out, [6.0, 7.0, 8.0, 9.0])
+            self.assertEqual(train_calls, [2, 2, 4])
+
+            # Previous rows have changed: train from scratch in chunks
+            out = execute({'A': [1, 2, 3], 'B': [1.0, 2.0, 3.0]}, index=[10, 11, 12], chunksize=2)
+            self.assertEqual(out, [3.0, 4.0, 5.0])
+            self.assertEqual(train_calls, [2, 2, 4, 2, 1])
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
 if __name__ == '__main__':
     unittest.main()
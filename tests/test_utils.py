@@ -1,4 +1,7 @@
 import unittest
+import os
+import shutil
+import tempfile
 
 from lambdo.Workflow import *
 from lambdo.Table import *
@@ -55,6 +58,32 @@ class TablesTestCase(unittest.TestCase):
 
         self.assertEqual(value, value2)
 
+    def test_model_store(self):
+        path = tempfile.mkdtemp()
+        try:
+            # JSON values
+            json_field = "$file://" + os.path.join(path, "model.json")
+            set_value(json_field, {"a": [1, 2]})
+            models.clear()
+            self.assertEqual(get_value(json_field), {"a": [1, 2]})
+
+            # Models are loaded once and shared while the file is not changed
+            pkl_field = "$file://" + os.path.join(path, "model.pkl.gz")
+            set_value(pkl_field, {"w": np.arange(5)})
+            models.clear()
+            model = get_value(pkl_field)
+            self.assertIs(get_value(pkl_field), model)
+
+            set_value(pkl_field, {"w": np.arange(3)})
+            self.assertEqual(len(get_value(pkl_field)["w"]), 3)
+
+            # Arrays of joblib files are memory-mapped
+            joblib_field = "$file://" + os.path.join(path, "model.joblib")
+            set_value(joblib_field, {"w": np.arange(5)})
+            self.assertIsInstance(get_value(joblib_field)["w"], np.memmap)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
 
 if __name__ == '__main__':
     unittest.main()